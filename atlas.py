@@ -0,0 +1,185 @@
+import json
+import mmap
+import os
+
+import pygame
+
+ATLAS_DIR = os.path.join("images", ".atlas")
+ATLAS_COLUMNS = 13
+ATLAS_FORMAT = "RGBA"
+ATLAS_VERSION = 1
+
+_atlases = {}
+
+
+def atlas_paths(size: tuple, atlas_dir: str = ATLAS_DIR) -> tuple:
+    """
+    Get the paths of the pixel file and the index file of the atlas for the specified card size.
+    :param size: Tuple (width, height) of a card.
+    :param atlas_dir: Directory holding the atlas files.
+    :return: Tuple (pixels path, index path).
+    """
+    base = os.path.join(atlas_dir, f'atlas_{size[0]}x{size[1]}')
+    return base + ".rgba", base + ".json"
+
+
+def source_images(images_dir: str) -> dict:
+    """
+    Get the source images of the atlas together with their modification stamps.
+    :param images_dir: Directory holding the card images.
+    :return: Dictionary mapping image names to [modification time in ns, file size].
+    """
+    sources = {}
+    for entry in sorted(os.scandir(images_dir), key=lambda e: e.name):
+        if entry.is_file() and entry.name.endswith(".png"):
+            stat = entry.stat()
+            sources[entry.name[:-4]] = [stat.st_mtime_ns, stat.st_size]
+    return sources
+
+
+def build_atlas(size: tuple, images_dir: str = "images", atlas_dir: str = ATLAS_DIR) -> dict:
+    """
+    Bake every card image, scaled to the specified size, into a single raw pixel file with a JSON index.
+
+    The images are laid out row by row in a grid of ATLAS_COLUMNS columns. The atlases of other card sizes are
+    deleted, so the directory holds a single atlas.
+    :param size: Tuple (width, height) of a card.
+    :param images_dir: Directory holding the card images.
+    :param atlas_dir: Directory the atlas files are written to.
+    :return: Dictionary holding the atlas index.
+    """
+    width, height = size
+    sources = source_images(images_dir)
+    names = list(sources)
+    rows = (len(names) + ATLAS_COLUMNS - 1) // ATLAS_COLUMNS
+    sheet = pygame.Surface((ATLAS_COLUMNS * width, rows * height), pygame.SRCALPHA, 32)
+    for i, name in enumerate(names):
+        image = pygame.image.load(os.path.join(images_dir, name + ".png"))
+        image = pygame.transform.smoothscale(image, (width, height))
+        sheet.blit(
+            image, ((i % ATLAS_COLUMNS) * width, (i // ATLAS_COLUMNS) * height), special_flags=pygame.BLEND_RGBA_MAX
+        )
+
+    index = {
+        "version": ATLAS_VERSION,
+        "size": [width, height],
+        "sheet_size": list(sheet.get_size()),
+        "columns": ATLAS_COLUMNS,
+        "names": names,
+        "sources": sources,
+    }
+    pixels_path, index_path = atlas_paths(size, atlas_dir)
+    os.makedirs(atlas_dir, exist_ok=True)
+    with open(pixels_path + ".tmp", "wb") as file:
+        file.write(pygame.image.tobytes(sheet, ATLAS_FORMAT))
+    with open(index_path + ".tmp", "w") as file:
+        json.dump(index, file)
+    os.replace(pixels_path + ".tmp", pixels_path)
+    os.replace(index_path + ".tmp", index_path)
+    remove_atlases(size, atlas_dir)
+    return index
+
+
+def remove_atlases(keep_size: tuple, atlas_dir: str = ATLAS_DIR):
+    """
+    Delete the atlas files of every card size but one.
+    :param keep_size: Tuple (width, height) of the card size whose atlas is kept.
+    :param atlas_dir: Directory holding the atlas files.
+    """
+    kept = atlas_paths(keep_size, atlas_dir)
+    for entry in os.scandir(atlas_dir):
+        if entry.name.startswith("atlas_") and entry.path not in kept:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+def read_index(size: tuple, images_dir: str = "images", atlas_dir: str = ATLAS_DIR):
+    """
+    Read the atlas index for the specified card size if the atlas is up to date.
+    :param size: Tuple (width, height) of a card.
+    :param images_dir: Directory holding the card images.
+    :param atlas_dir: Directory holding the atlas files.
+    :return: Dictionary holding the atlas index, or None if the atlas is missing or stale.
+    """
+    pixels_path, index_path = atlas_paths(size, atlas_dir)
+    try:
+        with open(index_path) as file:
+            index = json.load(file)
+        pixels_size = os.path.getsize(pixels_path)
+    except (OSError, ValueError):
+        return None
+    sheet_width, sheet_height = index.get("sheet_size", (0, 0))
+    if (
+        index.get("version") != ATLAS_VERSION
+        or index.get("size") != list(size)
+        or index.get("sources") != source_images(images_dir)
+        or pixels_size != sheet_width * sheet_height * len(ATLAS_FORMAT)
+    ):
+        return None
+    return index
+
+
+def load_atlas(size: tuple, images_dir: str = "images", atlas_dir: str = ATLAS_DIR, lazy: bool = False) -> dict:
+    """
+    Load the atlas for the specified card size, rebuilding it first if it is missing or stale.
+
+    The pixel file is memory-mapped and every image is cut out of it as a subsurface. When a display mode is set,
+    the sheet is converted to the display format once and the mapping is released. A lazy atlas is neither rebuilt
+    nor converted: its images stay views of the mapping, so only the pages of the images used are read, and the
+    caller converts them.
+    :param size: Tuple (width, height) of a card.
+    :param images_dir: Directory holding the card images.
+    :param atlas_dir: Directory holding the atlas files.
+    :param lazy: Whether to leave the sheet unconverted, and a missing or stale atlas unbuilt.
+    :return: Dictionary mapping image names to Pygame.Surface objects, or None if lazy and the atlas is missing or
+    stale.
+    """
+    size = tuple(size)
+    if size in _atlases:
+        return _atlases[size]
+
+    index = read_index(size, images_dir, atlas_dir)
+    if index is None:
+        if lazy:
+            return None
+        index = build_atlas(size, images_dir, atlas_dir)
+
+    pixels_path = atlas_paths(size, atlas_dir)[0]
+    with open(pixels_path, "rb") as file:
+        pixels = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    sheet = pygame.image.frombuffer(pixels, tuple(index["sheet_size"]), ATLAS_FORMAT)
+    if not lazy and pygame.display.get_surface() is not None:
+        sheet = sheet.convert_alpha()
+        pixels.close()
+
+    width, height = size
+    columns = index["columns"]
+    images = {}
+    for i, name in enumerate(index["names"]):
+        rect = pygame.Rect((i % columns) * width, (i // columns) * height, width, height)
+        images[name] = sheet.subsurface(rect)
+    _atlases[size] = images
+    return images
+
+
+def release_atlas(size: tuple):
+    """
+    Drop the loaded atlas of a card size, if any.
+    :param size: Tuple (width, height) of a card.
+    """
+    _atlases.pop(tuple(size), None)
+
+
+def clear_atlases():
+    """
+    Drop every loaded atlas.
+    """
+    _atlases.clear()
+
+
+if __name__ == "__main__":
+    from layout import CARD_WIDTH, CARD_HEIGHT
+
+    build_atlas((CARD_WIDTH, CARD_HEIGHT))
@@ -0,0 +1,282 @@
+import argparse
+import os
+import sys
+import time
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from rules import CLASSIC, VARIANT_NAMES, VARIANTS
+from solver import solve
+from state import KlondikeState, shuffled_deck
+
+COLUMNS = (
+    ("seed", 'I'),
+    ("winnable", 'b'),
+    ("solution_length", 'H'),
+    ("nodes", 'I'),
+    ("seconds", 'f'),
+)
+UNKNOWN = -1
+FAILED = -2
+CHUNK_SIZE = 8
+MAX_ATTEMPTS = 2
+VARIANT_FILE = "variant.txt"
+
+
+class ColumnStore:
+    """
+    Append-only columnar result file: a directory holding one raw binary file per column.
+
+    Each column can be read on its own, for example with array.fromfile or numpy.fromfile. Rows are appended to
+    every column together, and a row only counts once all the columns hold it, so an interrupted append is ignored.
+    The name of the variant the deals were analyzed with is kept in VARIANT_FILE.
+    Attributes
+    ----------
+    path : str
+        Directory holding the column files.
+    """
+    def __init__(self, path: str):
+        """
+        Initialize a ColumnStore object, creating the directory if needed.
+        :param path: Directory holding the column files.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def column_path(self, name: str) -> str:
+        """
+        Get the path of a column file.
+        :param name: Name of the column.
+        :return: Path of the column file.
+        """
+        return os.path.join(self.path, name + ".bin")
+
+    def read_column(self, name: str, typecode: str, rows: int = None) -> array:
+        """
+        Read a column.
+        :param name: Name of the column.
+        :param typecode: Array typecode of the column.
+        :param rows: Number of rows to read, or None to read all the complete rows.
+        :return: Array holding the column's values.
+        """
+        values = array(typecode)
+        if rows is None:
+            rows = self.rows()
+        with open(self.column_path(name), "rb") as file:
+            values.fromfile(file, rows)
+        return values
+
+    def rows(self) -> int:
+        """
+        Get the number of complete rows.
+        :return: Number of rows held by every column.
+        """
+        counts = []
+        for name, typecode in COLUMNS:
+            try:
+                counts.append(os.path.getsize(self.column_path(name)) // array(typecode).itemsize)
+            except OSError:
+                return 0
+        return min(counts)
+
+    def repair(self):
+        """
+        Truncate every column to the number of complete rows.
+        """
+        rows = self.rows()
+        for name, typecode in COLUMNS:
+            with open(self.column_path(name), "ab") as file:
+                file.truncate(rows * array(typecode).itemsize)
+
+    def append(self, results: list):
+        """
+        Append rows to every column.
+        :param results: List of result tuples, with one value per column.
+        """
+        for index, (name, typecode) in enumerate(COLUMNS):
+            with open(self.column_path(name), "ab") as file:
+                array(typecode, [result[index] for result in results]).tofile(file)
+
+    def read_variant(self) -> str:
+        """
+        Get the variant the deals were analyzed with. Stores written before the variant was recorded hold classic
+        Klondike results.
+        :return: Name of the variant, from rules.VARIANT_NAMES.
+        """
+        try:
+            with open(os.path.join(self.path, VARIANT_FILE)) as file:
+                return file.read().strip()
+        except FileNotFoundError:
+            return CLASSIC.name
+
+    def write_variant(self, variant: str):
+        """
+        Record the variant the deals are analyzed with.
+        :param variant: Name of the variant, from rules.VARIANT_NAMES.
+        """
+        with open(os.path.join(self.path, VARIANT_FILE), "w") as file:
+            file.write(variant + "\n")
+
+    def done_seeds(self) -> set:
+        """
+        Get the seeds that already have a result.
+        :return: Set of seeds.
+        """
+        if self.rows() == 0:
+            return set()
+        return set(self.read_column("seed", 'I'))
+
+
+def analyze_deal(seed: int, max_nodes: int, max_seconds: float, optimize: bool, variant: str = CLASSIC.name) -> tuple:
+    """
+    Solve the deal of a seed.
+    :param seed: Seed of the deal.
+    :param max_nodes: Maximum number of states the solver expands.
+    :param max_seconds: Maximum duration of the search in seconds.
+    :param optimize: Whether the solver keeps searching for a shorter solution.
+    :param variant: Name of the variant the deal is played with, from rules.VARIANT_NAMES.
+    :return: Tuple (seed, winnable, solution length, nodes, seconds).
+    """
+    state = KlondikeState.deal(shuffled_deck(seed), VARIANTS[variant])
+    result = solve(state, max_nodes, max_seconds, optimize=optimize)
+    winnable = UNKNOWN if result.winnable is None else int(result.winnable)
+    return seed, winnable, len(result.solution), result.nodes, result.elapsed
+
+
+def analyze_chunk(seeds: list, max_nodes: int, max_seconds: float, optimize: bool, variant: str) -> list:
+    """
+    Solve the deals of a chunk of seeds in a worker process.
+    :param seeds: List of seeds.
+    :param max_nodes: Maximum number of states the solver expands per deal.
+    :param max_seconds: Maximum duration of each search in seconds.
+    :param optimize: Whether the solver keeps searching for a shorter solution.
+    :param variant: Name of the variant the deals are played with, from rules.VARIANT_NAMES.
+    :return: List of result tuples, one per seed.
+    """
+    return [analyze_deal(seed, max_nodes, max_seconds, optimize, variant) for seed in seeds]
+
+
+def run_batch(
+    seeds: list,
+    store: ColumnStore,
+    workers: int = None,
+    max_nodes: int = 100000,
+    max_seconds: float = 10.0,
+    optimize: bool = False,
+    chunk_size: int = CHUNK_SIZE,
+    variant: str = CLASSIC.name,
+) -> int:
+    """
+    Analyze deals across a pool of worker processes, appending each chunk's results as soon as it is done.
+
+    Seeds that already have a result in the store are skipped, so an interrupted run resumes where it stopped. If a
+    worker process dies, the pool is restarted and the unfinished chunks are submitted again. The seeds of a chunk that
+    keeps breaking the pool are then analyzed one at a time in their own process, and a seed whose process still dies
+    is recorded as failed. A store only holds the results of one variant.
+    :param seeds: List of seeds.
+    :param store: ColumnStore object receiving the results.
+    :param workers: Number of worker processes, or None for one per core.
+    :param max_nodes: Maximum number of states the solver expands per deal.
+    :param max_seconds: Maximum duration of each search in seconds.
+    :param optimize: Whether the solver keeps searching for a shorter solution.
+    :param chunk_size: Number of seeds handed to a worker at once.
+    :param variant: Name of the variant the deals are played with, from rules.VARIANT_NAMES.
+    :return: Number of deals analyzed.
+    """
+    store.repair()
+    if store.rows() == 0:
+        store.write_variant(variant)
+    elif store.read_variant() != variant:
+        raise ValueError(f'{store.path} holds {store.read_variant()} results, not {variant} ones')
+    done = store.done_seeds()
+    pending = [seed for seed in seeds if seed not in done]
+    chunks = [(pending[i:i + chunk_size], 0) for i in range(0, len(pending), chunk_size)]
+    analyzed = 0
+    suspects = []
+    while chunks:
+        retry = []
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {
+                executor.submit(analyze_chunk, chunk, max_nodes, max_seconds, optimize, variant): (chunk, attempts)
+                for chunk, attempts in chunks
+            }
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    chunk, attempts = futures.pop(future)
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool:
+                        retry.append((chunk, attempts + 1))
+                        continue
+                    store.append(results)
+                    analyzed += len(results)
+        chunks = []
+        for chunk, attempts in retry:
+            if attempts < MAX_ATTEMPTS:
+                chunks.append((chunk, attempts))
+            else:
+                suspects.extend(chunk)
+
+    for seed in suspects:
+        with ProcessPoolExecutor(1) as executor:
+            try:
+                results = executor.submit(analyze_chunk, [seed], max_nodes, max_seconds, optimize, variant).result()
+            except BrokenProcessPool:
+                results = [(seed, FAILED, 0, 0, 0.0)]
+        store.append(results)
+        analyzed += 1
+    return analyzed
+
+
+def parse_seeds(text: str) -> list:
+    """
+    Parse a seed range.
+    :param text: Range written as 'start:stop', stop excluded, or as a single seed.
+    :return: List of seeds.
+    """
+    if ":" in text:
+        start, stop = text.split(":")
+        return list(range(int(start), int(stop)))
+    return [int(text)]
+
+
+def main(argv: list = None):
+    """
+    Command-line entry point of the batch deal analysis.
+    :param argv: List of command-line arguments, or None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Analyze the winnability of a range of seeded deals.")
+    parser.add_argument("seeds", help="seed range as start:stop, or a single seed")
+    parser.add_argument("-o", "--output", default="deals", help="directory of the columnar result files")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes, one per core by default")
+    parser.add_argument("--max-nodes", type=int, default=100000, help="solver node budget per deal")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="solver time budget per deal")
+    parser.add_argument("--optimize", action="store_true", help="search for the shortest solution")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="seeds handed to a worker at once")
+    parser.add_argument("--variant", choices=VARIANT_NAMES, default=CLASSIC.name, help="rules of the deals")
+    args = parser.parse_args(argv)
+
+    store = ColumnStore(args.output)
+    start = time.perf_counter()
+    try:
+        analyzed = run_batch(
+            parse_seeds(args.seeds),
+            store,
+            args.workers,
+            args.max_nodes,
+            args.max_seconds,
+            args.optimize,
+            args.chunk_size,
+            args.variant,
+        )
+    except ValueError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+    rate = analyzed / elapsed if elapsed > 0 else 0.0
+    print(f'{analyzed} deals analyzed in {elapsed:.1f} s ({rate:.1f} deals/s), {store.rows()} results in {store.path}')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,339 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+from game import Game
+from state import STOCK
+from telemetry import MOVE, Telemetry
+
+SEED = 7
+MID_GAME_MOVES = 25
+LATE_GAME_MOVES = 200
+DRAG_STEPS = 10
+THRESHOLD = 0.25
+MEMORY_BOARDS = 200
+TELEMETRY_BATCH = 100
+
+
+def new_game(seed: int = SEED) -> Game:
+    """
+    Create a game dealt from a seed.
+    :param seed: Seed of the deal.
+    :return: Game object.
+    """
+    game = Game()
+    game.create_slots()
+    game.create_card_deck()
+    game.deal_cards(seed)
+    return game
+
+
+def play_hints(game: Game, moves: int):
+    """
+    Advance a game deterministically by playing its hints, sending cards to the foundations after every move.
+    :param game: Game to be advanced.
+    :param moves: Maximum number of hints to play.
+    """
+    for _ in range(moves):
+        hint = game.move_index.hint()
+        if hint is None:
+            break
+        game.apply_move(hint)
+        game.auto_send()
+
+
+def drag_events(game: Game, move) -> list:
+    """
+    Build the events of a mouse drag and drop playing a move.
+    :param game: Game the move is played in.
+    :param move: Move of cards from the waste, a foundation or the tableau.
+    :return: List of pygame events: a button press on the first moved card, DRAG_STEPS motions and a release on the
+    target slot.
+    """
+    card = game.slots[move.source].pile[-move.count]
+    start = (card.rect.x + 5, card.rect.y + 5)
+    target_slot = game.slots[move.target]
+    target_rect = target_slot.get_top_card().rect if target_slot.pile else target_slot.rect
+    end = target_rect.center
+    events = [pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=start, button=1)]
+    for step in range(1, DRAG_STEPS + 1):
+        pos = (
+            start[0] + (end[0] - start[0]) * step // DRAG_STEPS,
+            start[1] + (end[1] - start[1]) * step // DRAG_STEPS,
+        )
+        events.append(pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(1, 0, 0)))
+    events.append(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=end, button=1))
+    return events
+
+
+def measure(function, repeat: int) -> list:
+    """
+    Time a function.
+    :param function: Function called without arguments, returning the nanoseconds to charge or None to charge the
+    whole call.
+    :param repeat: Number of timed calls, after one untimed warm-up call.
+    :return: List of the durations in nanoseconds.
+    """
+    function()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        charged = function()
+        durations.append(charged if charged is not None else time.perf_counter_ns() - start)
+    return durations
+
+
+def bench_create_card_deck(repeat: int) -> list:
+    """
+    Time Game.create_card_deck.
+    :param repeat: Number of timed calls.
+    :return: List of the durations in nanoseconds.
+    """
+    game = new_game()
+
+    def run():
+        game.pile = []
+        game.create_card_deck()
+    return measure(run, repeat)
+
+
+def bench_deal_cards(repeat: int) -> list:
+    """
+    Time Game.deal_cards on fresh slots.
+    :param repeat: Number of timed calls.
+    :return: List of the durations in nanoseconds.
+    """
+    game = new_game()
+
+    def run():
+        game.slots, game.foundations, game.tableau = [], [], []
+        game.create_slots()
+        start = time.perf_counter_ns()
+        game.deal_cards(SEED)
+        return time.perf_counter_ns() - start
+    return measure(run, repeat)
+
+
+def bench_restart_game(repeat: int) -> list:
+    """
+    Time Game.restart_game.
+    :param repeat: Number of timed calls.
+    :return: List of the durations in nanoseconds.
+    """
+    game = new_game()
+    random.seed(SEED)
+    return measure(game.restart_game, repeat)
+
+
+def bench_telemetry_record(repeat: int) -> list:
+    """
+    Time Telemetry.record, the cost a gameplay event adds to the game thread.
+    :param repeat: Number of timed batches of TELEMETRY_BATCH records.
+    :return: List of the durations per record in nanoseconds.
+    """
+    directory = tempfile.mkdtemp()
+    telemetry = Telemetry(directory, capacity=TELEMETRY_BATCH * (repeat + 1))
+
+    def run():
+        start = time.perf_counter_ns()
+        for _ in range(TELEMETRY_BATCH):
+            telemetry.record(MOVE, 6, 7, 1)
+        return (time.perf_counter_ns() - start) // TELEMETRY_BATCH
+    durations = measure(run, repeat)
+    telemetry.close()
+    shutil.rmtree(directory)
+    return durations
+
+
+def bench_draw_game(moves: int):
+    """
+    Build a benchmark of Game.draw_game on a board reached by playing hints.
+    :param moves: Number of hints played before drawing.
+    :return: Benchmark function taking the number of timed calls and returning the durations in nanoseconds.
+    """
+    def bench(repeat: int) -> list:
+        game = new_game()
+        play_hints(game, moves)
+        return measure(game.draw_game, repeat)
+    return bench
+
+
+def bench_drag_and_drop(repeat: int) -> list:
+    """
+    Time Game.handle_events playing moves by drag and drop on the boards of the first MID_GAME_MOVES hints.
+
+    Every move of a board that can be dragged is played and then undone untimed, before the next hint is played.
+    :param repeat: Number of timed calls of every drag and drop.
+    :return: List of the durations in nanoseconds, one per drag and drop.
+    """
+    game = new_game()
+    durations = []
+    for _ in range(MID_GAME_MOVES):
+        for move in game.move_index.moves():
+            if move.source == STOCK or move.target == STOCK:
+                continue
+            events = drag_events(game, move)
+
+            def run():
+                position = game.journal.position
+                start = time.perf_counter_ns()
+                game.handle_events(events)
+                elapsed = time.perf_counter_ns() - start
+                if game.journal.position > position:
+                    game.undo_move()
+                return elapsed
+            durations.extend(measure(run, repeat))
+        play_hints(game, 1)
+    return durations
+
+
+def bench_check_win(repeat: int) -> list:
+    """
+    Time Game.check_win, in batches of 1000 calls.
+    :param repeat: Number of timed batches.
+    :return: List of the durations of a single call in nanoseconds.
+    """
+    game = new_game()
+    play_hints(game, MID_GAME_MOVES)
+
+    def run():
+        start = time.perf_counter_ns()
+        for _ in range(1000):
+            game.check_win()
+        return (time.perf_counter_ns() - start) // 1000
+    return measure(run, repeat)
+
+
+def board_memory(boards: int = MEMORY_BOARDS) -> float:
+    """
+    Measure the memory held by the object model of a board: its slots, its cards, their suites and ranks.
+
+    Boards are dealt one after the other in the same game and kept alive, while tracemalloc counts the bytes they
+    allocate. The textures are shared by every board and loaded before counting starts.
+    :param boards: Number of boards dealt.
+    :return: Bytes allocated per board.
+    """
+    game = new_game()
+    kept = []
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    for seed in range(boards):
+        game.slots, game.foundations, game.tableau, game.pile = [], [], [], []
+        game.create_slots()
+        game.create_card_deck()
+        game.deal_cards(seed)
+        kept.append((game.slots, game.cards))
+    size = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return size / boards
+
+
+BENCHMARKS = {
+    "create_card_deck": bench_create_card_deck,
+    "deal_cards": bench_deal_cards,
+    "restart_game": bench_restart_game,
+    "draw_game_early": bench_draw_game(0),
+    "draw_game_mid": bench_draw_game(MID_GAME_MOVES),
+    "draw_game_late": bench_draw_game(LATE_GAME_MOVES),
+    "drag_and_drop": bench_drag_and_drop,
+    "check_win": bench_check_win,
+    "telemetry_record": bench_telemetry_record,
+}
+
+
+def run_benchmarks(names: list = None, repeat: int = 50) -> dict:
+    """
+    Run benchmarks.
+    :param names: Names of the benchmarks to run, or None to run all of them.
+    :param repeat: Number of timed calls of every benchmark.
+    :return: Dictionary mapping every benchmark name to its median, minimum and 95th percentile in microseconds and
+    its number of samples.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        durations = sorted(BENCHMARKS[name](repeat))
+        results[name] = {
+            "median_us": statistics.median(durations) / 1e3,
+            "min_us": durations[0] / 1e3,
+            "p95_us": durations[min(len(durations) - 1, int(0.95 * len(durations)))] / 1e3,
+            "samples": len(durations),
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Find the benchmarks whose median regressed against a baseline.
+    :param results: Results of run_benchmarks.
+    :param baseline: Results of an earlier run.
+    :param threshold: Allowed slowdown as a fraction of the baseline median.
+    :return: List of tuples (name, baseline median, median) of the regressed benchmarks.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["median_us"] > baseline[name]["median_us"] * (1 + threshold):
+            regressions.append((name, baseline[name]["median_us"], result["median_us"]))
+    return regressions
+
+
+def main(argv: list = None) -> int:
+    """
+    Command-line entry point of the benchmark suite.
+    :param argv: List of command-line arguments, or None to use sys.argv.
+    :return: Exit status, 1 if a benchmark regressed against the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Run the headless Solitaire benchmarks.")
+    parser.add_argument("names", nargs="*", help=f'benchmarks to run, all by default: {", ".join(BENCHMARKS)}')
+    parser.add_argument("-o", "--output", default=None, help="JSON file receiving the results")
+    parser.add_argument("-b", "--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=THRESHOLD, help="allowed slowdown, 0.25 for 25%%")
+    parser.add_argument("-n", "--repeat", type=int, default=50, help="timed calls per benchmark")
+    parser.add_argument("-m", "--memory", action="store_true", help="only measure the bytes held per board")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f'unknown benchmarks: {", ".join(unknown)}')
+
+    if args.memory:
+        print(f'{board_memory():,.0f} bytes per board')
+        return 0
+
+    results = run_benchmarks(args.names, args.repeat)
+    for name, result in results.items():
+        print(f'{name:<18} median {result["median_us"]:10.1f} us  min {result["min_us"]:10.1f} us  '
+              f'p95 {result["p95_us"]:10.1f} us')
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump({
+                "python": platform.python_version(),
+                "pygame": pygame.version.ver,
+                "platform": platform.platform(),
+                "seed": SEED,
+                "results": results,
+            }, file, indent=2)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after in regressions:
+        print(f'REGRESSION {name}: {before:.1f} us -> {after:.1f} us (+{after / before - 1:.0%})')
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,32 +2,33 @@ import pygame
 
 from suite import Suite
 from rank import Rank
+from textures import BACK_IMAGE_NAME, face_image_name, get_preview, get_texture, lazy_loading
 
 
 class Card:
     """
     A Card object in a card game.
+
+    Cards only hold what the card itself is and where it is drawn; the drag state belongs to the Game, and a card's
+    resting position is recomputed by its slot's layout.
     Attributes
     ----------
         rect : pygame.Rect
             Pygame.Rect object representing the card's position and size.
-        original_position: tuple
-            Tuple representing the original (x, y) position of the card.
-        image: pygame.Surface
-            Pygame.Surface object representing the image of the card's face.
+        face_image: pygame.Surface
+            Pygame.Surface object representing the image of the card's face, shared through the texture cache, or
+            None with lazy loading until it is first needed; read it through the image property.
         back_image: pygame.Surface
-            Pygame.Surface object representing the image of the card's back.
-        dragging: bool
-            Flag indicating whether the card is being dragged
-        offset_x: int
-            X-offset of the mouse position from the card's rect when dragging.
-        offset_y: int
-            Y-offset of the mouse position from the card's rect when dragging.
+            Pygame.Surface object representing the image of the card's back, shared by all cards.
         suite: Suite
-            Suite of the card
+            Suite of the card, shared by every card of the suite
         rank: Rank
-            Rank of the card
+            Rank of the card, shared by every card of the rank
+        face_up: bool
+            Flag indicating whether the card is face up
     """
+    __slots__ = ("rect", "face_image", "back_image", "suite", "rank", "face_up")
+
     def __init__(self, x: int, y: int, width: int, height: int, suite: Suite, rank: Rank):
         """
         Initialize a Card object.
@@ -39,17 +40,50 @@ class Card:
         :param rank: Rank of the card.
         """
         self.rect = pygame.Rect(x, y, width, height)
-        self.original_position = (x, y)
-        self.image = pygame.image.load(f'images/{rank.name.lower()}_of_{suite.name.lower()}.png')
-        self.image = pygame.transform.smoothscale(self.image, (width, height))
-        self.back_image = pygame.image.load("images/back_card.png")
-        self.back_image = pygame.transform.smoothscale(self.back_image, (width, height))
-        self.dragging = False
-        self.offset_x, self.offset_y = 0, 0
         self.suite = suite
         self.rank = rank
+        self.face_image = None if lazy_loading() else get_texture(self.face_name(), (width, height))
+        self.back_image = get_texture(BACK_IMAGE_NAME, (width, height))
         self.face_up = False
 
+    @property
+    def image(self) -> pygame.Surface:
+        """
+        Get the image of the card's face, taking it from the texture cache if it was not loaded yet.
+        :return: Pygame.Surface object.
+        """
+        if self.face_image is None:
+            self.face_image = get_texture(self.face_name(), self.rect.size)
+        return self.face_image
+
+    def face_name(self) -> str:
+        """
+        Get the image name of the card's face.
+        :return: Name of the image file without directory and extension.
+        """
+        return face_image_name(self.suite.name, self.rank.name)
+
+    def resize(self, size: tuple, source_size: tuple = None):
+        """
+        Resize the card, taking its images at the new size from the texture cache. With lazy loading, the face image
+        of a face-down card is only taken when it is next needed.
+        :param size: Tuple (width, height) of the card.
+        :param source_size: Tuple (width, height) of cached textures to scale quick previews from, or None to use the
+        smoothly scaled textures.
+        """
+        self.rect.size = size
+        name = self.face_name()
+        if lazy_loading() and (self.face_image is None or not self.face_up):
+            self.face_image = None
+        elif source_size is None:
+            self.face_image = get_texture(name, size)
+        else:
+            self.face_image = get_preview(name, size, source_size)
+        if source_size is None:
+            self.back_image = get_texture(BACK_IMAGE_NAME, size)
+        else:
+            self.back_image = get_preview(BACK_IMAGE_NAME, size, source_size)
+
     def draw(self, screen: pygame.Surface):
         """
         Draw the card's back image on the specified Pygame screen.
@@ -64,30 +98,6 @@ class Card:
         """
         screen.blit(self.image, self.rect)
 
-    def start_dragging(self, mouse_pos: tuple):
-        """
-        Start dragging the card.
-        :param mouse_pos: Tuple containing the current mouse position.
-        """
-        self.dragging = True
-        self.offset_x = mouse_pos[0] - self.rect.x
-        self.offset_y = mouse_pos[1] - self.rect.y
-
-    def stop_dragging(self):
-        """
-        Stop dragging the card and reset its position.
-        """
-        if self.dragging:
-            self.dragging = False
-            self.rect.topleft = self.original_position
-
-    def set_original_position(self, new_position: tuple):
-        """
-        Set the original position of the card.
-        :param new_position: Tuple containing the new position.
-        """
-        self.original_position = new_position
-
     def turn_face_up(self, screen: pygame.Surface):
         """
         Turn the card face up and draw its front image on the specified Pygame screen.
@@ -1,48 +1,124 @@
+import os
 import random
 import pygame
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
 
-from rank import Rank
+from rank import RANKS
 from card import Card
+from journal import MoveJournal
+from layout import SCREEN_HEIGHT, SCREEN_WIDTH, compute_layout
+from library import DealLibrary
+from move_index import MoveIndex
+from profiler import CHECK_WIN, DISPLAY, DRAW, EVENTS, IDLE, STATS_INTERVAL, WIN_SCREEN, FrameProfiler
+from replay import ReplayWriter, replay_path
+from rules import CLASSIC, DECK_SIZE, VEGAS_SCORING, Rules
+from save import Autosaver, encode_save, load_save
 from slot import Slot
-from suite import Suite
+from suite import SUITES
+from textures import BACK_IMAGE_NAME, prefetch_textures, set_lazy_loading, textures_ready
+from telemetry import ABANDON, MOVE, RECYCLE, REDO, UNDO, WIN, Telemetry
+from state import FOUNDATIONS, STOCK, SUITE_NAMES, TABLEAU, WASTE, KlondikeState, Move, card_id, shuffled_deck
 
-SCREEN_WIDTH, SCREEN_HEIGHT = 1000, 700
-CARD_WIDTH, CARD_HEIGHT = 85, 115
 BORDER_WIDTH = 2
 FPS = 60
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
+HINT_COLOR = (255, 215, 0)
+RESIZE_SETTLED = pygame.event.custom_type()
+RESIZE_SETTLE_MS = 150
+RESIZE_POLL_MS = 30
+VICTORY_ENDED = pygame.event.custom_type()
+VICTORY_MS = 3000
+PREFETCH_DEPTH = 2
+INPUT_EVENTS = (
+    pygame.QUIT,
+    pygame.KEYDOWN,
+    pygame.MOUSEBUTTONDOWN,
+    pygame.MOUSEBUTTONUP,
+    pygame.MOUSEMOTION,
+    pygame.WINDOWEXPOSED,
+    pygame.WINDOWRESTORED,
+    pygame.VIDEORESIZE,
+    RESIZE_SETTLED,
+    VICTORY_ENDED,
+)
+DEAL_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deal")
 
 
-def check_foundations_rules(card: Card, slot: Slot):
+class PreparedDeal(NamedTuple):
+    """
+    Deal made on a headless state, ready to be laid out on the slots.
+    """
+    seed: int
+    deck: list
+    state: KlondikeState
+    move_index: MoveIndex
+
+
+def prepare_deal(seed: int, rules: Rules) -> PreparedDeal:
+    """
+    Shuffle and deal a deck on a headless state and index its legal moves, without touching pygame, so it can run on
+    another thread.
+    :param seed: Seed of the deal, or None to pick a random one.
+    :param rules: Rules of the variant being played.
+    :return: PreparedDeal object.
+    """
+    if seed is None:
+        seed = random.getrandbits(32)
+    deck = shuffled_deck(seed)
+    state = KlondikeState.deal(deck, rules)
+    return PreparedDeal(seed, deck, state, MoveIndex(state))
+
+
+def encode_card(card: Card) -> int:
+    """
+    Encode a Card object as in the state module.
+    :param card: Card object to be encoded.
+    :return: Integer from 0 to 51.
+    """
+    return card_id(SUITE_NAMES.index(card.suite.name), card.rank.value)
+
+
+def check_foundations_rules(card: Card, slot: Slot, rules: Rules = CLASSIC):
     """
     Check if the provided card can be placed on the foundations slot based on Solitaire rules.
     :param card: Card object to be checked.
     :param slot: Slot object representing the foundations slot.
+    :param rules: Rules of the variant being played.
     :return: true if the card can be placed on the slot, false otherwise.
     """
     if slot.is_empty():
-        return card.rank.name == "Ace"
-    top_card = slot.get_top_card()
-    return card.suite.name == top_card.suite.name and card.rank.value - top_card.rank.value == 1
+        return bool(rules.foundation_base[encode_card(card)])
+    return rules.successor[encode_card(slot.get_top_card())] == encode_card(card)
 
 
-def check_tableau_rules(card: Card, slot: Slot):
+def check_tableau_rules(card: Card, slot: Slot, rules: Rules = CLASSIC):
     """
     Check if the provided card can be placed on the tableau slot based on Solitaire rules.
     :param card: Card object to be checked.
     :param slot: Slot object representing the tableau slot.
+    :param rules: Rules of the variant being played.
     :return: true if the card can be placed on the slot, false otherwise.
     """
     if slot.is_empty():
-        return card.rank.name == "King"
+        return bool(rules.tableau_base[encode_card(card)])
     top_card = slot.get_top_card()
-    return (
-        card.suite.color != top_card.suite.color
-        and top_card.rank.value - card.rank.value == 1
-        and top_card.face_up
-    )
+    return bool(rules.stack[encode_card(card) * DECK_SIZE + encode_card(top_card)]) and top_card.face_up
+
+
+def coalesce_motion(events: list) -> list:
+    """
+    Drop every mouse motion event directly followed by another one, keeping the latest position of each run.
+    :param events: List of pygame events.
+    :return: List of the events kept, in order.
+    """
+    return [
+        event for event, following in zip(events, events[1:] + [None])
+        if event.type != pygame.MOUSEMOTION or following is None or following.type != pygame.MOUSEMOTION
+    ]
 
 
 class Game:
@@ -56,6 +132,12 @@ class Game:
         Pygame clock object for controlling the frame rate.
     pile : list of Card
         List to store the initial card deck.
+    cards : list of Card
+        List of the cards indexed by their encoded value.
+    state : KlondikeState
+        Headless state of the game the slots are a view of.
+    seed : int
+        Seed of the current deal.
     stock : Slot
         Slot object representing the stock pile.
     waste : Slot
@@ -66,30 +148,183 @@ class Game:
         List of Slot objects representing the tableau piles.
     slots : list of Slot
         Combined list of all game slots.
+    layout : layout.Layout
+        Positions and sizes of the game elements for the window size.
+    texture_size : tuple
+        Size of the smoothly scaled card images the cards show, or of the images their previews are scaled from while
+        the window is being resized.
     new_game_rect : pygame.Rect
         Pygame rect object representing the new game button's position and size.
     victory_rect : pygame.Rect
         Pygame rect object representing the victory screen's position and size.
+    dirty_rendering : bool
+        Flag indicating whether only changed regions are pushed to the display and the loop sleeps while idle.
+    dirty_rects : list of pygame.Rect
+        Regions of the screen that changed since the last frame.
+    font : pygame.font.Font
+        Font of the 'New Game' button.
+    victory_font : pygame.font.Font
+        Font of the victory screen.
+    button_image : pygame.Surface
+        Pre-rendered 'New Game' button with its border and text.
+    background : pygame.Surface
+        Pre-rendered background with the slot outlines, rebuilt when the layout of the slots changes.
+    background_key : tuple
+        Layout of the slots the background was rendered for.
+    stack_surfaces : dict
+        Cached surfaces of the face-down stacks, keyed by slot index.
+    hit_columns : list of tuple
+        Indexes of the slots spanning every screen column, used to find the slot under a point.
+    drag_source : int
+        Index of the slot the dragged cards come from, or None if nothing is being dragged.
+    drag_depth : int
+        Position of the first dragged card in its slot's pile.
+    drag_pile : list of Card
+        Cards being dragged, bottom first.
+    drag_offset : tuple
+        Offset (x, y) of the mouse position from the first dragged card when the drag started.
+    mouse_pos : tuple
+        Position of the mouse in the last mouse event handled.
+    low_latency : bool
+        Flag indicating whether input is handled right before the frame showing it is drawn, with the event queue
+        restricted to INPUT_EVENTS and mouse motions coalesced.
+    autosaver : Autosaver
+        Background writer of the save file, given a snapshot after every change, or None to not save.
+    journal : MoveJournal
+        Moves of the current deal that can be undone and redone.
+    replay_dir : str
+        Directory receiving a replay file per deal, or None to not record replays.
+    replay : ReplayWriter
+        Recording of the current deal, or None.
+    move_index : MoveIndex
+        Legal moves of the current state, updated after every move.
+    hint : Move
+        Move highlighted by the hint key, or None.
+    profiler : FrameProfiler
+        Profiler timing the phases of every frame, or None to not profile.
+    show_hud : bool
+        Flag indicating whether the performance HUD is drawn over the game.
+    hud_surface : pygame.Surface
+        Rendered performance HUD, or None.
+    hud_key : int
+        Number of frames profiled when the HUD was rendered.
+    deal_library : DealLibrary
+        Library of analyzed deals new games are picked from, or None to deal random seeds.
+    deal_winnable : bool
+        Outcome of the deals picked from the library: True for winnable deals, False for lost ones, None for any.
+    deal_tier : str
+        Difficulty tier of the deals picked from the library, or None for any tier.
+    rules : Rules
+        Rules of the variant being played.
+    score_surface : pygame.Surface
+        Rendered Vegas score, or None.
+    score_key : int
+        Score the score surface was rendered for.
+    next_deal : concurrent.futures.Future
+        Next deal, prepared by DEAL_EXECUTOR while the current one is played, as a PreparedDeal, or None.
+    victory : bool
+        Flag indicating whether the victory screen is shown over the won game.
+    telemetry : Telemetry
+        Recorder of the gameplay events, or None to not record them.
+    lazy_faces : bool
+        Flag indicating whether the card faces are loaded the first time they are shown, the faces likely to be turned
+        up next being prefetched in the background.
     """
-    def __init__(self):
+    def __init__(
+        self,
+        dirty_rendering: bool = True,
+        undo_depth: int = None,
+        replay_dir: str = None,
+        profiler: FrameProfiler = None,
+        deal_library: DealLibrary = None,
+        rules: Rules = CLASSIC,
+        low_latency: bool = False,
+        save_path: str = None,
+        window_size: tuple = (SCREEN_WIDTH, SCREEN_HEIGHT),
+        telemetry: Telemetry = None,
+        lazy_faces: bool = False,
+    ):
         """
         Initialize a Game object representing a Solitaire game.
+        :param dirty_rendering: Whether to render only changed regions and block on events while idle.
+        :param undo_depth: Maximum number of moves that can be undone, or None for no limit.
+        :param replay_dir: Directory receiving a replay file per deal, or None to not record replays.
+        :param profiler: Profiler timing the phases of every frame, or None to not profile.
+        :param deal_library: Library of analyzed deals new games are picked from, or None to deal random seeds.
+        :param rules: Rules of the variant being played.
+        :param low_latency: Whether to handle input right before drawing, filtering and coalescing events.
+        :param save_path: Path of the file the game is saved to after every change, or None to not save.
+        :param window_size: Tuple (width, height) of the window when it opens; it can then be resized.
+        :param telemetry: Recorder of the gameplay events, or None to not record them.
+        :param lazy_faces: Whether to load the card faces the first time they are shown, see textures.set_lazy_loading.
         """
-        pygame.init()
+        # Only the modules the game uses are started; pygame.init would also start audio and joysticks
+        pygame.display.init()
+        pygame.font.init()
         pygame.display.set_caption("Solitaire")
 
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.layout = compute_layout(window_size)
+        self.screen = pygame.display.set_mode(self.layout.window_size, pygame.RESIZABLE)
         self.clock = pygame.time.Clock()
 
         self.pile = []
+        self.cards = []
+        self.state = None
+        self.seed = None
         self.stock = None
         self.waste = None
         self.foundations = []
         self.tableau = []
         self.slots = []
 
-        self.new_game_rect = pygame.Rect(400, 600, 200, 40)
-        self.victory_rect = pygame.Rect(350, 250, 300, 80)
+        self.texture_size = self.layout.card_size
+        self.new_game_rect = self.layout.new_game_rect
+        self.victory_rect = self.layout.victory_rect
+
+        self.dirty_rendering = dirty_rendering
+        self.dirty_rects = [self.screen.get_rect()]
+
+        self.font = pygame.font.SysFont('mspgothic', self.layout.font_size)
+        self.victory_font = pygame.font.SysFont('mspgothic', self.layout.victory_font_size)
+        self.button_image = self.render_button()
+        self.background = None
+        self.background_key = None
+        self.stack_surfaces = {}
+
+        self.hit_columns = []
+        self.drag_source = None
+        self.drag_depth = 0
+        self.drag_pile = []
+        self.drag_offset = (0, 0)
+        self.mouse_pos = (0, 0)
+        self.low_latency = low_latency
+        self.lazy_faces = lazy_faces
+        set_lazy_loading(lazy_faces)
+        self.autosaver = Autosaver(save_path) if save_path is not None else None
+
+        self.journal = MoveJournal(undo_depth)
+        self.replay_dir = replay_dir
+        self.replay = None
+
+        self.move_index = None
+        self.hint = None
+
+        self.profiler = profiler
+        self.show_hud = False
+        self.hud_surface = None
+        self.hud_key = None
+
+        self.deal_library = deal_library
+        self.deal_winnable = None
+        self.deal_tier = None
+
+        self.rules = rules
+        self.score_surface = None
+        self.score_key = None
+
+        self.next_deal = None
+        self.victory = False
+        self.telemetry = telemetry
 
     def create_slots(self):
         """
@@ -98,25 +333,21 @@ class Game:
         This method creates instances of the Slot class for various game components such as stock, waste, foundations,
         and tableau piles. The slots are positioned on the screen, and the list 'slots' is populated accordingly.
 
-        The stock and waste slots are positioned at (100, 100) and (225, 100) respectively.
-        The foundation slots are positioned starting from (475, 100) with a gap of 125 units.
-        The tableau slots are positioned starting from (100, 300) with a gap of 125 units.
+        In a SCREEN_WIDTH x SCREEN_HEIGHT window, the stock and waste slots are positioned at (100, 100) and
+        (225, 100) respectively, the foundation slots start from (475, 100) and the tableau slots from (100, 300), with
+        a gap of 125 units. Other window sizes scale these positions, see layout.compute_layout.
 
-        All slots have dimensions defined by CARD_WIDTH and CARD_HEIGHT,
+        All slots have the card size of the layout, CARD_WIDTH x CARD_HEIGHT at the design size,
         color defined by WHITE, and border width defined by BORDER_WIDTH.
         """
-        self.stock = Slot(100, 100, CARD_WIDTH, CARD_HEIGHT, WHITE, BORDER_WIDTH)
-        self.waste = Slot(225, 100, CARD_WIDTH, CARD_HEIGHT, WHITE, BORDER_WIDTH)
-
-        x = 475
-        for i in range(4):
-            self.foundations.append(Slot(x, 100, CARD_WIDTH, CARD_HEIGHT, WHITE, BORDER_WIDTH))
-            x += 125
-
-        x = 100
-        for i in range(7):
-            self.tableau.append(Slot(x, 300, CARD_WIDTH, CARD_HEIGHT, WHITE, BORDER_WIDTH))
-            x += 125
+        layout = self.layout
+        slots = [
+            Slot(x, y, *layout.card_size, WHITE, BORDER_WIDTH, layout.fan_offset) for x, y in layout.slot_positions
+        ]
+        self.stock = slots[STOCK]
+        self.waste = slots[WASTE]
+        self.foundations.extend(slots[index] for index in FOUNDATIONS)
+        self.tableau.extend(slots[index] for index in TABLEAU)
 
         self.slots.append(self.stock)
         self.slots.append(self.waste)
@@ -127,70 +358,410 @@ class Game:
         for slot in self.tableau:
             self.slots.append(slot)
 
-    def handle_events(self):
+        self.build_hit_index()
+
+    def build_hit_index(self):
+        """
+        Index the slots by the screen columns they span.
+
+        A point is then matched against the one or two slots of its column, and the card under it is found from the
+        slot's layout instead of testing every card.
+        """
+        columns = [[] for _ in range(self.screen.get_width())]
+        for index, slot in enumerate(self.slots):
+            for x in range(max(slot.rect.left, 0), min(slot.rect.right, len(columns))):
+                columns[x].append(index)
+        self.hit_columns = [tuple(column) for column in columns]
+
+    def layout_slot(self, index: int):
+        """
+        Position the cards of a slot: stacked on top of each other for the stock, waste and foundations, one below the
+        other for the tableau.
+        :param index: Index of the slot.
+        """
+        if index in TABLEAU:
+            self.slots[index].layout()
+        else:
+            self.slots[index].layout_stock()
+
+    def resize(self, window_size: tuple):
+        """
+        Lay the game out again for a new window size, while the window is being resized.
+
+        The cards show quick previews of their images, scaled without filtering from the textures they showed, so a
+        live resize does not scale the card images smoothly on every frame. finish_resize swaps in the smoothly
+        scaled textures once no resize happened for RESIZE_SETTLE_MS milliseconds.
+        :param window_size: Tuple (width, height) of the window.
+        """
+        self.cancel_drag()
+        window_size = compute_layout(window_size).window_size
+        if self.screen.get_size() != window_size:
+            self.screen = pygame.display.set_mode(window_size, pygame.RESIZABLE)
+        self.layout = compute_layout(self.screen.get_size())
+        self.apply_layout(self.texture_size)
+        pygame.time.set_timer(RESIZE_SETTLED, RESIZE_SETTLE_MS, 1)
+
+    def finish_resize(self):
+        """
+        Swap the card previews for the smoothly scaled textures of the layout's card size, from the texture cache,
+        and render the text at the layout's font sizes.
+
+        Textures of a size without an atlas are first decoded on the prefetcher thread while the previews stay on
+        screen, checking again every RESIZE_POLL_MS milliseconds, so the main thread does not stall scaling them.
+        """
+        layout = self.layout
+        names = [BACK_IMAGE_NAME] + [card.face_name() for card in self.cards if card.face_up or not self.lazy_faces]
+        if not textures_ready(names, layout.card_size):
+            pygame.time.set_timer(RESIZE_SETTLED, RESIZE_POLL_MS, 1)
+            return
+        self.texture_size = layout.card_size
+        self.apply_layout()
+        self.font = pygame.font.SysFont('mspgothic', layout.font_size)
+        self.victory_font = pygame.font.SysFont('mspgothic', layout.victory_font_size)
+        self.button_image = self.render_button()
+        self.score_surface = None
+        self.hud_surface = None
+
+    def apply_layout(self, source_size: tuple = None):
+        """
+        Move and resize the slots, the cards and the buttons to the current layout.
+        :param source_size: Tuple (width, height) of the textures card previews are scaled from, or None to show the
+        smoothly scaled textures.
+        """
+        layout = self.layout
+        for card in self.cards:
+            card.resize(layout.card_size, source_size)
+        for index, slot in enumerate(self.slots):
+            slot.resize(*layout.slot_positions[index], *layout.card_size, layout.fan_offset)
+            self.layout_slot(index)
+        self.new_game_rect = layout.new_game_rect
+        self.victory_rect = layout.victory_rect
+        if self.button_image.get_size() != self.new_game_rect.size:
+            self.button_image = pygame.transform.scale(self.button_image, self.new_game_rect.size)
+        self.build_hit_index()
+        self.background_key = None
+        self.mark_dirty()
+
+    def slots_at(self, pos: tuple) -> tuple:
+        """
+        Get the slots whose column spans a point.
+        :param pos: Tuple containing the point's position.
+        :return: Tuple of slot indexes.
+        """
+        if 0 <= pos[0] < len(self.hit_columns):
+            return self.hit_columns[pos[0]]
+        return ()
+
+    def cancel_drag(self):
+        """
+        Put the dragged cards back and forget the drag group.
+        """
+        if self.drag_source is not None:
+            self.layout_slot(self.drag_source)
+        self.drag_source = None
+        self.drag_depth = 0
+        self.drag_pile = []
+        self.drag_offset = (0, 0)
+
+    def mark_dirty(self, rect: pygame.Rect = None):
+        """
+        Mark a region of the screen as changed so it is redrawn and pushed to the display.
+        :param rect: Pygame rect object of the changed region, or None to mark the whole screen.
+        """
+        if rect is None:
+            rect = self.screen.get_rect()
+        self.dirty_rects.append(rect)
+
+    def get_dragged_cards(self) -> list:
+        """
+        Get the cards that are currently being dragged.
+        :return: List of Card objects being dragged, in the order they are drawn.
+        """
+        return self.drag_pile
+
+    def get_drag_rect(self):
+        """
+        Get the region of the screen covered by the dragged cards.
+        :return: Pygame rect object covering every dragged card, or None if nothing is being dragged.
+        """
+        dragged_cards = self.get_dragged_cards()
+        if not dragged_cards:
+            return None
+        return dragged_cards[0].rect.unionall([card.rect for card in dragged_cards[1:]])
+
+    def handle_events(self, events: list = None):
         """
         Handle all the events in the game.
 
         It loops through all the pygame events and performs actions based on the type of the event.
 
-        The method handles three types of events: pygame.QUIT, pygame.MOUSEBUTTONDOWN, and pygame.MOUSEBUTTONUP.
-        For pygame.MOUSEBUTTONDOWN, it checks if the mouse position collides with any card or button and performs the
-        corresponding action. For pygame.MOUSEBUTTONUP, it stops dragging the card and checks if the card can be placed
-        in the target slot.
+        The method handles five types of events: pygame.QUIT, pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN,
+        pygame.MOUSEBUTTONUP and pygame.MOUSEMOTION. For pygame.KEYDOWN, Ctrl+Z undoes the last move and Ctrl+Y or
+        Ctrl+Shift+Z redoes it, H highlights a hint, A sends every card it can to the foundations and F3 toggles the
+        performance HUD when profiling. For pygame.MOUSEBUTTONDOWN, it checks if the mouse position collides with any
+        card or button and performs the corresponding action. For pygame.MOUSEBUTTONUP, it stops dragging the card and
+        checks if the card can be placed in the target slot. For pygame.MOUSEMOTION, it marks the region of the dragged
+        cards as changed. Clicks and drops mark the whole screen as changed. pygame.VIDEORESIZE lays the game out for
+        the new window size with quick previews of the card images, swapped for smooth ones once the size settles.
+        While the victory screen is shown, a click or a key press starts the next game, as VICTORY_ENDED does when it
+        expires.
+        :param events: List of events to handle, or None to take the pending events from the event queue.
         """
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        if events is None:
+            events = pygame.event.get()
+        profiler = self.profiler
+        if profiler is not None:
+            received = time.perf_counter_ns()
+            dirty = len(self.dirty_rects)
+        for event in events:
+            if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                self.mouse_pos = event.pos
+            if self.victory and event.type in (pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN):
+                self.restart_game()
+            elif event.type == pygame.QUIT:
+                self.close_replay()
+                if self.autosaver is not None:
+                    self.autosaver.close()
+                if self.telemetry is not None:
+                    self.abandon_game()
+                    self.telemetry.close()
+                if self.profiler is not None:
+                    self.profiler.close()
                 pygame.quit()
                 sys.exit()
+            elif event.type == pygame.KEYDOWN and event.mod & pygame.KMOD_CTRL:
+                if event.key == pygame.K_z and not event.mod & pygame.KMOD_SHIFT:
+                    self.undo_move()
+                elif event.key in (pygame.K_y, pygame.K_z):
+                    self.redo_move()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_h:
+                    self.show_hint()
+                elif event.key == pygame.K_a:
+                    self.auto_send()
+                elif event.key == pygame.K_F3 and self.profiler is not None:
+                    self.show_hud = not self.show_hud
+                    self.mark_dirty()
+            elif event.type == pygame.MOUSEMOTION:
+                drag_rect = self.get_drag_rect()
+                if drag_rect is not None:
+                    self.mark_dirty(drag_rect)
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+                self.mark_dirty()
+            elif event.type == pygame.VIDEORESIZE:
+                self.resize(event.size)
+            elif event.type == RESIZE_SETTLED:
+                self.finish_resize()
+            elif event.type == VICTORY_ENDED:
+                if self.victory:
+                    self.restart_game()
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                for slot in self.slots[1:]:
-                    for card in reversed(slot.pile):
-                        if card.face_up is False:
-                            break
-                        if card.rect.collidepoint(event.pos):
-                            slot.start_dragging(event.pos, card)
-                            slot.rect.height = slot.original_height
-                            break
+                self.mark_dirty()
+                self.cancel_drag()
+                for index in self.slots_at(event.pos):
+                    slot = self.slots[index]
+                    depth = slot.card_index_at(event.pos)
+                    if index != STOCK and depth >= 0 and depth >= len(slot.pile) - self.state.face_up[index]:
+                        self.drag_source = index
+                        self.drag_depth = depth
+                        self.drag_pile = slot.get_draggable_pile(slot.pile[depth])
+                        card_rect = self.drag_pile[0].rect
+                        self.drag_offset = (event.pos[0] - card_rect.x, event.pos[1] - card_rect.y)
+                        slot.rect.height = slot.original_height
+                        break
                 if self.slots[0].rect.collidepoint(event.pos):
                     # If the stock pile is empty, put the waste pile onto the stock pile
                     if self.slots[0].is_empty():
-                        for card in reversed(self.slots[1].pile):
-                            card.turn_face_down(self.screen)
-                            self.slots[1].remove_card(card)
-                            self.slots[0].place_card(card)
+                        move = Move(WASTE, STOCK, len(self.slots[1].pile))
                     else:
-                        self.slots[1].place_card(self.slots[0].pile.pop())
-                        self.slots[1].get_top_card().turn_face_up(self.screen)
+                        move = Move(STOCK, WASTE, self.rules.draw_size(len(self.slots[0].pile)))
+                    if self.state.can_move(move):
+                        self.apply_move(move)
                 if self.new_game_rect.collidepoint(event.pos):
                     self.restart_game()
             elif event.type == pygame.MOUSEBUTTONUP:
-                for slot in self.slots:
-                    for card in slot.pile:
-                        if card.dragging:
-                            card.stop_dragging()
-                            # Tableau slots
-                            for target_slot in self.slots[6:]:
-                                if target_slot.rect.collidepoint(event.pos) and check_tableau_rules(card, target_slot):
-                                    draggable_pile = slot.get_draggable_pile(card)
-                                    slot.remove_pile(draggable_pile)
-                                    if slot.is_empty() is False:
-                                        slot.get_top_card().turn_face_up(self.screen)
-                                    target_slot.place_pile(draggable_pile)
-                            # Foundation slots
-                            for target_slot in self.slots[2:6]:
-                                if (
-                                    target_slot.rect.collidepoint(event.pos)
-                                    and check_foundations_rules(card, target_slot)
-                                ):
-                                    if len(slot.get_draggable_pile(card)) > 1:
-                                        # Place the entire pile to the target slot
-                                        for pile_card in slot.get_draggable_pile(card):
-                                            pile_card.stop_dragging()
-                                        break
-                                    slot.remove_card(card)
-                                    if slot.is_empty() is False:
-                                        slot.get_top_card().turn_face_up(self.screen)
-                                    target_slot.place_card(card)
+                self.mark_dirty()
+                if self.drag_source is None:
+                    continue
+                source, slot = self.drag_source, self.slots[self.drag_source]
+                targets = [
+                    index for index in self.slots_at(event.pos) if self.slots[index].rect.collidepoint(event.pos)
+                ]
+                # Cards left in the source pile after a move are still dragged and tried in turn
+                for depth in range(self.drag_depth, self.drag_depth + len(self.drag_pile)):
+                    if depth >= len(slot.pile):
+                        break
+                    count = len(slot.pile) - depth
+                    # Tableau slots
+                    for target in targets:
+                        move = Move(source, target, count)
+                        if target in TABLEAU and self.state.can_move(move):
+                            self.apply_move(move)
+                            break
+                    # Foundation slots
+                    dropped = False
+                    for target in targets:
+                        if target in FOUNDATIONS and self.state.can_place(self.state.piles[source][-count], target):
+                            if count > 1:
+                                # A pile cannot go to the foundations: drop the entire pile
+                                dropped = True
+                                break
+                            self.apply_move(Move(source, target, count))
+                    if dropped:
+                        break
+                self.layout_slot(source)
+                self.drag_source = None
+                self.drag_depth = 0
+                self.drag_pile = []
+                self.drag_offset = (0, 0)
+        if profiler is not None and len(self.dirty_rects) > dirty:
+            profiler.input(received)
+
+    def apply_move(self, move: Move, record: bool = True) -> Move:
+        """
+        Apply a legal move to the game state and mirror it on the slots.
+        :param move: Move to be applied.
+        :param record: Whether to record the move in the journal, discarding the moves that could be redone.
+        :return: The applied Move, recording whether a card was turned face up.
+        """
+        move = self.state.apply(move)
+        self.move_index.update(move)
+        self.hint = None
+        if record:
+            self.journal.record(move)
+            if self.replay is not None:
+                self.replay.write_move(move)
+            if self.telemetry is not None:
+                kind = RECYCLE if move.source == WASTE and move.target == STOCK else MOVE
+                self.telemetry.record(kind, move.source, move.target, move.count)
+        source_slot = self.slots[move.source]
+        target_slot = self.slots[move.target]
+        if move.source == WASTE and move.target == STOCK:
+            for card in source_slot.pile[::-1]:
+                card.turn_face_down(self.screen)
+                source_slot.remove_card(card)
+                target_slot.place_card(card)
+        elif move.source == STOCK:
+            for _ in range(move.count):
+                card = source_slot.get_top_card()
+                source_slot.remove_card(card)
+                target_slot.place_card(card)
+                card.turn_face_up(self.screen)
+        elif move.target in TABLEAU:
+            draggable_pile = source_slot.pile[-move.count:]
+            source_slot.remove_pile(draggable_pile)
+            if move.flip:
+                source_slot.get_top_card().turn_face_up(self.screen)
+            target_slot.place_pile(draggable_pile)
+        else:
+            card = source_slot.get_top_card()
+            source_slot.remove_card(card)
+            if move.flip:
+                source_slot.get_top_card().turn_face_up(self.screen)
+            target_slot.place_card(card)
+        self.layout_slot(move.source)
+        self.layout_slot(move.target)
+        self.save_game()
+        if self.lazy_faces:
+            self.prefetch_faces()
+        return move
+
+    def revert_move(self, move: Move):
+        """
+        Undo an applied move on the game state and on the slots, moving back only the cards the move moved.
+        :param move: Move returned by apply_move.
+        """
+        self.state.undo(move)
+        self.move_index.update(move)
+        self.hint = None
+        source_slot = self.slots[move.source]
+        target_slot = self.slots[move.target]
+        if move.source == WASTE and move.target == STOCK:
+            for card in target_slot.pile[::-1]:
+                target_slot.remove_card(card)
+                source_slot.place_card(card)
+                card.turn_face_up(self.screen)
+        elif move.source == STOCK:
+            for _ in range(move.count):
+                card = target_slot.get_top_card()
+                target_slot.remove_card(card)
+                card.turn_face_down(self.screen)
+                source_slot.place_card(card)
+        else:
+            if move.flip:
+                source_slot.get_top_card().turn_face_down(self.screen)
+            if move.target in TABLEAU:
+                draggable_pile = target_slot.pile[-move.count:]
+                target_slot.remove_pile(draggable_pile)
+                if move.source in TABLEAU:
+                    source_slot.place_pile(draggable_pile)
+                else:
+                    source_slot.place_card(draggable_pile[0])
+            else:
+                card = target_slot.get_top_card()
+                target_slot.remove_card(card)
+                source_slot.place_card(card)
+        self.layout_slot(move.source)
+        self.layout_slot(move.target)
+        self.save_game()
+        if self.lazy_faces:
+            self.prefetch_faces()
+
+    def undo_move(self) -> bool:
+        """
+        Undo the last move recorded in the journal.
+        :return: true if a move was undone, false if there was none.
+        """
+        move = self.journal.undo()
+        if move is None:
+            return False
+        if self.replay is not None:
+            self.replay.write_undo()
+        if self.telemetry is not None:
+            self.telemetry.record(UNDO, move.source, move.target, move.count)
+        self.cancel_drag()
+        self.revert_move(move)
+        self.mark_dirty()
+        return True
+
+    def redo_move(self) -> bool:
+        """
+        Apply again the last move undone from the journal.
+        :return: true if a move was redone, false if there was none.
+        """
+        move = self.journal.redo()
+        if move is None:
+            return False
+        if self.replay is not None:
+            self.replay.write_redo()
+        if self.telemetry is not None:
+            self.telemetry.record(REDO, move.source, move.target, move.count)
+        self.cancel_drag()
+        self.apply_move(move, record=False)
+        self.mark_dirty()
+        return True
+
+    def show_hint(self):
+        """
+        Highlight the most useful legal move until the next move.
+        """
+        self.hint = self.move_index.hint()
+        self.mark_dirty()
+
+    def auto_send(self) -> int:
+        """
+        Move cards from the waste and the tableau to the foundations until none can go.
+        :return: Number of cards moved.
+        """
+        self.cancel_drag()
+        moved = 0
+        move = self.move_index.foundation_move()
+        while move is not None:
+            self.apply_move(move)
+            moved += 1
+            move = self.move_index.foundation_move()
+        self.mark_dirty()
+        return moved
 
     def create_card_deck(self):
         """
@@ -199,36 +770,16 @@ class Game:
         This method creates a standard deck of 52 playing cards. The deck consists of four suites:
         hearts, diamonds, clubs, and spades. Each suite has 13 ranks: Ace, 2-10, Jack, Queen, and King.
 
-        Each card is created with a position of (100, 100), dimensions defined by CARD_WIDTH and CARD_HEIGHT,
-        and the corresponding suite and rank.
+        Each card is created with a position of (100, 100), the card size of the layout,
+        and the corresponding suite and rank, shared by every card of the suite or rank. The deck is ordered by the
+        cards' encoded values.
         """
-        suites = [
-            Suite("hearts", "RED"),
-            Suite("diamonds", "RED"),
-            Suite("clubs", "BLACK"),
-            Suite("spades", "BLACK"),
-        ]
-        ranks = [
-            Rank("Ace", 1),
-            Rank("2", 2),
-            Rank("3", 3),
-            Rank("4", 4),
-            Rank("5", 5),
-            Rank("6", 6),
-            Rank("7", 7),
-            Rank("8", 8),
-            Rank("9", 9),
-            Rank("10", 10),
-            Rank("Jack", 11),
-            Rank("Queen", 12),
-            Rank("King", 13),
-        ]
-
-        for suite in suites:
-            for rank in ranks:
-                self.pile.append(Card(100, 100, CARD_WIDTH, CARD_HEIGHT, suite, rank))
+        for suite in SUITES:
+            for rank in RANKS:
+                self.pile.append(Card(100, 100, *self.layout.card_size, suite, rank))
+        self.cards = list(self.pile)
 
-    def deal_cards(self):
+    def deal_cards(self, seed: int = None, prepared: PreparedDeal = None):
         """
         Shuffle and deal the cards to the slots.
 
@@ -237,138 +788,538 @@ class Game:
         Each tableau slot receives one card more than the previous slot in each round until all slots have cards.
 
         The remaining cards are placed in the stock. The top card of each tableau slot is then turned face up.
+
+        The deal is made on the headless game state and the slots are then filled from it. The next deal is then
+        prepared in the background.
+        :param seed: Seed of the deal, or None to pick a random one.
+        :param prepared: Deal already made by prepare_deal, or None to make it from the seed.
+        """
+        if prepared is None:
+            prepared = prepare_deal(seed, self.rules)
+        seed = prepared.seed
+        self.seed = seed
+        self.journal.clear()
+        if self.replay_dir is not None:
+            self.close_replay()
+            os.makedirs(self.replay_dir, exist_ok=True)
+            self.replay = ReplayWriter(replay_path(self.replay_dir, seed), seed, self.rules.name)
+        self.pile = [self.cards[card] for card in prepared.deck]
+        self.state = prepared.state
+        self.move_index = prepared.move_index
+        self.hint = None
+        self.fill_slots()
+        self.save_game()
+        if self.telemetry is not None:
+            self.telemetry.deal(seed)
+        self.prefetch_deal()
+
+    def fill_slots(self):
+        """
+        Place the cards of every pile of the game state on its slot, turning face up the cards the state shows face up.
         """
-        random.shuffle(self.pile)
+        for index, pile in enumerate(self.state.piles):
+            slot = self.slots[index]
+            cards = [self.cards[card] for card in pile]
+            if index in TABLEAU:
+                slot.place_pile(cards)
+            else:
+                for card in cards:
+                    slot.place_card(card)
+            for card in cards[len(cards) - self.state.face_up[index]:]:
+                card.turn_face_up(self.screen)
+            self.layout_slot(index)
+        if self.lazy_faces:
+            self.prefetch_faces()
 
-        first_slot = 0
-        remaining_cards = self.pile
-        card_list = []
+    def prefetch_faces(self):
+        """
+        Have the faces likely to be turned up next decoded in the background: the top face-down card of every tableau
+        pile, then the next cards drawn from the stock, or the first cards of the waste if the stock is empty, then the
+        face-down cards below them, as moves sending several cards to the foundations turn them up at once.
+        """
+        state = self.state
+        draw_count = self.rules.draw_count
+        cards = []
+        for depth in range(1, PREFETCH_DEPTH + 1):
+            for index in TABLEAU:
+                hidden = len(state.piles[index]) - state.face_up[index]
+                if hidden >= depth:
+                    cards.append(state.piles[index][hidden - depth])
+            if state.piles[STOCK]:
+                stock = state.piles[STOCK]
+                cards.extend(stock[max(len(stock) - depth * draw_count, 0):len(stock) - (depth - 1) * draw_count][::-1])
+            else:
+                cards.extend(state.piles[WASTE][(depth - 1) * draw_count:depth * draw_count])
+        prefetch_textures([self.cards[card].face_name() for card in cards], self.texture_size)
+
+    def save_game(self):
+        """
+        Hand a snapshot of the game over to the autosaver, if any. Encoding the snapshot takes a few microseconds;
+        the file is written later by the autosaver's thread.
+        """
+        if self.autosaver is not None:
+            self.autosaver.submit(encode_save(self.state, self.seed, self.journal))
 
-        while first_slot < len(self.slots[6:]):
-            for slot in self.slots[6:][first_slot:]:
-                top_card = remaining_cards[0]
-                top_card.rect.topleft = slot.rect.topleft
-                card_list.append(top_card)
-                slot.place_pile(card_list)
-                card_list.remove(top_card)
-                remaining_cards.remove(top_card)
-            first_slot += 1
+    def resume_game(self) -> bool:
+        """
+        Resume the game saved by the autosaver, on slots and a card deck freshly created.
 
-        for card in remaining_cards:
-            self.stock.place_card(card)
+        The game continues with the saved variant, which new deals then keep. A resumed game is not recorded as a
+        replay, since its replay would have to start from the deal.
+        :return: true if the game was resumed, false if there is no save or it could not be read.
+        """
+        if self.autosaver is None:
+            return False
+        try:
+            state, seed, journal = load_save(self.autosaver.path, self.journal.max_depth)
+        except (OSError, ValueError):
+            return False
+        self.close_replay()
+        self.seed = seed
+        self.rules = state.rules
+        self.state = state
+        self.journal = journal
+        self.pile = [self.cards[card] for card in shuffled_deck(seed)]
+        self.move_index = MoveIndex(self.state)
+        self.hint = None
+        self.fill_slots()
+        self.mark_dirty()
+        if self.telemetry is not None:
+            self.telemetry.seed = seed
+        self.prefetch_deal()
+        return True
 
-        for slot in self.slots[6:]:
-            slot.get_top_card().turn_face_up(self.screen)
+    def close_replay(self):
+        """
+        Flush and close the recording of the current deal, if any.
+        """
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
 
     def run(self):
         """
         Run the main game loop.
+
+        With dirty rendering, a frame is only drawn when a region changed, only the changed regions are pushed to the
+        display, and the loop blocks on the event queue while nothing changes.
+
+        With a profiler, every phase of the frame is timed; without one, the loop only pays for a check per phase.
+
+        In low latency mode, the loop of run_low_latency is run instead.
         """
+        if self.low_latency:
+            self.run_low_latency()
+        profiler = self.profiler
+        if not self.dirty_rendering:
+            while True:
+                if profiler is not None:
+                    profiler.start_frame()
+                    profiler.start_draw()
+                self.draw_game()
+                if self.show_hud:
+                    self.draw_hud()
+                if profiler is not None:
+                    profiler.mark(DRAW)
+                self.handle_events()
+                if profiler is not None:
+                    profiler.mark(EVENTS)
+
+                won = self.check_win()
+                if profiler is not None:
+                    profiler.mark(CHECK_WIN)
+                if won and not self.victory:
+                    self.show_victory()
+                    if profiler is not None:
+                        profiler.mark(WIN_SCREEN)
+
+                pygame.display.flip()
+                if profiler is not None:
+                    profiler.presented()
+                    profiler.mark(DISPLAY)
+                self.clock.tick(FPS)
+                if profiler is not None:
+                    profiler.mark(IDLE)
+                    profiler.end_frame()
+
         while True:
-            self.draw_game()
-            self.handle_events()
+            if profiler is not None:
+                profiler.start_frame()
+            rects = self.dirty_rects
+            self.dirty_rects = []
+            if rects:
+                if profiler is not None:
+                    profiler.start_draw()
+                self.draw_game()
+                drag_rect = self.get_drag_rect()
+                if drag_rect is not None:
+                    rects.append(drag_rect)
+                if self.show_hud:
+                    rects.append(self.draw_hud())
+                if profiler is not None:
+                    profiler.mark(DRAW)
+                self.handle_events()
+            else:
+                events = self.wait_events()
+                if profiler is not None:
+                    profiler.mark(IDLE)
+                self.handle_events(events)
+            if profiler is not None:
+                profiler.mark(EVENTS)
 
-            if self.check_win():
-                self.draw_win_screen()
+            won = self.check_win()
+            if profiler is not None:
+                profiler.mark(CHECK_WIN)
+            if won and not self.victory:
+                self.show_victory()
+                if profiler is not None:
+                    profiler.mark(WIN_SCREEN)
 
-            pygame.display.flip()
+            if rects:
+                pygame.display.update(rects)
+                if profiler is not None:
+                    profiler.presented()
+            if profiler is not None:
+                profiler.mark(DISPLAY)
             self.clock.tick(FPS)
+            if profiler is not None:
+                profiler.mark(IDLE)
+                profiler.end_frame()
+
+    def allow_input_events(self):
+        """
+        Restrict the event queue to the events the game handles, INPUT_EVENTS, so SDL drops every other event before
+        it is queued.
+        """
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(INPUT_EVENTS)
+
+    def run_low_latency(self):
+        """
+        Run the main game loop in low latency mode.
+
+        Every frame first takes the pending events, coalescing mouse motions, and handles them, then draws and pushes
+        the frame, so a click or a drop is shown by the frame that follows it instead of one frame later. The dragged
+        cards follow the mouse position of the last event instead of the position polled while drawing.
+
+        With dirty rendering, a frame is only drawn when a region changed and the loop blocks on the event queue while
+        nothing changes, as in run.
+        """
+        profiler = self.profiler
+        self.allow_input_events()
+        while True:
+            if profiler is not None:
+                profiler.start_frame()
+            if self.dirty_rects or not self.dirty_rendering:
+                events = pygame.event.get()
+            else:
+                events = self.wait_events()
+                if profiler is not None:
+                    profiler.mark(IDLE)
+            self.handle_events(coalesce_motion(events))
+            if profiler is not None:
+                profiler.mark(EVENTS)
+
+            won = self.check_win()
+            if profiler is not None:
+                profiler.mark(CHECK_WIN)
+            if won and not self.victory:
+                self.show_victory()
+                if profiler is not None:
+                    profiler.mark(WIN_SCREEN)
+
+            rects = self.dirty_rects
+            self.dirty_rects = []
+            if rects or not self.dirty_rendering:
+                if profiler is not None:
+                    profiler.start_draw()
+                self.draw_game()
+                drag_rect = self.get_drag_rect()
+                if drag_rect is not None:
+                    rects.append(drag_rect)
+                if self.show_hud:
+                    rects.append(self.draw_hud())
+                if profiler is not None:
+                    profiler.mark(DRAW)
+                if self.dirty_rendering:
+                    pygame.display.update(rects)
+                else:
+                    pygame.display.flip()
+                if profiler is not None:
+                    profiler.presented()
+            if profiler is not None:
+                profiler.mark(DISPLAY)
+            self.clock.tick(FPS)
+            if profiler is not None:
+                profiler.mark(IDLE)
+                profiler.end_frame()
+
+    def wait_events(self) -> list:
+        """
+        Block until at least one event arrives.
+        :return: List of the pending events.
+        """
+        return [pygame.event.wait()] + pygame.event.get()
 
     def check_win(self):
         """
         Check if the player has won the game by completing the foundations.
         :return: true if the player has won by completing the foundations, false otherwise.
         """
-        cards_num = 0
-        for slot in self.slots[2:6]:
-            cards_num += len(slot.pile)
-        if cards_num == 52:
-            return True
-        return False
+        return self.state.is_won()
+
+    def set_deal_filter(self, winnable: bool = None, tier: str = None):
+        """
+        Choose which deals of the library the next games are picked from.
+        :param winnable: True for winnable deals, False for deals proven lost, None for any deal.
+        :param tier: Name of a difficulty tier of library.TIERS, implying winnable deals, or None for any tier.
+        """
+        self.deal_winnable = winnable
+        self.deal_tier = tier
+        if self.next_deal is not None:
+            self.prefetch_deal()
+
+    def select_deal(self) -> int:
+        """
+        Pick the seed of the next deal from the library, with the current filter. A library analyzed with another
+        variant than the one played, as after resuming a game of another variant, is not used.
+        :return: Seed of a matching deal, or None if there is no library of the variant or no matching deal.
+        """
+        if self.deal_library is None or self.deal_library.variant != self.rules.name:
+            return None
+        record = self.deal_library.select(self.deal_winnable, self.deal_tier)
+        return record.seed if record is not None else None
+
+    def prefetch_deal(self):
+        """
+        Prepare the next deal on DEAL_EXECUTOR, picked with the current deal filter and rules, replacing the one
+        prepared before if any.
+        """
+        self.next_deal = DEAL_EXECUTOR.submit(prepare_deal, self.select_deal(), self.rules)
+
+    def take_next_deal(self) -> PreparedDeal:
+        """
+        Take the prepared next deal, waiting for it if it is not ready yet, or make one if there is none or it was
+        prepared for other rules.
+        :return: PreparedDeal object.
+        """
+        future, self.next_deal = self.next_deal, None
+        if future is not None:
+            prepared = future.result()
+            if prepared.state.rules is self.rules:
+                return prepared
+        return prepare_deal(self.select_deal(), self.rules)
+
+    def clear_slots(self):
+        """
+        Remove every card from the slots and turn it face down, keeping the slots and the cards for the next deal.
+        """
+        for slot in self.slots:
+            slot.clear()
+        for card in self.cards:
+            card.face_up = False
 
     def restart_game(self):
         """
-        Restart the game by resetting slots, creating a new card deck, and dealing cards.
+        Restart the game by clearing the slots and dealing the next deal on them.
 
-        This method resets the game state, creating a new card deck, shuffling, and dealing cards to the tableau slots.
+        The slots and the cards of the current game are reused, and the deal was prepared in the background while the
+        current game was played, so only the cards are laid out again. With a deal library, the deal is picked from
+        the library's deals matching the deal filter.
         """
-        self.pile = []
-        self.stock = None
-        self.waste = None
-        self.foundations = []
-        self.tableau = []
-        self.slots = []
+        self.cancel_drag()
+        if self.victory:
+            self.victory = False
+            pygame.time.set_timer(VICTORY_ENDED, 0)
+        elif self.telemetry is not None:
+            self.abandon_game()
+        if not self.slots:
+            self.create_slots()
+            self.create_card_deck()
+        self.clear_slots()
+        self.deal_cards(prepared=self.take_next_deal())
+        self.mark_dirty()
+
+    def abandon_game(self):
+        """
+        Record that the current game is left unfinished, if it was dealt and is not won.
+        """
+        if self.state is not None and not self.state.is_won():
+            self.telemetry.record(ABANDON)
 
-        self.create_slots()
-        self.create_card_deck()
-        self.deal_cards()
+    def show_victory(self):
+        """
+        Show the victory screen over the won game for VICTORY_MS milliseconds, after which VICTORY_ENDED starts the
+        next game. Events are still handled meanwhile.
+        """
+        self.cancel_drag()
+        self.victory = True
+        if self.telemetry is not None:
+            self.telemetry.record(WIN)
+        self.mark_dirty()
+        pygame.time.set_timer(VICTORY_ENDED, VICTORY_MS, 1)
 
     def draw_win_screen(self):
         """
-        Draw the victory screen and restart the game.
+        Draw the victory screen.
 
         This method draws a victory screen with a black rectangle filled with white border.
         It then renders the text 'VICTORY' in white and blits it to the screen at the center of the victory rectangle.
-        The screen is updated and a delay of 3000 milliseconds is introduced before the game is restarted.
         """
         pygame.draw.rect(self.screen, BLACK, self.victory_rect)
         pygame.draw.rect(self.screen, WHITE, self.victory_rect, BORDER_WIDTH)
-        font = pygame.font.SysFont('mspgothic', 36)
-        text = font.render('VICTORY', False, WHITE)
+        text = self.victory_font.render('VICTORY', False, WHITE)
         text_rect = text.get_rect(center=self.victory_rect.center)
 
         self.screen.blit(text, text_rect)
-        pygame.display.flip()
-        pygame.time.wait(3000)  # in milliseconds
 
-        self.restart_game()
+    def render_button(self) -> pygame.Surface:
+        """
+        Render the 'New Game' button with its border and text on a transparent surface.
+        :return: Pygame.Surface object of the size of the button.
+        """
+        button_image = pygame.Surface(self.new_game_rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(button_image, WHITE, button_image.get_rect(), BORDER_WIDTH)
+        text = self.font.render('NEW GAME', False, WHITE)
+        text_rect = text.get_rect(center=button_image.get_rect().center)
+        button_image.blit(text, text_rect)
+        return button_image
+
+    def build_background(self, layout_key: tuple):
+        """
+        Render the background layer: the black table and the outline of every slot.
+        :param layout_key: Layout of the slots the background is rendered for.
+        """
+        self.background = pygame.Surface(self.screen.get_size()).convert()
+        self.background.fill(BLACK)
+        for slot in self.slots:
+            slot.draw_outline(self.background)
+        self.background_key = layout_key
+        self.stack_surfaces = {}
+
+    def get_stack_surface(self, slot_index: int, cards: list) -> tuple:
+        """
+        Get the cached surface of a face-down stack, rendering it over the background if the stack changed.
+        :param slot_index: Index of the slot holding the stack.
+        :param cards: List of the face-down Card objects at the bottom of the slot's pile.
+        :return: Tuple (surface, position) ready to be blitted on the screen.
+        """
+        region = cards[0].rect.unionall([card.rect for card in cards[1:]])
+        key = (len(cards), tuple(region))
+        cached = self.stack_surfaces.get(slot_index)
+        if cached is None or cached[0] != key:
+            surface = pygame.Surface(region.size).convert()
+            surface.blit(self.background, (0, 0), region)
+            for card in cards:
+                surface.blit(card.back_image, (card.rect.x - region.x, card.rect.y - region.y))
+            cached = (key, surface)
+            self.stack_surfaces[slot_index] = cached
+        return cached[1], region.topleft
 
     def draw_game(self):
         """
         Draw the game state on the screen.
 
-        This method fills the screen with black color and then draws the stock and other slots.
-        It also handles the dragging of cards by updating their positions based on the mouse position.
-        It then draws the cards in the slots, with special handling for cards that are being dragged.
-        Finally, it draws the 'New Game' button on the screen.
+        The frame is composed from layers. The pre-rendered background holds the table and the slot outlines, and is
+        only rebuilt when the layout of the slots changes. The face-down cards at the bottom of each slot are drawn
+        from a cached stack surface. The waste and the foundations stack their cards on top of each other, so only
+        their top card is drawn, or the card under it while the top card is dragged, and the face-up tableau cards
+        covered by the next one are only drawn as the strip left visible. The frame cost thus does not grow with the
+        number of cards played. These cards, the dragged cards following the mouse position and then the 'New Game'
+        button are drawn with a single Surface.blits call in z-order. Thoughtful variants show the face of
+        every card, and Vegas variants show the score next to the button. The victory screen is drawn over a won game.
+
+        Cards are laid out when they move, so only the dragged cards are positioned here.
         """
-        self.screen.fill(BLACK)
+        layout_key = tuple(tuple(slot.rect) for slot in self.slots)
+        if layout_key != self.background_key:
+            self.build_background(layout_key)
+        self.screen.blit(self.background, (0, 0))
 
-        self.slots[0].draw_stock(self.screen)
-        self.slots[1].draw_stock(self.screen)
+        thoughtful = self.rules.thoughtful
+        blit_sequence = []
+        for slot_index, slot in enumerate(self.slots):
+            pile = slot.pile
+            if slot_index == self.drag_source:
+                pile = pile[:self.drag_depth]
+            if slot_index == WASTE or slot_index in FOUNDATIONS:
+                pile = pile[-1:]
+            face_down = 0
+            if not thoughtful or slot_index == STOCK:
+                face_down = min(len(pile), len(slot.pile) - self.state.face_up[slot_index])
+            if face_down:
+                blit_sequence.append(self.get_stack_surface(slot_index, pile[:face_down]))
+            visible = pile[face_down:]
+            # A covered card shows a strip of card_offset pixels, widened by half so the card's rounded corners are
+            # still drawn under the corners of the next card
+            strip = pygame.Rect(0, 0, slot.rect.width, slot.card_offset * 3 // 2)
+            for i, card in enumerate(visible, 1):
+                image = card.image if card.face_up or thoughtful else card.back_image
+                if i < len(visible) and slot.card_offset:
+                    blit_sequence.append((image, card.rect, strip))
+                else:
+                    blit_sequence.append((image, card.rect))
 
-        for slot in self.slots[2:6]:
-            slot.draw_stock(self.screen)
+        if self.drag_pile:
+            mouse_x, mouse_y = self.mouse_pos if self.low_latency else pygame.mouse.get_pos()
+            x, y = mouse_x - self.drag_offset[0], mouse_y - self.drag_offset[1]
+            card_offset = self.slots[self.drag_source].card_offset
+            for i, card in enumerate(self.drag_pile):
+                card.rect.topleft = (x, y + i * card_offset)
+                blit_sequence.append((card.image if card.face_up else card.back_image, card.rect))
 
-        for slot in self.slots[6:]:
-            slot.draw(self.screen)
+        blit_sequence.append((self.button_image, self.new_game_rect))
+        if self.rules.scoring == VEGAS_SCORING:
+            blit_sequence.append(self.get_score_surface())
+        self.screen.blits(blit_sequence, doreturn=False)
 
-        for slot in self.slots:
-            for card in slot.pile:
-                if card.dragging:
-                    mouse_x, mouse_y = pygame.mouse.get_pos()
-                    new_x = mouse_x - card.offset_x
-                    new_y = mouse_y - card.offset_y
-                    card.rect.topleft = (new_x, new_y)
+        if self.hint is not None:
+            self.draw_hint()
+        if self.victory:
+            self.draw_win_screen()
 
-        for slot in self.slots:
-            for card in slot.pile:
-                if card.dragging is not True:
-                    if card.face_up is True:
-                        card.draw_front(self.screen)
-                    else:
-                        card.draw(self.screen)
+    def get_score_surface(self) -> tuple:
+        """
+        Get the rendered score, rendering it again if the number of cards on the foundations changed.
+        :return: Tuple (surface, position) ready to be blitted on the screen, right of the 'New Game' button.
+        """
+        score = self.rules.score(sum(len(self.state.piles[index]) for index in FOUNDATIONS))
+        if self.score_surface is None or self.score_key != score:
+            sign = "-" if score < 0 else ""
+            self.score_surface = self.font.render(f'{sign}${abs(score)}', False, WHITE)
+            self.score_key = score
+        rect = self.score_surface.get_rect(midleft=self.new_game_rect.midright)
+        rect.x += 20
+        return self.score_surface, rect
 
-        for slot in self.slots:
-            for card in slot.pile:
-                if card.dragging is True:
-                    if card.face_up is True:
-                        card.draw_front(self.screen)
-                    else:
-                        card.draw(self.screen)
+    def draw_hud(self) -> pygame.Rect:
+        """
+        Draw the performance HUD in the top-left corner: frames profiled and the p50, p95 and p99 of the frame time
+        and of every phase. The HUD is only rendered again when the profiler refreshes its percentiles.
+        :return: Pygame rect object of the region covered by the HUD.
+        """
+        hud_key = self.profiler.frames // STATS_INTERVAL
+        if self.hud_surface is None or self.hud_key != hud_key:
+            lines = [self.font.render(line, False, WHITE) for line in self.profiler.hud_lines()]
+            width = max(line.get_width() for line in lines) + 8
+            height = sum(line.get_height() for line in lines) + 8
+            self.hud_surface = pygame.Surface((width, height), pygame.SRCALPHA)
+            self.hud_surface.fill((0, 0, 0, 192))
+            y = 4
+            for line in lines:
+                self.hud_surface.blit(line, (4, y))
+                y += line.get_height()
+            self.hud_key = hud_key
+        return self.screen.blit(self.hud_surface, (0, 0))
 
-        pygame.draw.rect(self.screen, WHITE, self.new_game_rect, BORDER_WIDTH)
-        font = pygame.font.SysFont('mspgothic', 20)
-        text = font.render('NEW GAME', False, WHITE)
-        text_rect = text.get_rect(center=self.new_game_rect.center)
-        self.screen.blit(text, text_rect)
+    def draw_hint(self):
+        """
+        Outline the cards moved by the hinted move and the slot they go to.
+        """
+        source_slot = self.slots[self.hint.source]
+        target_slot = self.slots[self.hint.target]
+        cards = source_slot.pile[-self.hint.count:]
+        source_rect = cards[0].rect.unionall([card.rect for card in cards[1:]])
+        target_rect = target_slot.get_top_card().rect if target_slot.pile else target_slot.rect
+        pygame.draw.rect(self.screen, HINT_COLOR, source_rect, BORDER_WIDTH)
+        pygame.draw.rect(self.screen, HINT_COLOR, target_rect, BORDER_WIDTH)
@@ -0,0 +1,120 @@
+from array import array
+
+from state import Move
+
+SOURCE_BITS = 4
+TARGET_BITS = 4
+COUNT_BITS = 6
+
+
+def pack_move(move: Move) -> int:
+    """
+    Pack an applied move into 15 bits: source pile, target pile, card count and whether a card was turned face up.
+    :param move: Move returned by KlondikeState.apply.
+    :return: Packed move.
+    """
+    value = move.source
+    value |= move.target << SOURCE_BITS
+    value |= move.count << (SOURCE_BITS + TARGET_BITS)
+    value |= move.flip << (SOURCE_BITS + TARGET_BITS + COUNT_BITS)
+    return value
+
+
+def unpack_move(value: int) -> Move:
+    """
+    Unpack a move packed by pack_move.
+    :param value: Packed move.
+    :return: Move object.
+    """
+    return Move(
+        value & ((1 << SOURCE_BITS) - 1),
+        (value >> SOURCE_BITS) & ((1 << TARGET_BITS) - 1),
+        (value >> (SOURCE_BITS + TARGET_BITS)) & ((1 << COUNT_BITS) - 1),
+        bool(value >> (SOURCE_BITS + TARGET_BITS + COUNT_BITS)),
+    )
+
+
+class MoveJournal:
+    """
+    Undo/redo history of a game, holding the applied moves rather than copies of the board.
+
+    Every move takes two bytes. The moves before the cursor can be undone, the moves after it can be redone, and
+    recording a new move discards the moves that could be redone. With a maximum depth, the oldest move is dropped
+    once the journal is full.
+    Attributes
+    ----------
+    moves : array
+        Packed moves, oldest first.
+    position : int
+        Number of moves currently applied, the moves from this position on being the ones that can be redone.
+    max_depth : int
+        Maximum number of moves kept, or None for no limit.
+    """
+    def __init__(self, max_depth: int = None):
+        """
+        Initialize an empty MoveJournal object.
+        :param max_depth: Maximum number of moves kept, or None for no limit.
+        """
+        self.moves = array('H')
+        self.position = 0
+        self.max_depth = max_depth
+
+    def __len__(self) -> int:
+        """
+        Get the number of moves held.
+        :return: Number of moves that can be undone or redone.
+        """
+        return len(self.moves)
+
+    def record(self, move: Move):
+        """
+        Record an applied move, discarding the moves that could be redone.
+        :param move: Move returned by KlondikeState.apply.
+        """
+        del self.moves[self.position:]
+        if self.max_depth is not None and self.position >= self.max_depth:
+            del self.moves[:self.position - self.max_depth + 1]
+            self.position = len(self.moves)
+        self.moves.append(pack_move(move))
+        self.position += 1
+
+    def can_undo(self) -> bool:
+        """
+        Check if a move can be undone.
+        :return: true if a move was recorded before the cursor, false otherwise.
+        """
+        return self.position > 0
+
+    def can_redo(self) -> bool:
+        """
+        Check if a move can be redone.
+        :return: true if an undone move follows the cursor, false otherwise.
+        """
+        return self.position < len(self.moves)
+
+    def undo(self) -> Move:
+        """
+        Step the cursor back over the last applied move.
+        :return: Move to be undone, or None if there is none.
+        """
+        if not self.can_undo():
+            return None
+        self.position -= 1
+        return unpack_move(self.moves[self.position])
+
+    def redo(self) -> Move:
+        """
+        Step the cursor forward over the last undone move.
+        :return: Move to be applied again, or None if there is none.
+        """
+        if not self.can_redo():
+            return None
+        self.position += 1
+        return unpack_move(self.moves[self.position - 1])
+
+    def clear(self):
+        """
+        Forget every move.
+        """
+        del self.moves[:]
+        self.position = 0
@@ -0,0 +1,64 @@
+from typing import NamedTuple
+
+import pygame
+
+SCREEN_WIDTH, SCREEN_HEIGHT = 1000, 700
+MIN_WIDTH, MIN_HEIGHT = 400, 280
+CARD_WIDTH, CARD_HEIGHT = 85, 115
+FAN_OFFSET = 20
+FONT_SIZE = 20
+VICTORY_FONT_SIZE = 36
+SLOT_POSITIONS = (
+    ((100, 100), (225, 100))
+    + tuple((475 + 125 * i, 100) for i in range(4))
+    + tuple((100 + 125 * i, 300) for i in range(7))
+)
+NEW_GAME_RECT = (400, 600, 200, 40)
+VICTORY_RECT = (350, 250, 300, 80)
+
+
+class Layout(NamedTuple):
+    """
+    Positions and sizes of the game elements for a window size.
+
+    The game is designed for a SCREEN_WIDTH x SCREEN_HEIGHT window. Other sizes scale that design uniformly, by the
+    largest factor that fits the window, and center it horizontally.
+    """
+    window_size: tuple
+    scale: float
+    card_size: tuple
+    slot_positions: tuple
+    fan_offset: int
+    new_game_rect: pygame.Rect
+    victory_rect: pygame.Rect
+    font_size: int
+    victory_font_size: int
+
+
+def compute_layout(window_size: tuple) -> Layout:
+    """
+    Compute the layout of the game for a window size.
+    :param window_size: Tuple (width, height) of the window, at least MIN_WIDTH x MIN_HEIGHT.
+    :return: Layout object.
+    """
+    width, height = max(window_size[0], MIN_WIDTH), max(window_size[1], MIN_HEIGHT)
+    scale = min(width / SCREEN_WIDTH, height / SCREEN_HEIGHT)
+    left = (width - SCREEN_WIDTH * scale) / 2
+
+    def point(x: int, y: int) -> tuple:
+        return round(left + x * scale), round(y * scale)
+
+    def rect(x: int, y: int, w: int, h: int) -> pygame.Rect:
+        return pygame.Rect(point(x, y), (round(w * scale), round(h * scale)))
+
+    return Layout(
+        window_size=(width, height),
+        scale=scale,
+        card_size=(round(CARD_WIDTH * scale), round(CARD_HEIGHT * scale)),
+        slot_positions=tuple(point(x, y) for x, y in SLOT_POSITIONS),
+        fan_offset=max(1, round(FAN_OFFSET * scale)),
+        new_game_rect=rect(*NEW_GAME_RECT),
+        victory_rect=rect(*VICTORY_RECT),
+        font_size=max(8, round(FONT_SIZE * scale)),
+        victory_font_size=max(12, round(VICTORY_FONT_SIZE * scale)),
+    )
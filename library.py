@@ -0,0 +1,208 @@
+import argparse
+import math
+import mmap
+import os
+import random
+import struct
+import sys
+from typing import TYPE_CHECKING, NamedTuple
+
+from rules import CLASSIC, VARIANT_NAMES
+
+if TYPE_CHECKING:
+    from batch import ColumnStore
+
+MAGIC = b"SLDL"
+VERSION = 2
+TIERS = ("easy", "medium", "hard", "expert")
+UNWINNABLE = len(TIERS)
+UNKNOWN = len(TIERS) + 1
+GROUPS_NUM = len(TIERS) + 2
+HEADER = struct.Struct("<4sBI")
+VARIANT = struct.Struct("<B")
+GROUP = struct.Struct("<II")
+RECORD = struct.Struct("<IbBH")
+
+
+class DealRecord(NamedTuple):
+    """
+    Analysis of a deal, as stored in a deal library.
+
+    winnable is 1 for a winnable deal, 0 for a deal proven lost, and negative when the solver gave up or failed.
+    difficulty grows with the effort the solver needed, from 0 to 255.
+    """
+    seed: int
+    winnable: int
+    difficulty: int
+    solution_length: int
+
+
+def difficulty_score(nodes: int) -> int:
+    """
+    Score the difficulty of a deal from the number of states the solver expanded, on a logarithmic scale.
+    :param nodes: Number of states expanded.
+    :return: Score from 0 to 255.
+    """
+    return min(255, round(16 * math.log2(1 + nodes)))
+
+
+def build_library(store: "ColumnStore", path: str) -> list:
+    """
+    Write a deal library from batch analysis results.
+
+    Winnable deals are sorted by difficulty and split into tiers holding a quarter of them each. Records are stored
+    by group (the tiers, then the unwinnable deals, then the deals of unknown outcome), and the header holds the index
+    of the variant the deals were analyzed with in rules.VARIANT_NAMES, then the first record and the number of
+    records of every group, so a deal of a group can be picked without reading the others.
+    :param store: ColumnStore object holding the results of batch.run_batch.
+    :param path: Path of the library file.
+    :return: List of the number of records of every group.
+    """
+    rows = store.rows()
+    seeds = store.read_column("seed", 'I', rows)
+    winnable = store.read_column("winnable", 'b', rows)
+    lengths = store.read_column("solution_length", 'H', rows)
+    nodes = store.read_column("nodes", 'I', rows)
+    records = [
+        DealRecord(seeds[i], winnable[i], difficulty_score(nodes[i]), lengths[i]) for i in range(rows)
+    ]
+    winnable_records = sorted((record for record in records if record.winnable == 1), key=lambda r: r.difficulty)
+    groups = [
+        winnable_records[len(winnable_records) * tier // len(TIERS):len(winnable_records) * (tier + 1) // len(TIERS)]
+        for tier in range(len(TIERS))
+    ]
+    groups.append([record for record in records if record.winnable == 0])
+    groups.append([record for record in records if record.winnable < 0])
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, rows) + VARIANT.pack(VARIANT_NAMES.index(store.read_variant())))
+        start = 0
+        for group in groups:
+            file.write(GROUP.pack(start, len(group)))
+            start += len(group)
+        for group in groups:
+            for record in group:
+                file.write(RECORD.pack(*record))
+    os.replace(temp_path, path)
+    return [len(group) for group in groups]
+
+
+class DealLibrary:
+    """
+    Deal library file, memory-mapped so records are read on demand. Version 1 files, which have no variant byte, hold
+    classic Klondike analyses.
+    Attributes
+    ----------
+    path : str
+        Path of the library file.
+    mapping : mmap.mmap
+        Read-only mapping of the file.
+    variant : str
+        Name of the variant the deals were analyzed with, from rules.VARIANT_NAMES.
+    groups : list of tuple
+        First record and number of records of every group: the tiers of TIERS, then UNWINNABLE and UNKNOWN.
+    records_offset : int
+        Offset of the first record in the file.
+    """
+    def __init__(self, path: str):
+        """
+        Initialize a DealLibrary object, mapping the file and reading its header.
+        :param path: Path of the library file.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _ = HEADER.unpack_from(self.mapping)
+        if magic != MAGIC or version not in (1, VERSION):
+            self.mapping.close()
+            raise ValueError(f'{path}: not a version {VERSION} deal library')
+        offset = HEADER.size
+        self.variant = CLASSIC.name
+        if version == VERSION:
+            variant, = VARIANT.unpack_from(self.mapping, offset)
+            if variant >= len(VARIANT_NAMES):
+                self.mapping.close()
+                raise ValueError(f'{path}: unknown variant {variant}')
+            self.variant = VARIANT_NAMES[variant]
+            offset += VARIANT.size
+        self.groups = [GROUP.unpack_from(self.mapping, offset + group * GROUP.size) for group in range(GROUPS_NUM)]
+        self.records_offset = offset + GROUPS_NUM * GROUP.size
+
+    def __len__(self) -> int:
+        """
+        Get the number of deals.
+        :return: Number of records.
+        """
+        return sum(count for _, count in self.groups)
+
+    def record(self, index: int) -> DealRecord:
+        """
+        Read a record.
+        :param index: Index of the record in the file.
+        :return: DealRecord object.
+        """
+        return DealRecord(*RECORD.unpack_from(self.mapping, self.records_offset + index * RECORD.size))
+
+    def span(self, winnable: bool = None, tier: str = None) -> tuple:
+        """
+        Get the contiguous range of records matching a filter.
+        :param winnable: True for winnable deals, False for deals proven lost, None for any deal.
+        :param tier: Name of a tier of TIERS, implying winnable deals, or None for any tier.
+        :return: Tuple (first record, number of records).
+        """
+        if tier is not None:
+            return self.groups[TIERS.index(tier)]
+        if winnable is None:
+            return 0, len(self)
+        if winnable:
+            return self.groups[0][0], sum(self.groups[tier][1] for tier in range(len(TIERS)))
+        return self.groups[UNWINNABLE]
+
+    def select(self, winnable: bool = None, tier: str = None, rng: random.Random = None) -> DealRecord:
+        """
+        Pick a random deal matching a filter, reading a single record.
+        :param winnable: True for winnable deals, False for deals proven lost, None for any deal.
+        :param tier: Name of a tier of TIERS, implying winnable deals, or None for any tier.
+        :param rng: Random generator, or None to use the random module.
+        :return: DealRecord object, or None if no deal matches.
+        """
+        start, count = self.span(winnable, tier)
+        if count == 0:
+            return None
+        return self.record(start + (rng or random).randrange(count))
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self.mapping.close()
+
+
+def main(argv: list = None):
+    """
+    Command-line entry point of the deal library.
+    :param argv: List of command-line arguments, or None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Build or inspect a library of analyzed deals.")
+    parser.add_argument("library", help="path of the library file")
+    parser.add_argument("--build", metavar="STORE", default=None, help="directory of batch.py results to build from")
+    args = parser.parse_args(argv)
+
+    if args.build is not None:
+        # batch pulls in multiprocessing, which the game does not need to load a library
+        from batch import ColumnStore
+        build_library(ColumnStore(args.build), args.library)
+    library = DealLibrary(args.library)
+    print(f'{library.variant} deals')
+    for group, (name, (start, count)) in enumerate(zip(TIERS + ("unwinnable", "unknown"), library.groups)):
+        if count and group < len(TIERS):
+            first, last = library.record(start), library.record(start + count - 1)
+            print(f'{name:<10} {count:8} deals, difficulty {first.difficulty}-{last.difficulty}')
+        else:
+            print(f'{name:<10} {count:8} deals')
+    library.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+from state import FOUNDATIONS, PILES_NUM, STOCK, TABLEAU, WASTE, KlondikeState, Move, card_rank
+
+FOUNDATION = 0
+REVEAL = 1
+BUILD = 2
+DEAL = 3
+OTHER = 4
+PRIORITIES = 5
+HINT_PRIORITIES = (FOUNDATION, REVEAL, BUILD, DEAL)
+TARGETS = tuple(FOUNDATIONS) + tuple(TABLEAU)
+
+
+class MoveIndex:
+    """
+    Index of the legal moves of a state, kept up to date one move at a time.
+
+    A pile holds at most one legal move onto each other pile, so the moves are stored by (source, target) pair. After
+    a move, only the pairs involving its source or target pile are computed again. Every move is also filed into a
+    priority bucket, so the best hint and the next move to the foundations are found without scanning the moves.
+    Attributes
+    ----------
+    state : KlondikeState
+        State the index describes.
+    pairs : dict
+        Legal Move of every (source, target) pair that has one, with its priority, as a tuple (move, priority).
+    buckets : list of dict
+        Legal moves of every priority, keyed by (source, target) pair.
+    """
+    def __init__(self, state: KlondikeState):
+        """
+        Initialize a MoveIndex object and index every legal move of the state.
+        :param state: State the index describes.
+        """
+        self.state = state
+        self.pairs = {}
+        self.buckets = [{} for _ in range(PRIORITIES)]
+        for source in range(PILES_NUM):
+            self.refresh_source(source)
+
+    def __len__(self) -> int:
+        """
+        Get the number of legal moves.
+        :return: Number of legal moves.
+        """
+        return len(self.pairs)
+
+    def moves(self) -> list:
+        """
+        Get every legal move.
+        :return: List of Move objects.
+        """
+        return [move for move, _ in self.pairs.values()]
+
+    def find_move(self, source: int, target: int) -> tuple:
+        """
+        Compute the legal move of a pair of piles, if any, with the rules of KlondikeState.can_move.
+        :param source: Index of the source pile.
+        :param target: Index of the target pile.
+        :return: Tuple (move, priority), or None if no move from the source pile onto the target pile is legal.
+        """
+        state = self.state
+        piles = state.piles
+        if source == STOCK:
+            if target == WASTE and piles[STOCK]:
+                return Move(STOCK, WASTE, state.rules.draw_size(len(piles[STOCK]))), DEAL
+            return None
+        if source == WASTE and target == STOCK:
+            if not piles[STOCK] and piles[WASTE] and state.rules.can_recycle(state.recycles):
+                return Move(WASTE, STOCK, len(piles[WASTE])), DEAL
+            return None
+        pile = piles[source]
+        if source == target or target < FOUNDATIONS[0] or not pile:
+            return None
+        count = 1
+        if source in TABLEAU and target in TABLEAU:
+            face_up = state.face_up[source]
+            if piles[target]:
+                count = card_rank(piles[target][-1]) - card_rank(pile[-1])
+            else:
+                count = 14 - card_rank(pile[-1])
+            if count < 1 or count > face_up:
+                return None
+        if not state.can_place(pile[-count], target):
+            return None
+        move = Move(source, target, count)
+        if target in FOUNDATIONS:
+            return move, OTHER if source in FOUNDATIONS else FOUNDATION
+        if source not in TABLEAU:
+            return move, OTHER if source in FOUNDATIONS else BUILD
+        if count == state.face_up[source]:
+            if count < len(pile):
+                return move, REVEAL
+            return move, OTHER if not piles[target] else BUILD
+        return move, OTHER
+
+    def set_pair(self, source: int, target: int):
+        """
+        Compute the move of a pair of piles again and file it into its bucket.
+        :param source: Index of the source pile.
+        :param target: Index of the target pile.
+        """
+        pair = (source, target)
+        entry = self.pairs.pop(pair, None)
+        if entry is not None:
+            del self.buckets[entry[1]][pair]
+        entry = self.find_move(source, target)
+        if entry is not None:
+            self.pairs[pair] = entry
+            self.buckets[entry[1]][pair] = entry[0]
+
+    def refresh_source(self, source: int):
+        """
+        Compute again every move out of a pile.
+        :param source: Index of the pile.
+        """
+        if source == STOCK:
+            self.set_pair(STOCK, WASTE)
+            return
+        if source == WASTE:
+            self.set_pair(WASTE, STOCK)
+        for target in TARGETS:
+            self.set_pair(source, target)
+
+    def refresh(self, pile: int):
+        """
+        Compute again every move out of or onto a pile that changed.
+        :param pile: Index of the pile.
+        """
+        self.refresh_source(pile)
+        if pile == STOCK:
+            self.set_pair(WASTE, STOCK)
+        elif pile == WASTE:
+            self.set_pair(STOCK, WASTE)
+        else:
+            for source in range(WASTE, PILES_NUM):
+                self.set_pair(source, pile)
+
+    def update(self, move: Move):
+        """
+        Update the index after a move was applied to the state or undone.
+        :param move: Move applied or undone.
+        """
+        self.refresh(move.source)
+        self.refresh(move.target)
+
+    def hint(self) -> Move:
+        """
+        Get the most useful legal move: a move to the foundations, then a move turning a card face up, then a move
+        building on the tableau, then drawing from the stock.
+        :return: Move object, or None if no useful move is left.
+        """
+        for priority in HINT_PRIORITIES:
+            bucket = self.buckets[priority]
+            if bucket:
+                return next(iter(bucket.values()))
+        return None
+
+    def foundation_move(self) -> Move:
+        """
+        Get a legal move from the waste or the tableau to the foundations.
+        :return: Move object, or None if no card can go to the foundations.
+        """
+        bucket = self.buckets[FOUNDATION]
+        if bucket:
+            return next(iter(bucket.values()))
+        return None
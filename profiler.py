@@ -0,0 +1,193 @@
+import csv
+import json
+import time
+from array import array
+
+PHASES = ("events", "draw", "check_win", "win_screen", "display", "idle")
+EVENTS, DRAW, CHECK_WIN, WIN_SCREEN, DISPLAY, IDLE = range(len(PHASES))
+WINDOW = 600
+STATS_INTERVAL = 30
+
+
+def percentile(sorted_values: list, fraction: float) -> int:
+    """
+    Get a percentile of sorted values, with the nearest-rank method.
+    :param sorted_values: Values sorted in ascending order.
+    :param fraction: Percentile as a fraction, from 0 to 1.
+    :return: Value at the percentile, or 0 if there are no values.
+    """
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class FrameProfiler:
+    """
+    Profiler timing the phases of every frame of the game loop with time.perf_counter_ns.
+
+    The loop calls start_frame, then mark after each phase, which charges the time since the previous mark to that
+    phase, then end_frame. The last WINDOW frames are kept in ring buffers to compute rolling percentiles, and every
+    frame can also be kept for a trace exported on exit. Frame time is the time of every phase except idle, which is
+    the time spent waiting for the next frame or event.
+
+    Input-to-photon latency is counted from the moment an input that changes the screen is taken off the event queue
+    (input) to the moment the first frame drawn after it is pushed to the display (start_draw, then presented).
+    Attributes
+    ----------
+    durations : list of array
+        Ring buffer of the nanoseconds spent in every phase, one per phase, WINDOW frames long.
+    frame_times : array
+        Ring buffer of the frame times in nanoseconds.
+    frames : int
+        Number of frames profiled.
+    current : list of int
+        Nanoseconds spent in every phase of the frame in progress.
+    last : int
+        Time of the last mark in nanoseconds.
+    trace_path : str
+        Path of the CSV or JSON trace written on exit, or None to keep no trace.
+    trace : array
+        Nanoseconds spent in every phase of every frame, frame after frame, if a trace is kept.
+    stats : dict
+        Percentiles computed at the last refresh, see compute_stats.
+    latencies : array
+        Ring buffer of the input-to-photon latencies in nanoseconds, WINDOW inputs long.
+    inputs : int
+        Number of input-to-photon latencies measured.
+    pending_input : int
+        Time in nanoseconds of the first input not drawn yet, or 0.
+    drawn_input : int
+        Time in nanoseconds of the first input drawn in the frame being presented, or 0.
+    """
+    def __init__(self, trace_path: str = None):
+        """
+        Initialize a FrameProfiler object.
+        :param trace_path: Path of the trace written on exit, as JSON if it ends with '.json' and as CSV otherwise, or
+        None to keep no trace.
+        """
+        self.durations = [array('q', bytes(8 * WINDOW)) for _ in PHASES]
+        self.frame_times = array('q', bytes(8 * WINDOW))
+        self.frames = 0
+        self.current = [0] * len(PHASES)
+        self.last = time.perf_counter_ns()
+        self.trace_path = trace_path
+        self.trace = array('q')
+        self.stats = {}
+        self.latencies = array('q', bytes(8 * WINDOW))
+        self.inputs = 0
+        self.pending_input = 0
+        self.drawn_input = 0
+
+    def start_frame(self):
+        """
+        Start timing a frame.
+        """
+        self.current = [0] * len(PHASES)
+        self.last = time.perf_counter_ns()
+
+    def mark(self, phase: int):
+        """
+        Charge the time since the previous mark to a phase.
+        :param phase: Index of the phase in PHASES.
+        """
+        now = time.perf_counter_ns()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def input(self, received: int):
+        """
+        Count an input that changes the screen, if no earlier input is waiting to be drawn.
+        :param received: Time the input was taken off the event queue, from time.perf_counter_ns.
+        """
+        if not self.pending_input:
+            self.pending_input = received
+
+    def start_draw(self):
+        """
+        Note that a frame is being drawn, showing the inputs received so far.
+        """
+        if self.pending_input and not self.drawn_input:
+            self.drawn_input = self.pending_input
+            self.pending_input = 0
+
+    def presented(self):
+        """
+        Note that the frame drawn was pushed to the display, measuring the latency of the input it shows.
+        """
+        if self.drawn_input:
+            self.latencies[self.inputs % WINDOW] = time.perf_counter_ns() - self.drawn_input
+            self.inputs += 1
+            self.drawn_input = 0
+
+    def end_frame(self):
+        """
+        Store the frame's timings, refreshing the percentiles every STATS_INTERVAL frames.
+        """
+        slot = self.frames % WINDOW
+        current = self.current
+        for phase, duration in enumerate(current):
+            self.durations[phase][slot] = duration
+        self.frame_times[slot] = sum(current) - current[IDLE]
+        if self.trace_path is not None:
+            self.trace.extend(current)
+        self.frames += 1
+        if self.frames % STATS_INTERVAL == 0:
+            self.stats = self.compute_stats()
+
+    def compute_stats(self) -> dict:
+        """
+        Compute the rolling percentiles of the frame time and of every phase over the last WINDOW frames, and of the
+        input-to-photon latency over the last WINDOW inputs.
+        :return: Dictionary mapping 'frame', every phase name and 'latency' to a dictionary of the p50, p95 and p99 in
+        milliseconds.
+        """
+        frames = min(self.frames, WINDOW)
+        stats = {}
+        series = [("frame", self.frame_times, frames)]
+        series.extend((name, values, frames) for name, values in zip(PHASES, self.durations))
+        series.append(("latency", self.latencies, min(self.inputs, WINDOW)))
+        for name, values, count in series:
+            ordered = sorted(values[:count])
+            stats[name] = {
+                f'p{int(fraction * 100)}': percentile(ordered, fraction) / 1e6 for fraction in (0.5, 0.95, 0.99)
+            }
+        return stats
+
+    def hud_lines(self) -> list:
+        """
+        Get the lines of text shown by the performance HUD.
+        :return: List of strings, one per line.
+        """
+        lines = [f'frames {self.frames} inputs {self.inputs}']
+        for name, values in self.stats.items():
+            lines.append(f'{name:<10} {values["p50"]:6.2f} {values["p95"]:6.2f} {values["p99"]:6.2f} ms')
+        return lines
+
+    def export(self, path: str):
+        """
+        Write the timings of every frame kept in the trace.
+        :param path: Path of the trace, written as JSON if it ends with '.json' and as CSV otherwise.
+        """
+        rows = [self.trace[i:i + len(PHASES)].tolist() for i in range(0, len(self.trace), len(PHASES))]
+        if path.endswith(".json"):
+            with open(path, "w") as file:
+                json.dump({
+                    "unit": "ns",
+                    "phases": list(PHASES),
+                    "frames": rows,
+                    "inputs": self.inputs,
+                    "stats_ms": self.compute_stats(),
+                }, file)
+            return
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(("frame",) + PHASES)
+            for index, row in enumerate(rows):
+                writer.writerow([index] + row)
+
+    def close(self):
+        """
+        Write the trace if one is kept.
+        """
+        if self.trace_path is not None:
+            self.export(self.trace_path)
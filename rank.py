@@ -1,12 +1,43 @@
 class Rank:
     """
     A Rank object for a Card
+
+    Ranks are interned: constructing a rank with the name of an existing one returns the existing object, so every
+    card of a rank shares it.
     """
-    def __init__(self, card_name: str, card_value: int):
+    __slots__ = ("name", "value")
+    _instances = {}
+
+    def __new__(cls, card_name: str, card_value: int):
         """
-        Initialize a Rank object.
+        Get the Rank object of a name, creating it the first time.
         :param card_name: A string representing the name of the card rank.
         :param card_value: An integer representing the numerical value of the card rank.
+        :raises ValueError: If a rank of that name already exists with another value.
         """
-        self.name = card_name
-        self.value = card_value
+        rank = cls._instances.get(card_name)
+        if rank is None:
+            rank = super().__new__(cls)
+            rank.name = card_name
+            rank.value = card_value
+            cls._instances[card_name] = rank
+        elif rank.value != card_value:
+            raise ValueError(f"rank {card_name} already exists with value {rank.value}")
+        return rank
+
+
+RANKS = (
+    Rank("Ace", 1),
+    Rank("2", 2),
+    Rank("3", 3),
+    Rank("4", 4),
+    Rank("5", 5),
+    Rank("6", 6),
+    Rank("7", 7),
+    Rank("8", 8),
+    Rank("9", 9),
+    Rank("10", 10),
+    Rank("Jack", 11),
+    Rank("Queen", 12),
+    Rank("King", 13),
+)
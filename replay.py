@@ -0,0 +1,296 @@
+import argparse
+import itertools
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from journal import MoveJournal
+from rules import CLASSIC, VARIANT_NAMES, VARIANTS
+from state import KlondikeState, Move, shuffled_deck
+
+MAGIC = b"SLRP"
+VERSION = 2
+HEADER = struct.Struct("<4sBI")
+VARIANT = struct.Struct("<B")
+RECORD = struct.Struct("<BBBB")
+MOVE = 0
+UNDO = 1
+REDO = 2
+REPLAY_EXTENSION = ".slr"
+
+_replay_numbers = itertools.count(1)
+
+
+class ReplayWriter:
+    """
+    Recording of one deal, written as the game is played.
+
+    The file starts with a header holding the magic bytes, the format version, the seed of the deal and the index of
+    the variant in rules.VARIANT_NAMES, followed by one 4-byte record (kind, source, target, count) per action.
+    Records go through the file's write buffer, so playing a move does not touch the disk; a record cut short by a
+    crash is ignored when reading.
+    Attributes
+    ----------
+    path : str
+        Path of the replay file.
+    file : io.BufferedWriter
+        Replay file opened for appending.
+    """
+    def __init__(self, path: str, seed: int, variant: str = CLASSIC.name):
+        """
+        Initialize a ReplayWriter object, creating the file and writing its header.
+        :param path: Path of the replay file, which must not exist yet.
+        :param seed: Seed of the deal.
+        :param variant: Name of the variant played, from rules.VARIANT_NAMES.
+        """
+        self.path = path
+        self.file = open(path, "xb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed) + VARIANT.pack(VARIANT_NAMES.index(variant)))
+
+    def write_move(self, move: Move):
+        """
+        Append a played move.
+        :param move: Move played.
+        """
+        self.file.write(RECORD.pack(MOVE, move.source, move.target, move.count))
+
+    def write_undo(self):
+        """
+        Append an undo.
+        """
+        self.file.write(RECORD.pack(UNDO, 0, 0, 0))
+
+    def write_redo(self):
+        """
+        Append a redo.
+        """
+        self.file.write(RECORD.pack(REDO, 0, 0, 0))
+
+    def flush(self):
+        """
+        Push the buffered records to the file.
+        """
+        self.file.flush()
+
+    def close(self):
+        """
+        Flush and close the file.
+        """
+        self.file.close()
+
+
+def replay_path(directory: str, seed: int) -> str:
+    """
+    Get a new replay file path for a deal.
+    :param directory: Directory holding the replays.
+    :param seed: Seed of the deal.
+    :return: Path of the replay file, named after the current time, the process, a number counting the replays of the
+    process and the seed, so that replays of the same deal started within a second get their own files.
+    """
+    name = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{next(_replay_numbers):06d}-{seed}{REPLAY_EXTENSION}'
+    return os.path.join(directory, name)
+
+
+def read_replay(path: str) -> tuple:
+    """
+    Read a replay file. Version 1 files, which have no variant byte, are read as classic Klondike replays.
+    :param path: Path of the replay file.
+    :return: Tuple (seed, rules, records), records being a list of (kind, source, target, count) tuples.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f'{path}: truncated replay header')
+    magic, version, seed = HEADER.unpack_from(data)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError(f'{path}: not a version {VERSION} replay file')
+    start = HEADER.size
+    rules = CLASSIC
+    if version == VERSION:
+        if len(data) < start + VARIANT.size:
+            raise ValueError(f'{path}: truncated replay header')
+        variant, = VARIANT.unpack_from(data, start)
+        if variant >= len(VARIANT_NAMES):
+            raise ValueError(f'{path}: unknown variant {variant}')
+        rules = VARIANTS[VARIANT_NAMES[variant]]
+        start += VARIANT.size
+    end = start + (len(data) - start) // RECORD.size * RECORD.size
+    return seed, rules, list(RECORD.iter_unpack(data[start:end]))
+
+
+class ReplayResult(NamedTuple):
+    """
+    Outcome of playing back a replay.
+
+    error is None when every record could be played back, otherwise it describes the first record that could not.
+    """
+    path: str
+    seed: int
+    records: int
+    won: bool
+    error: str
+    seconds: float
+
+
+def play_replay(path: str) -> ReplayResult:
+    """
+    Play a replay back through the game rules without opening a window.
+    :param path: Path of the replay file.
+    :return: ReplayResult object.
+    """
+    start = time.perf_counter()
+    try:
+        seed, rules, records = read_replay(path)
+    except (OSError, ValueError) as error:
+        return ReplayResult(path, 0, 0, False, str(error), time.perf_counter() - start)
+    state = KlondikeState.deal(shuffled_deck(seed), rules)
+    journal = MoveJournal()
+    error = None
+    for index, (kind, source, target, count) in enumerate(records):
+        if kind == MOVE:
+            move = Move(source, target, count)
+            if not state.can_move(move):
+                error = f'record {index}: illegal move {move}'
+                break
+            journal.record(state.apply(move))
+        elif kind == UNDO:
+            move = journal.undo()
+            if move is None:
+                error = f'record {index}: nothing to undo'
+                break
+            state.undo(move)
+        elif kind == REDO:
+            move = journal.redo()
+            if move is None:
+                error = f'record {index}: nothing to redo'
+                break
+            state.apply(move)
+        else:
+            error = f'record {index}: unknown record kind {kind}'
+            break
+    return ReplayResult(path, seed, len(records), state.is_won(), error, time.perf_counter() - start)
+
+
+def render_replay(path: str, frames: set, output_dir: str) -> list:
+    """
+    Play a replay back through the Game and save selected frames as PNG images, with the SDL dummy video driver.
+    Every record is checked before it is played, as in play_replay, and playback stops at the first invalid one.
+    :param path: Path of the replay file.
+    :param frames: Set of record indexes after which a frame is saved, -1 standing for the dealt board.
+    :param output_dir: Directory receiving the images.
+    :return: List of the paths of the saved images.
+    :raises ValueError: If the file is not a replay or holds a record that cannot be played.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    from game import Game
+
+    seed, rules, records = read_replay(path)
+    game = Game(rules=rules)
+    game.create_slots()
+    game.create_card_deck()
+    game.deal_cards(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    name = os.path.splitext(os.path.basename(path))[0]
+    saved = []
+
+    def save(index: int):
+        game.draw_game()
+        image_path = os.path.join(output_dir, f'{name}-{index + 1:05d}.png')
+        pygame.image.save(game.screen, image_path)
+        saved.append(image_path)
+
+    if -1 in frames:
+        save(-1)
+    for index, (kind, source, target, count) in enumerate(records):
+        if kind == MOVE:
+            move = Move(source, target, count)
+            if not game.state.can_move(move):
+                raise ValueError(f'{path}: record {index}: illegal move {move}')
+            game.apply_move(move)
+        elif kind == UNDO:
+            if not game.undo_move():
+                raise ValueError(f'{path}: record {index}: nothing to undo')
+        elif kind == REDO:
+            if not game.redo_move():
+                raise ValueError(f'{path}: record {index}: nothing to redo')
+        else:
+            raise ValueError(f'{path}: record {index}: unknown record kind {kind}')
+        if index in frames:
+            save(index)
+    return saved
+
+
+def play_archive(paths: list, workers: int = None) -> list:
+    """
+    Play many replays back across a pool of worker processes.
+    :param paths: List of replay file paths.
+    :param workers: Number of worker processes, or None for one per core.
+    :return: List of ReplayResult objects, in the order of the paths.
+    """
+    chunk_size = max(1, len(paths) // (4 * (workers or os.cpu_count())))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(play_replay, paths, chunksize=chunk_size))
+
+
+def replay_files(paths: list) -> list:
+    """
+    Expand directories into the replay files they hold.
+    :param paths: List of replay file or directory paths.
+    :return: List of replay file paths.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith(REPLAY_EXTENSION)
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv: list = None) -> int:
+    """
+    Command-line entry point of the replay playback.
+    :param argv: List of command-line arguments, or None to use sys.argv.
+    :return: Exit status, 1 if a replay could not be played back.
+    """
+    parser = argparse.ArgumentParser(description="Play Solitaire replays back without a window.")
+    parser.add_argument("paths", nargs="+", help="replay files or directories of replay files")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes, one per core by default")
+    parser.add_argument("--frames", default=None, help="comma-separated record indexes to render, -1 for the deal")
+    parser.add_argument("--frame-dir", default="frames", help="directory of the rendered frames")
+    args = parser.parse_args(argv)
+
+    paths = replay_files(args.paths)
+    if args.frames is not None:
+        frames = {int(index) for index in args.frames.split(",")}
+        status = 0
+        for path in paths:
+            try:
+                for image_path in render_replay(path, frames, args.frame_dir):
+                    print(image_path)
+            except (OSError, ValueError) as error:
+                print(error, file=sys.stderr)
+                status = 1
+        return status
+
+    start = time.perf_counter()
+    results = play_archive(paths, args.workers)
+    elapsed = time.perf_counter() - start
+    records = sum(result.records for result in results)
+    failed = [result for result in results if result.error is not None]
+    for result in failed:
+        print(f'{result.path}: {result.error}')
+    rate = records / elapsed if elapsed > 0 else 0.0
+    print(f'{len(results)} replays, {records} records in {elapsed:.2f} s ({rate:,.0f} records/s), '
+          f'{sum(result.won for result in results)} won, {len(failed)} failed')
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
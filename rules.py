@@ -0,0 +1,108 @@
+DECK_SIZE = 52
+NO_CARD = 0xFF
+STANDARD_SCORING = "standard"
+VEGAS_SCORING = "vegas"
+VEGAS_ANTE = 52
+VEGAS_CARD_VALUE = 5
+
+
+class Rules:
+    """
+    Rules of a Klondike variant, compiled into lookup tables indexed by encoded cards.
+
+    Cards are encoded as in the state module: suite index * 13 + rank value - 1.
+    Attributes
+    ----------
+    name : str
+        Name of the variant.
+    draw_count : int
+        Number of cards turned from the stock onto the waste at once.
+    recycle_limit : int
+        Number of times the waste can be turned back into the stock, or None for no limit.
+    scoring : str
+        STANDARD_SCORING, or VEGAS_SCORING to score every card sent to the foundations against an ante.
+    thoughtful : bool
+        Flag indicating whether every card is shown face up.
+    stack : bytes
+        Whether a card can be stacked on a tableau card, indexed by card * DECK_SIZE + top card.
+    stackable : tuple of tuple
+        Cards that can be stacked on every tableau card, indexed by top card.
+    successor : bytes
+        Card a foundation accepts on every top card, NO_CARD after a King, indexed by top card.
+    foundation_base : bytes
+        Whether a card can start an empty foundation, indexed by card.
+    tableau_base : bytes
+        Whether a card can start an empty tableau pile, indexed by card.
+    """
+    def __init__(
+        self,
+        name: str,
+        draw_count: int = 1,
+        recycle_limit: int = None,
+        scoring: str = STANDARD_SCORING,
+        thoughtful: bool = False,
+    ):
+        """
+        Initialize a Rules object, compiling its lookup tables.
+        :param name: Name of the variant.
+        :param draw_count: Number of cards turned from the stock onto the waste at once.
+        :param recycle_limit: Number of times the waste can be turned back into the stock, or None for no limit.
+        :param scoring: STANDARD_SCORING, or VEGAS_SCORING to score every card sent to the foundations against an ante.
+        :param thoughtful: Whether every card is shown face up.
+        """
+        self.name = name
+        self.draw_count = draw_count
+        self.recycle_limit = recycle_limit
+        self.scoring = scoring
+        self.thoughtful = thoughtful
+
+        stack = bytearray(DECK_SIZE * DECK_SIZE)
+        for card in range(DECK_SIZE):
+            for top in range(DECK_SIZE):
+                stack[card * DECK_SIZE + top] = (card < 26) != (top < 26) and top % 13 - card % 13 == 1
+        self.stack = bytes(stack)
+        self.stackable = tuple(
+            tuple(card for card in range(DECK_SIZE) if stack[card * DECK_SIZE + top]) for top in range(DECK_SIZE)
+        )
+        self.successor = bytes(top + 1 if top % 13 != 12 else NO_CARD for top in range(DECK_SIZE))
+        self.foundation_base = bytes(card % 13 == 0 for card in range(DECK_SIZE))
+        self.tableau_base = bytes(card % 13 == 12 for card in range(DECK_SIZE))
+
+    def draw_size(self, stock_size: int) -> int:
+        """
+        Get the number of cards a draw turns from the stock.
+        :param stock_size: Number of cards in the stock.
+        :return: Number of cards drawn.
+        """
+        return min(self.draw_count, stock_size)
+
+    def can_recycle(self, recycles: int) -> bool:
+        """
+        Check if the waste can be turned back into the stock once more.
+        :param recycles: Number of times the waste was already turned back.
+        :return: true if the recycle limit allows it, false otherwise.
+        """
+        return self.recycle_limit is None or recycles < self.recycle_limit
+
+    def score(self, foundation_cards: int) -> int:
+        """
+        Get the score of a game.
+        :param foundation_cards: Number of cards on the foundations.
+        :return: Vegas score in dollars, or the number of cards on the foundations with standard scoring.
+        """
+        if self.scoring == VEGAS_SCORING:
+            return VEGAS_CARD_VALUE * foundation_cards - VEGAS_ANTE
+        return foundation_cards
+
+
+VARIANTS = {
+    rules.name: rules for rules in (
+        Rules("klondike"),
+        Rules("draw3", draw_count=3),
+        Rules("vegas", recycle_limit=0, scoring=VEGAS_SCORING),
+        Rules("vegas3", draw_count=3, recycle_limit=2, scoring=VEGAS_SCORING),
+        Rules("thoughtful", thoughtful=True),
+    )
+}
+VARIANT_NAMES = tuple(VARIANTS)
+CLASSIC = VARIANTS["klondike"]
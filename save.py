@@ -0,0 +1,224 @@
+import os
+import struct
+import threading
+import time
+
+from journal import MoveJournal
+from rules import DECK_SIZE, VARIANT_NAMES, VARIANTS
+from state import PILES_NUM, KlondikeState
+
+MAGIC = b"SLSV"
+VERSION = 1
+HEADER = struct.Struct("<4sBIBH")
+PILE = struct.Struct("<BB")
+JOURNAL = struct.Struct("<HH")
+AUTOSAVE_DELAY = 0.5
+
+
+def encode_save(state: KlondikeState, seed: int, journal: MoveJournal) -> bytes:
+    """
+    Encode a game as a compact binary snapshot.
+
+    The snapshot starts with a header holding the magic bytes, the format version, the seed of the deal, the index of
+    the variant in rules.VARIANT_NAMES and the number of recycles, capped at 65535 since only limited recycling
+    counts them. Every pile follows, stock first, as its number of cards, its number of face-up cards and its encoded
+    cards, bottom first, one byte each. The journal ends the snapshot, as its number of moves, its cursor and its
+    packed moves, two bytes each. A game takes 94 bytes, plus two bytes per move that can be undone or redone.
+    :param state: State of the game.
+    :param seed: Seed of the deal.
+    :param journal: Moves of the game that can be undone and redone.
+    :return: Snapshot, immutable, so it can be handed to another thread.
+    """
+    parts = [HEADER.pack(MAGIC, VERSION, seed, VARIANT_NAMES.index(state.rules.name), min(state.recycles, 0xFFFF))]
+    for pile, face_up in zip(state.piles, state.face_up):
+        parts.append(PILE.pack(len(pile), face_up))
+        parts.append(pile.tobytes())
+    parts.append(JOURNAL.pack(len(journal.moves), journal.position))
+    parts.append(journal.moves.tobytes())
+    return b"".join(parts)
+
+
+def decode_save(data: bytes, max_depth: int = None) -> tuple:
+    """
+    Decode a snapshot written by encode_save, checking that it holds every card exactly once.
+    :param data: Snapshot.
+    :param max_depth: Maximum number of moves of the returned journal, the oldest ones being dropped, or None for no
+    limit.
+    :return: Tuple (state, seed, journal).
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("truncated save header")
+    magic, version, seed, variant, recycles = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'not a version {VERSION} save')
+    if variant >= len(VARIANT_NAMES):
+        raise ValueError(f'unknown variant {variant}')
+    state = KlondikeState(VARIANTS[VARIANT_NAMES[variant]])
+    state.recycles = recycles
+    offset = HEADER.size
+    for pile in range(PILES_NUM):
+        if len(data) < offset + PILE.size:
+            raise ValueError("truncated save")
+        size, face_up = PILE.unpack_from(data, offset)
+        offset += PILE.size
+        if face_up > size or len(data) < offset + size:
+            raise ValueError(f'corrupt pile {pile}')
+        state.piles[pile].frombytes(data[offset:offset + size])
+        state.face_up[pile] = face_up
+        offset += size
+    if sorted(card for pile in state.piles for card in pile) != list(range(DECK_SIZE)):
+        raise ValueError("save does not hold a full deck")
+    if len(data) < offset + JOURNAL.size:
+        raise ValueError("truncated save journal")
+    moves, position = JOURNAL.unpack_from(data, offset)
+    offset += JOURNAL.size
+    if position > moves or len(data) != offset + 2 * moves:
+        raise ValueError("corrupt save journal")
+    journal = MoveJournal(max_depth)
+    journal.moves.frombytes(data[offset:])
+    journal.position = position
+    if max_depth is not None and moves > max_depth:
+        dropped = min(moves - max_depth, position)
+        del journal.moves[:dropped]
+        del journal.moves[max_depth:]
+        journal.position -= dropped
+    return state, seed, journal
+
+
+def write_atomic(path: str, data: bytes):
+    """
+    Write a file so that it holds either its previous content or the new one, even if the process dies midway: the
+    data goes to a temporary file that then replaces the file.
+    :param path: Path of the file.
+    :param data: Content of the file.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def load_save(path: str, max_depth: int = None) -> tuple:
+    """
+    Read a save file.
+    :param path: Path of the save file.
+    :param max_depth: Maximum number of moves of the returned journal, or None for no limit.
+    :return: Tuple (state, seed, journal), see decode_save.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    try:
+        return decode_save(data, max_depth)
+    except ValueError as error:
+        raise ValueError(f'{path}: {error}') from None
+
+
+class Autosaver:
+    """
+    Background thread writing game snapshots, so the game loop never waits on the disk.
+
+    The game hands over a snapshot after every change with submit, which only stores it. The thread waits delay
+    seconds after the first snapshot of a burst and then writes the latest one, so a burst of moves produces a single
+    write. flush and close cut the wait short.
+    Attributes
+    ----------
+    path : str
+        Path of the save file.
+    delay : float
+        Seconds waited after a snapshot is submitted before writing, gathering the snapshots that follow.
+    pending : bytes
+        Latest snapshot not written yet, or None.
+    writing : bool
+        Flag indicating whether a snapshot is being written.
+    urgent : bool
+        Flag indicating whether the pending snapshot must be written without waiting for the delay.
+    writes : int
+        Number of writes made.
+    error : OSError
+        Error of the last failed write, or None.
+    condition : threading.Condition
+        Condition guarding pending and signalling the thread.
+    closed : bool
+        Flag indicating whether the thread was asked to stop.
+    thread : threading.Thread
+        Writer thread.
+    """
+    def __init__(self, path: str, delay: float = AUTOSAVE_DELAY):
+        """
+        Initialize an Autosaver object and start its thread.
+        :param path: Path of the save file.
+        :param delay: Seconds waited after a snapshot is submitted before writing.
+        """
+        self.path = path
+        self.delay = delay
+        self.pending = None
+        self.writing = False
+        self.urgent = False
+        self.writes = 0
+        self.error = None
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+        self.thread.start()
+
+    def submit(self, snapshot: bytes):
+        """
+        Hand a snapshot over to be written, replacing the one waiting if any.
+        :param snapshot: Snapshot returned by encode_save.
+        """
+        with self.condition:
+            self.pending = snapshot
+            self.condition.notify()
+
+    def run(self):
+        """
+        Write the submitted snapshots until closed, then write the last one.
+        """
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                self.condition.wait_for(lambda: self.closed or self.urgent, self.delay)
+                snapshot, self.pending = self.pending, None
+                self.writing = True
+                self.urgent = False
+            try:
+                write_atomic(self.path, snapshot)
+                self.writes += 1
+            except OSError as error:
+                self.error = error
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Write the submitted snapshot without waiting for the delay, and wait until it is written.
+        :param timeout: Seconds to wait at most, or None to wait as long as needed.
+        :return: true if nothing is left to write, false if the timeout expired.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while self.pending is not None or self.writing:
+                if not self.thread.is_alive():
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.urgent = True
+                self.condition.notify_all()
+                self.condition.wait(remaining)
+        return True
+
+    def close(self):
+        """
+        Write the snapshot waiting, if any, without the delay, and stop the thread.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
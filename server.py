@@ -0,0 +1,426 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+from journal import MoveJournal
+from move_index import MoveIndex
+from rules import CLASSIC, DECK_SIZE, VARIANT_NAMES, VARIANTS, Rules
+from state import PILES_NUM, KlondikeState, Move, shuffled_deck
+
+TABLE_HEADER = struct.Struct("<IBH")
+IDLE_SECONDS = 30.0
+EVICTION_INTERVAL = 5.0
+LINE_LIMIT = 1 << 16
+BACKLOG = 4096
+PILES = range(PILES_NUM)
+COUNTS = range(1, DECK_SIZE + 1)
+SEEDS = range(1 << 32)
+
+
+def request_int(request: dict, key: str, values: range) -> int:
+    """
+    Read an integer field of a request.
+    :param request: Decoded request.
+    :param key: Name of the field.
+    :param values: Range of the valid values.
+    :return: Value of the field.
+    :raises ValueError: if the field is not an integer of the range.
+    """
+    value = request[key]
+    if type(value) is not int or value not in values:
+        raise ValueError(f'invalid {key} {value!r}')
+    return value
+
+
+class Table:
+    """
+    Headless Solitaire table: a deal and the moves played on it.
+    Attributes
+    ----------
+    seed : int
+        Seed of the deal.
+    rules : Rules
+        Rules of the variant played.
+    state : KlondikeState
+        Current state of the table.
+    journal : MoveJournal
+        Moves played, that can be undone.
+    move_index : MoveIndex
+        Legal moves of the current state.
+    last_used : float
+        Time of the last command, from time.monotonic.
+    """
+    def __init__(self, seed: int, rules: Rules = CLASSIC):
+        """
+        Initialize a Table object with a new deal.
+        :param seed: Seed of the deal.
+        :param rules: Rules of the variant played.
+        """
+        self.seed = seed
+        self.rules = rules
+        self.state = KlondikeState.deal(shuffled_deck(seed), rules)
+        self.journal = MoveJournal()
+        self.move_index = MoveIndex(self.state)
+        self.last_used = time.monotonic()
+
+    def pack(self) -> bytes:
+        """
+        Serialize the table compactly: the seed, the index of the variant, the journal's cursor and its packed moves,
+        two bytes each.
+        :return: Serialized table.
+        """
+        header = TABLE_HEADER.pack(self.seed, VARIANT_NAMES.index(self.rules.name), self.journal.position)
+        return header + self.journal.moves.tobytes()
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "Table":
+        """
+        Rebuild a table serialized by pack, dealing its seed again and replaying the moves before the cursor.
+        :param data: Serialized table.
+        :return: Table object.
+        """
+        seed, variant, position = TABLE_HEADER.unpack_from(data)
+        table = cls(seed, VARIANTS[VARIANT_NAMES[variant]])
+        table.journal.moves.frombytes(data[TABLE_HEADER.size:])
+        for _ in range(position):
+            table.state.apply(table.journal.redo())
+        table.move_index = MoveIndex(table.state)
+        return table
+
+    def legal_moves(self) -> list:
+        """
+        Get the legal moves for a client, in a fixed order.
+        :return: Sorted list of (source, target, count) tuples.
+        """
+        return sorted(move[:3] for move in self.move_index.moves())
+
+    def play(self, move: Move) -> Move:
+        """
+        Play a legal move.
+        :param move: Move to be played.
+        :return: The applied Move, recording whether a card was turned face up.
+        """
+        move = self.state.apply(move)
+        self.move_index.update(move)
+        self.journal.record(move)
+        return move
+
+    def undo(self) -> Move:
+        """
+        Undo the last move played.
+        :return: The undone Move, or None if there was none.
+        """
+        move = self.journal.undo()
+        if move is not None:
+            self.state.undo(move)
+            self.move_index.update(move)
+        return move
+
+    def describe(self) -> dict:
+        """
+        Describe the table for a client.
+        :return: Dictionary with the seed, the variant, the piles, the face-up counts, the legal moves and whether the
+        game is won.
+        """
+        return {
+            "seed": self.seed,
+            "variant": self.rules.name,
+            "piles": [pile.tolist() for pile in self.state.piles],
+            "face_up": self.state.face_up,
+            "moves": self.legal_moves(),
+            "won": self.state.is_won(),
+        }
+
+
+class TableServer:
+    """
+    Asyncio server hosting many headless tables, speaking line-delimited JSON.
+
+    Every request is one JSON object per line with a 'cmd' key, and gets one JSON object per line in reply, with
+    'ok' set and the request's 'id' echoed back if it had one:
+    - new: open a table, dealt from 'seed' if given with the rules of 'variant' if given, and reply with its 'table'
+      id and state;
+    - deal: deal 'table' again, from 'seed' and with 'variant' if given;
+    - move: play 'source', 'target' and 'count' on 'table', replying whether a card was turned, whether the game is
+      won and the legal 'moves' that follow;
+    - undo: undo the last move of 'table', replying with it and the legal 'moves' that follow;
+    - state: reply with the state of 'table'.
+    A line longer than LINE_LIMIT gets a 'line too long' error and closes the connection.
+    Tables left idle for idle_seconds are evicted to their packed form and rebuilt on their next command.
+    Attributes
+    ----------
+    tables : dict
+        Live tables, keyed by id.
+    evicted : dict
+        Packed evicted tables, keyed by id.
+    next_id : int
+        Id of the next table.
+    idle_seconds : float
+        Idle time after which a table is evicted.
+    moves : int
+        Number of moves played.
+    evictions : int
+        Number of tables evicted.
+    """
+    def __init__(self, idle_seconds: float = IDLE_SECONDS):
+        """
+        Initialize a TableServer object.
+        :param idle_seconds: Idle time after which a table is evicted.
+        """
+        self.tables = {}
+        self.evicted = {}
+        self.next_id = 0
+        self.idle_seconds = idle_seconds
+        self.moves = 0
+        self.evictions = 0
+
+    def get_table(self, table_id: int) -> Table:
+        """
+        Get a table, rebuilding it if it was evicted.
+        :param table_id: Id of the table.
+        :return: Table object.
+        """
+        table = self.tables.get(table_id)
+        if table is None:
+            data = self.evicted.pop(table_id, None)
+            if data is None:
+                raise KeyError(f'unknown table {table_id}')
+            table = Table.unpack(data)
+            self.tables[table_id] = table
+        table.last_used = time.monotonic()
+        return table
+
+    @staticmethod
+    def new_table(request: dict) -> Table:
+        """
+        Deal a table for a 'new' or 'deal' request.
+        :param request: Decoded request, with an optional 'seed', an unsigned 32-bit integer, and 'variant'.
+        :return: Table object.
+        """
+        variant = request.get("variant", CLASSIC.name)
+        if not isinstance(variant, str) or variant not in VARIANTS:
+            raise ValueError(f'unknown variant {variant!r}')
+        seed = request_int(request, "seed", SEEDS) if "seed" in request else random.getrandbits(32)
+        return Table(seed, VARIANTS[variant])
+
+    def evict_idle(self) -> int:
+        """
+        Pack the tables left idle for idle_seconds. A table that cannot be packed stays live.
+        :return: Number of tables evicted.
+        """
+        deadline = time.monotonic() - self.idle_seconds
+        idle = [table_id for table_id, table in self.tables.items() if table.last_used < deadline]
+        evicted = 0
+        for table_id in idle:
+            try:
+                data = self.tables[table_id].pack()
+            except struct.error:
+                continue
+            self.evicted[table_id] = data
+            del self.tables[table_id]
+            evicted += 1
+        self.evictions += evicted
+        return evicted
+
+    def handle(self, request: dict) -> dict:
+        """
+        Run one command.
+        :param request: Decoded request.
+        :return: Reply to be encoded.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("request is not an object")
+        command = request.get("cmd")
+        if command == "new":
+            table = self.new_table(request)
+            table_id = self.next_id
+            self.next_id += 1
+            self.tables[table_id] = table
+            return {"ok": True, "table": table_id, **table.describe()}
+        if command not in ("deal", "move", "undo", "state"):
+            raise ValueError(f'unknown command {command!r}')
+        table_id = request["table"]
+        table = self.get_table(table_id)
+        if command == "deal":
+            table = self.new_table(request)
+            self.tables[table_id] = table
+            return {"ok": True, "table": table_id, **table.describe()}
+        if command == "move":
+            move = Move(
+                request_int(request, "source", PILES),
+                request_int(request, "target", PILES),
+                request_int(request, "count", COUNTS),
+            )
+            if not table.state.can_move(move):
+                raise ValueError(f'illegal move {list(move[:3])}')
+            move = table.play(move)
+            self.moves += 1
+            return {"ok": True, "flip": move.flip, "won": table.state.is_won(), "moves": table.legal_moves()}
+        if command == "undo":
+            move = table.undo()
+            if move is None:
+                raise ValueError("nothing to undo")
+            return {"ok": True, "move": list(move[:3]), "moves": table.legal_moves()}
+        return {"ok": True, "table": table_id, **table.describe()}
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answer the requests of one connection until it closes.
+        :param reader: Stream of the requests.
+        :param writer: Stream of the replies.
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # readline turns a line longer than LINE_LIMIT into a ValueError; the rest of the stream cannot be
+                    # framed, so the connection is closed after the reply.
+                    reply = {"ok": False, "error": "line too long"}
+                    writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                request = {}
+                try:
+                    request = json.loads(line)
+                    reply = self.handle(request)
+                except (KeyError, TypeError, ValueError) as error:
+                    reply = {"ok": False, "error": str(error)}
+                if isinstance(request, dict) and "id" in request:
+                    reply["id"] = request["id"]
+                writer.write(json.dumps(reply, separators=(",", ":")).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def evict_forever(self):
+        """
+        Evict the idle tables every EVICTION_INTERVAL seconds.
+        """
+        while True:
+            await asyncio.sleep(EVICTION_INTERVAL)
+            try:
+                self.evict_idle()
+            except Exception as error:
+                print(f'eviction failed: {error!r}', file=sys.stderr)
+
+    async def start(self, path: str = None, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """
+        Start listening and evicting idle tables.
+        :param path: Path of the Unix socket, or None to listen on TCP.
+        :param host: TCP host, localhost by default.
+        :param port: TCP port, 0 to pick a free one.
+        :return: Asyncio server object.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.serve_client, path, limit=LINE_LIMIT, backlog=BACKLOG)
+        else:
+            server = await asyncio.start_server(self.serve_client, host, port, limit=LINE_LIMIT, backlog=BACKLOG)
+        self.eviction_task = asyncio.create_task(self.evict_forever())
+        return server
+
+
+async def play_client(connect, moves: int, seed: int) -> int:
+    """
+    Play random legal moves on a new table through one connection.
+    :param connect: Coroutine function opening a connection and returning (reader, writer).
+    :param moves: Number of moves to play.
+    :param seed: Seed of the deal and of the random choices.
+    :return: Number of moves played.
+    """
+    reader, writer = await connect()
+    rng = random.Random(seed)
+
+    async def request(message: dict) -> dict:
+        writer.write(json.dumps(message).encode() + b"\n")
+        return json.loads(await reader.readline())
+
+    reply = await request({"cmd": "new", "seed": seed})
+    table_id = reply["table"]
+    played = 0
+    while played < moves and reply["moves"]:
+        source, target, count = rng.choice(reply["moves"])
+        reply = await request({"cmd": "move", "table": table_id, "source": source, "target": target, "count": count})
+        played += 1
+    writer.close()
+    return played
+
+
+async def benchmark(clients: int = 1000, moves: int = 100, path: str = None) -> dict:
+    """
+    Measure the moves per second a server sustains with many concurrent clients, each on its own connection.
+    :param clients: Number of concurrent connections.
+    :param moves: Number of moves every client plays.
+    :param path: Path of the Unix socket, or None to use TCP on localhost.
+    :return: Dictionary with the moves played, the elapsed seconds and the moves per second.
+    """
+    table_server = TableServer()
+    server = await table_server.start(path)
+    if path is not None:
+        async def connect():
+            return await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+    else:
+        port = server.sockets[0].getsockname()[1]
+
+        async def connect():
+            return await asyncio.open_connection("127.0.0.1", port, limit=LINE_LIMIT)
+    start = time.perf_counter()
+    played = sum(await asyncio.gather(*(play_client(connect, moves, seed) for seed in range(clients))))
+    elapsed = time.perf_counter() - start
+    server.close()
+    table_server.eviction_task.cancel()
+    return {"clients": clients, "moves": played, "seconds": elapsed, "moves_per_second": played / elapsed}
+
+
+async def serve(path: str, host: str, port: int, idle_seconds: float):
+    """
+    Run a server until interrupted.
+    :param path: Path of the Unix socket, or None to listen on TCP.
+    :param host: TCP host.
+    :param port: TCP port.
+    :param idle_seconds: Idle time after which a table is evicted.
+    """
+    server = await TableServer(idle_seconds).start(path, host, port)
+    for sock in server.sockets:
+        print(f'listening on {sock.getsockname()}')
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv: list = None):
+    """
+    Command-line entry point of the table server.
+    :param argv: List of command-line arguments, or None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Host headless Solitaire tables over line-delimited JSON.")
+    parser.add_argument("--unix", default=None, help="path of a Unix socket to listen on instead of TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="TCP host")
+    parser.add_argument("--port", type=int, default=7777, help="TCP port")
+    parser.add_argument("--idle", type=float, default=IDLE_SECONDS, help="seconds before an idle table is evicted")
+    parser.add_argument("--bench", type=int, default=None, metavar="CLIENTS", help="run the load benchmark")
+    parser.add_argument("--bench-moves", type=int, default=100, help="moves per benchmark client")
+    args = parser.parse_args(argv)
+
+    if args.bench is None:
+        asyncio.run(serve(args.unix, args.host, args.port, args.idle))
+        return
+    path = args.unix
+    if path is None and hasattr(asyncio, "start_unix_server"):
+        path = os.path.join(tempfile.mkdtemp(), "tables.sock")
+    result = asyncio.run(benchmark(args.bench, args.bench_moves, path))
+    print(f'{result["clients"]} clients, {result["moves"]} moves in {result["seconds"]:.2f} s '
+          f'({result["moves_per_second"]:,.0f} moves/s)')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import time
+
+import numpy as np
+
+from rules import CLASSIC, Rules
+from state import DECK_SIZE, PILES_NUM, STOCK, WASTE, KlondikeState, Move, shuffled_deck
+
+PILE_DEPTH = 24
+MAX_RUN = 13
+TARGETS = np.arange(2, PILES_NUM)
+FOUNDATIONS_NUM = 4
+DRAW = 0
+RECYCLE = 1
+NO_CARD = DECK_SIZE
+FACE_DOWN = DECK_SIZE + 1
+
+
+def _runs() -> tuple:
+    """
+    Enumerate every run of cards that can be picked up: the top card of the waste and of every foundation, and up to
+    MAX_RUN cards from every tableau pile.
+    :return: Tuple of arrays (sources, counts), one entry per run.
+    """
+    sources = [WASTE] + [pile for pile in range(2, 2 + FOUNDATIONS_NUM)]
+    counts = [1] * len(sources)
+    for pile in range(2 + FOUNDATIONS_NUM, PILES_NUM):
+        sources.extend([pile] * MAX_RUN)
+        counts.extend(range(1, MAX_RUN + 1))
+    return np.array(sources), np.array(counts)
+
+
+def placement_table(rules: Rules) -> np.ndarray:
+    """
+    Expand the rule tables of a variant into whether a card can be placed on a pile, for both kinds of target piles.
+
+    Cards and tops are encoded cards, NO_CARD standing for no card to move or an empty pile, and FACE_DOWN for a
+    face-down top card.
+    :param rules: Rules of the variant.
+    :return: Boolean array of shape (2, NO_CARD + 1, FACE_DOWN + 1), indexed by [is tableau, card, top card].
+    """
+    table = np.zeros((2, NO_CARD + 1, FACE_DOWN + 1), dtype=bool)
+    stack = np.frombuffer(rules.stack, dtype=np.uint8).reshape(DECK_SIZE, DECK_SIZE)
+    successor = np.frombuffer(rules.successor, dtype=np.uint8)
+    tops = np.arange(DECK_SIZE)
+    valid = successor < DECK_SIZE
+    table[0, successor[valid], tops[valid]] = True
+    table[0, :DECK_SIZE, NO_CARD] = np.frombuffer(rules.foundation_base, dtype=np.uint8).astype(bool)
+    table[1, :DECK_SIZE, :DECK_SIZE] = stack.astype(bool)
+    table[1, :DECK_SIZE, NO_CARD] = np.frombuffer(rules.tableau_base, dtype=np.uint8).astype(bool)
+    return table
+
+
+RUN_SOURCES, RUN_COUNTS = _runs()
+RUN_ALLOWED = (
+    (RUN_SOURCES[:, None] != TARGETS[None, :])
+    & ((RUN_COUNTS[:, None] == 1) | (TARGETS[None, :] >= 2 + FOUNDATIONS_NUM))
+)
+TARGET_OFFSETS = ((TARGETS >= 2 + FOUNDATIONS_NUM) * (NO_CARD + 1) * (FACE_DOWN + 1)).astype(np.int16)
+MOVE_SOURCES = np.concatenate(([STOCK, WASTE], np.repeat(RUN_SOURCES, len(TARGETS))))
+MOVE_TARGETS = np.concatenate(([WASTE, STOCK], np.tile(TARGETS, len(RUN_SOURCES))))
+MOVE_COUNTS = np.concatenate(([1, 0], np.repeat(RUN_COUNTS, len(TARGETS))))
+MOVES_NUM = len(MOVE_SOURCES)
+
+
+class BatchSimulator:
+    """
+    Many Klondike games held as fixed-shape NumPy arrays and stepped together.
+
+    Candidate move k moves MOVE_COUNTS[k] cards from pile MOVE_SOURCES[k] to pile MOVE_TARGETS[k]. Move DRAW turns
+    the variant's draw count of stock cards onto the waste and move RECYCLE turns the waste back into the stock, its
+    count being the size of the waste. The lengths of the stock and the waste act as the stock and waste cursors.
+    Attributes
+    ----------
+    rules : Rules
+        Rules of the variant every game is played with.
+    placement : numpy.ndarray
+        Placement table of the variant, see placement_table.
+    cards : numpy.ndarray
+        Encoded cards of shape (games, PILES_NUM, PILE_DEPTH), bottom first, -1 past the end of a pile.
+    lengths : numpy.ndarray
+        Number of cards of shape (games, PILES_NUM).
+    face_up : numpy.ndarray
+        Number of face-up cards at the top of every pile, of shape (games, PILES_NUM).
+    recycles : numpy.ndarray
+        Number of times the waste was turned back into the stock, of shape (games,).
+    """
+    def __init__(self, states: list):
+        """
+        Initialize a BatchSimulator object.
+        :param states: List of KlondikeState objects, one per game, all played with the same rules.
+        """
+        games = len(states)
+        self.rules = states[0].rules if states else CLASSIC
+        self.placement = placement_table(self.rules)
+        self.cards = np.full((games, PILES_NUM, PILE_DEPTH), -1, dtype=np.int8)
+        self.lengths = np.zeros((games, PILES_NUM), dtype=np.int16)
+        self.face_up = np.zeros((games, PILES_NUM), dtype=np.int16)
+        self.recycles = np.zeros(games, dtype=np.int16)
+        for game, state in enumerate(states):
+            for pile, cards in enumerate(state.piles):
+                self.cards[game, pile, :len(cards)] = cards
+                self.lengths[game, pile] = len(cards)
+            self.face_up[game] = state.face_up
+            self.recycles[game] = state.recycles
+
+    @classmethod
+    def from_seeds(cls, seeds: list, rules: Rules = CLASSIC) -> "BatchSimulator":
+        """
+        Deal one game per seed.
+        :param seeds: List of seeds.
+        :param rules: Rules of the variant.
+        :return: BatchSimulator object.
+        """
+        return cls([KlondikeState.deal(shuffled_deck(seed), rules) for seed in seeds])
+
+    def __len__(self) -> int:
+        """
+        Get the number of games.
+        :return: Number of games.
+        """
+        return len(self.lengths)
+
+    def state(self, game: int) -> KlondikeState:
+        """
+        Copy one game into a KlondikeState.
+        :param game: Index of the game.
+        :return: KlondikeState object.
+        """
+        state = KlondikeState(self.rules)
+        for pile in range(PILES_NUM):
+            state.piles[pile].extend(self.cards[game, pile, :self.lengths[game, pile]].tolist())
+        state.face_up = self.face_up[game].tolist()
+        state.recycles = int(self.recycles[game])
+        return state
+
+    def won(self) -> np.ndarray:
+        """
+        Check which games are won.
+        :return: Boolean array of shape (games,).
+        """
+        return self.lengths[:, 2:2 + FOUNDATIONS_NUM].sum(axis=1) == DECK_SIZE
+
+    def legal_mask(self) -> np.ndarray:
+        """
+        Compute the legality of every candidate move in every game, with the rules of KlondikeState.can_move.
+
+        Only the runs that can be picked up are gathered, with the top card of every target, and every (run, target)
+        pair is then looked up in the variant's placement table.
+        :return: Boolean array of shape (games, MOVES_NUM).
+        """
+        games = len(self)
+        game_index, run_index = np.nonzero(RUN_COUNTS <= self.face_up[:, RUN_SOURCES])
+        sources = RUN_SOURCES[run_index]
+        positions = self.lengths[game_index, sources] - RUN_COUNTS[run_index]
+        cards = self.cards[game_index, sources, positions].astype(np.int16)
+        cards *= self.placement.shape[2]
+
+        target_lengths = self.lengths[:, TARGETS]
+        tops = self.cards[np.arange(games)[:, None], TARGETS, np.maximum(target_lengths - 1, 0)].astype(np.int16)
+        tops[target_lengths == 0] = NO_CARD
+        tops[(target_lengths > 0) & (self.face_up[:, TARGETS] == 0)] = FACE_DOWN
+        tops += TARGET_OFFSETS
+
+        index = tops[game_index]
+        index += cards[:, None]
+        legal = self.placement.ravel().take(index)
+        legal &= RUN_ALLOWED[run_index]
+
+        mask = np.zeros((games, MOVES_NUM), dtype=bool)
+        mask[:, DRAW] = self.lengths[:, STOCK] > 0
+        mask[:, RECYCLE] = (self.lengths[:, STOCK] == 0) & (self.lengths[:, WASTE] > 0)
+        if self.rules.recycle_limit is not None:
+            mask[:, RECYCLE] &= self.recycles < self.rules.recycle_limit
+        mask[:, 2:].reshape(games, len(RUN_SOURCES), len(TARGETS))[game_index, run_index] = legal
+        return mask
+
+    def apply(self, choices: np.ndarray):
+        """
+        Apply one legal move per game.
+        :param choices: Integer array of shape (games,) holding the index of each game's move, or -1 to skip a game.
+        """
+        recycle = np.nonzero(choices == RECYCLE)[0]
+        if len(recycle):
+            waste_lengths = self.lengths[recycle, WASTE]
+            for depth in range(int(waste_lengths.max())):
+                selected = depth < waste_lengths
+                games = recycle[selected]
+                self.cards[games, STOCK, depth] = self.cards[games, WASTE, waste_lengths[selected] - 1 - depth]
+            self.cards[recycle, WASTE] = -1
+            self.lengths[recycle, STOCK] = waste_lengths
+            self.lengths[recycle, WASTE] = 0
+            self.face_up[recycle, WASTE] = 0
+            self.recycles[recycle] += 1
+
+        moving = np.nonzero((choices >= 0) & (choices != RECYCLE))[0]
+        if not len(moving):
+            return
+        move = choices[moving]
+        sources, targets, counts = MOVE_SOURCES[move], MOVE_TARGETS[move], MOVE_COUNTS[move]
+        reverse = None
+        if self.rules.draw_count > 1:
+            # Drawn cards are turned over one by one, so they land on the waste in reverse order
+            reverse = move == DRAW
+            counts = np.where(reverse, np.minimum(self.rules.draw_count, self.lengths[moving, STOCK]), counts)
+        source_base = self.lengths[moving, sources] - counts
+        target_base = self.lengths[moving, targets]
+        for offset in range(int(counts.max())):
+            selected = offset < counts
+            games = moving[selected]
+            source_depth = source_base[selected] + offset
+            if reverse is not None:
+                reversed_depth = source_base[selected] + counts[selected] - 1 - offset
+                source_depth = np.where(reverse[selected], reversed_depth, source_depth)
+            self.cards[games, targets[selected], target_base[selected] + offset] = \
+                self.cards[games, sources[selected], source_depth]
+            self.cards[games, sources[selected], source_depth] = -1
+        self.lengths[moving, sources] = source_base
+        self.lengths[moving, targets] = target_base + counts
+        self.face_up[moving, targets] += counts
+
+        from_piles = sources != STOCK
+        games, sources, counts = moving[from_piles], sources[from_piles], counts[from_piles]
+        remaining = self.face_up[games, sources] - counts
+        flip = (remaining == 0) & (self.lengths[games, sources] > 0)
+        self.face_up[games, sources] = np.where(flip, 1, remaining)
+
+    def step_random(self, rng: np.random.Generator) -> np.ndarray:
+        """
+        Apply a uniformly random legal move in every game that has one.
+        :param rng: NumPy random generator.
+        :return: Integer array of shape (games,) holding the applied moves, -1 where no move was legal.
+        """
+        games, moves = np.nonzero(self.legal_mask())
+        if not len(moves):
+            return np.full(len(self), -1)
+        counts = np.bincount(games, minlength=len(self))
+        offsets = np.cumsum(counts) - counts
+        picks = offsets + (rng.random(len(self)) * counts).astype(np.int64)
+        choices = np.where(counts > 0, moves[np.minimum(picks, len(moves) - 1)], -1)
+        self.apply(choices)
+        return choices
+
+
+def move_of(choice: int) -> Move:
+    """
+    Get the Move of a candidate move in a game, as the scalar engine names it.
+    :param choice: Index of the candidate move.
+    :return: Move object, with a count of 0 for the recycle and of 1 for the draw whatever the variant's draw count.
+    """
+    return Move(int(MOVE_SOURCES[choice]), int(MOVE_TARGETS[choice]), int(MOVE_COUNTS[choice]))
+
+
+def benchmark(games: int = 10000, steps: int = 100, seed: int = 0) -> dict:
+    """
+    Measure games stepped per second with random play, for the batch simulator and for the scalar engine.
+    :param games: Number of games stepped together by the batch simulator.
+    :param steps: Number of steps.
+    :param seed: Seed of the deals and of the random play.
+    :return: Dictionary with the game steps per second of both engines.
+    """
+    simulator = BatchSimulator.from_seeds(range(seed, seed + games))
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for _ in range(steps):
+        simulator.step_random(rng)
+    batch_rate = games * steps / (time.perf_counter() - start)
+
+    scalar_games = max(1, games // 100)
+    states = [KlondikeState.deal(shuffled_deck(game)) for game in range(seed, seed + scalar_games)]
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    for _ in range(steps):
+        for state in states:
+            moves = state.legal_moves()
+            if moves:
+                state.apply(moves[rng.integers(len(moves))])
+    scalar_rate = scalar_games * steps / (time.perf_counter() - start)
+    return {"batch_steps_per_second": batch_rate, "scalar_steps_per_second": scalar_rate}
+
+
+if __name__ == "__main__":
+    for name, value in benchmark().items():
+        print(f'{name}: {value:,.0f}')
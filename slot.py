@@ -18,8 +18,18 @@ class Slot:
         Width of the slot's border.
     original_height : int
         Original height of the slot.
+    card_offset : int
+        Vertical distance between two cards of the pile, as laid out by the last call to layout or layout_stock.
+    fan_offset : int
+        Vertical distance between two cards of the pile laid out one below the other.
+    positions : dict
+        Position of every card of the pile, keyed by card.
     """
-    def __init__(self, x: int, y: int, width: int, height: int, color: tuple, border_width: int):
+    __slots__ = ("rect", "color", "pile", "positions", "border_width", "original_height", "card_offset", "fan_offset")
+
+    def __init__(
+        self, x: int, y: int, width: int, height: int, color: tuple, border_width: int, fan_offset: int = 20
+    ):
         """
         Initialize a Slot object.
         :param x: X-coordinate of the slot's top-left corner.
@@ -28,12 +38,40 @@ class Slot:
         :param height: Height of the slot.
         :param color: Tuple (R, G, B) representing the color of the slot in RGB format.
         :param border_width: Width of the slot's border.
+        :param fan_offset: Vertical distance between two cards of the pile laid out one below the other.
         """
         self.rect = pygame.Rect(x, y, width, height)
         self.color = color
         self.pile = []
+        self.positions = {}
         self.border_width = border_width
         self.original_height = height
+        self.card_offset = 0
+        self.fan_offset = fan_offset
+
+    def resize(self, x: int, y: int, width: int, height: int, fan_offset: int):
+        """
+        Move and resize the slot. A slot whose cards are laid out one below the other keeps spanning all of them.
+        Its cards are placed by the next call to layout or layout_stock.
+        :param x: X-coordinate of the slot's top-left corner.
+        :param y: Y-coordinate of the slot's top-left corner.
+        :param width: Width of the slot.
+        :param height: Height of the slot without its fanned cards.
+        :param fan_offset: Vertical distance between two cards of the pile laid out one below the other.
+        """
+        self.rect = pygame.Rect(x, y, width, height)
+        self.original_height = height
+        self.fan_offset = fan_offset
+        if self.card_offset and self.pile:
+            self.rect.height += fan_offset * (len(self.pile) - 1)
+
+    def clear(self):
+        """
+        Remove every card from the slot, shrinking it back to its original height.
+        """
+        self.pile = []
+        self.positions = {}
+        self.rect.height = self.original_height
 
     def draw(self, screen: pygame.Surface):
         """
@@ -41,8 +79,7 @@ class Slot:
         :param screen: Pygame screen to draw the slot on.
         """
         pygame.draw.rect(screen, self.color, self.rect, self.border_width)
-        for i, card in enumerate(self.pile):
-            card.rect.topleft = (self.rect.left, self.rect.top + i * 20)
+        self.layout()
 
     def draw_stock(self, screen: pygame.Surface):
         """
@@ -50,7 +87,29 @@ class Slot:
         :param screen: Pygame screen to draw the stock pile on.
         """
         pygame.draw.rect(screen, self.color, self.rect, self.border_width)
+        self.layout_stock()
+
+    def draw_outline(self, screen: pygame.Surface):
+        """
+        Draw only the slot's border on the specified Pygame screen.
+        :param screen: Pygame screen to draw the border on.
+        """
+        pygame.draw.rect(screen, self.color, self.rect, self.border_width)
+
+    def layout(self):
+        """
+        Position the cards of the slot one below the other.
+        """
+        self.card_offset = self.fan_offset
         for i, card in enumerate(self.pile):
+            card.rect.topleft = (self.rect.left, self.rect.top + i * self.fan_offset)
+
+    def layout_stock(self):
+        """
+        Position the cards of the slot on top of each other.
+        """
+        self.card_offset = 0
+        for card in self.pile:
             card.rect.topleft = (self.rect.left, self.rect.top)
 
     def place_card(self, card: Card):
@@ -58,40 +117,46 @@ class Slot:
         Place a card on the slot.
         :param card: Card object to be placed on the slot.
         """
+        self.positions[card] = len(self.pile)
         self.pile.append(card)
         card.rect.topleft = self.rect.topleft
-        card.set_original_position(self.rect.topleft)
 
     def remove_card(self, card: Card):
         """
         Remove a card from the slot.
         :param card: Card object to be removed from the slot.
         """
-        self.pile.remove(card)
+        position = self.positions.pop(card)
+        if position == len(self.pile) - 1:
+            self.pile.pop()
+            return
+        del self.pile[position]
+        for i, pile_card in enumerate(self.pile[position:], position):
+            self.positions[pile_card] = i
 
     def remove_pile(self, pile: list):
         """
-        Remove a pile of cards from the slot.
+        Remove a pile of cards from the top of the slot in one slice, shrinking the slot by the removed cards.
         :param pile: List of Card objects representing the pile to be removed.
         """
-        for i, card in enumerate(pile):
-            card.stop_dragging()
-            self.pile.remove(card)
-            if len(self.pile) != 0 and self.rect.height < self.original_height:
-                self.rect.height -= 20
+        for card in pile:
+            del self.positions[card]
+        del self.pile[len(self.pile) - len(pile):]
+        if self.pile:
+            self.rect.height = max(self.original_height, self.rect.height - self.fan_offset * len(pile))
 
     def place_pile(self, pile: list):
         """
-        Place a pile of cards on the slot.
+        Place a pile of cards on the slot in one slice, growing the slot by the added cards.
         :param pile: List of Card objects representing the pile to be placed.
         """
-        for i, card in enumerate(pile):
-            if card.dragging:
-                card.stop_dragging()
+        if not pile:
+            return
+        for i, card in enumerate(pile, len(self.pile)):
             card.rect.topleft = (self.rect.left, self.rect.top)
-            if len(self.pile) != 0:
-                self.rect.height += 20
-            self.pile.append(card)
+            self.positions[card] = i
+        self.rect.height += self.fan_offset * (len(pile) if self.pile else len(pile) - 1)
+        self.pile.extend(pile)
 
     def get_draggable_pile(self, card: Card):
         """
@@ -100,21 +165,27 @@ class Slot:
         :return: List of Card objects representing the draggable pile.
         """
         if self.pile is not None:
-            return self.pile[self.pile.index(card):]
+            return self.pile[self.positions[card]:]
         return card
 
-    def start_dragging(self, pos: tuple, card: Card):
-        """
-        Start dragging the specified card and the associated draggable pile.
-        :param pos: Tuple containing the starting position of the drag.
-        :param card: Card object to be dragged.
-        """
-        draggable_pile = self.get_draggable_pile(card)
-        for card in draggable_pile:
-            new_x = pos[0]
-            new_y = pos[1]
-            new_pos = (new_x, new_y)
-            card.start_dragging(new_pos)
+    def card_index_at(self, pos: tuple) -> int:
+        """
+        Get the topmost card of the pile under a point, from the pile's layout.
+        :param pos: Tuple containing the point's position.
+        :return: Index of the card in the pile, or -1 if no card is under the point.
+        """
+        if not self.pile:
+            return -1
+        x, y = pos[0] - self.rect.left, pos[1] - self.rect.top
+        width, height = self.pile[0].rect.size
+        if x < 0 or x >= width or y < 0:
+            return -1
+        index = len(self.pile) - 1
+        if self.card_offset:
+            index = min(index, y // self.card_offset)
+        if y >= index * self.card_offset + height:
+            return -1
+        return index
 
     def get_top_card(self) -> Card:
         """
@@ -1,17 +1,48 @@
+import argparse
+
 from game import Game
+from library import TIERS, DealLibrary
+from profiler import FrameProfiler
+from rules import VARIANT_NAMES, VARIANTS
+from telemetry import Telemetry
 
 
-def main():
+def main(argv: list = None):
     """
     Main function to run Solitaire.
 
     It creates an instance of the Game class, initializes the game slots and card deck,
-    deals the cards, and then runs the game.
+    resumes the saved game or deals the cards, and then runs the game. With --replays, every deal is recorded as a
+    replay in that directory. The game is saved in the background after every move.
+    :param argv: List of command-line arguments, or None to use sys.argv.
     """
-    game = Game()
+    parser = argparse.ArgumentParser(description="Play Solitaire.")
+    parser.add_argument("--profile", action="store_true", help="time every frame; F3 toggles the performance HUD")
+    parser.add_argument("--trace", default=None, help="CSV or JSON file receiving the frame timings on exit")
+    parser.add_argument("--library", default=None, help="deal library built by library.py to pick deals from")
+    parser.add_argument("--winnable", action="store_true", help="only deal winnable deals from the library")
+    parser.add_argument("--tier", choices=TIERS, default=None, help="difficulty of the deals picked from the library")
+    parser.add_argument("--low-latency", action="store_true", help="handle input right before drawing each frame")
+    parser.add_argument("--save", default="solitaire.sav", help="file the game is saved to and resumed from")
+    parser.add_argument("--new", action="store_true", help="deal a new game instead of resuming the saved one")
+    parser.add_argument("--lazy", action="store_true", help="load the card faces the first time they are shown")
+    parser.add_argument("--telemetry", metavar="DIR", default=None, help="directory receiving gameplay telemetry")
+    parser.add_argument("--replays", metavar="DIR", default=None, help="directory receiving a replay of every deal")
+    parser.add_argument("--variant", choices=VARIANT_NAMES, default="klondike", help="rules of the game")
+    args = parser.parse_args(argv)
+
+    profiler = FrameProfiler(args.trace) if args.profile or args.trace else None
+    deal_library = DealLibrary(args.library) if args.library else None
+    if deal_library is not None and deal_library.variant != args.variant:
+        parser.error(f'{args.library} holds {deal_library.variant} deals, not {args.variant} ones')
+    game = Game(replay_dir=args.replays, profiler=profiler, deal_library=deal_library,
+                rules=VARIANTS[args.variant], low_latency=args.low_latency, save_path=args.save,
+                telemetry=Telemetry(args.telemetry) if args.telemetry else None, lazy_faces=args.lazy)
+    game.set_deal_filter(True if args.winnable else None, args.tier)
     game.create_slots()
     game.create_card_deck()
-    game.deal_cards()
+    if args.new or not game.resume_game():
+        game.deal_cards(game.select_deal())
     game.run()
 
 
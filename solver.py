@@ -0,0 +1,393 @@
+import heapq
+import random
+import time
+from array import array
+from typing import NamedTuple
+
+from state import DECK_SIZE, FOUNDATIONS, STOCK, TABLEAU, WASTE, KlondikeState, Move
+
+TABLEAU_DEPTH = 20
+MAX_RECYCLES = 256
+ZOBRIST_SEED = 0x5EED
+MASK64 = (1 << 64) - 1
+
+
+def mix(value: int) -> int:
+    """
+    Scramble a 64-bit value with the splitmix64 finalizer, a bijection mapping 0 to 0.
+    :param value: 64-bit value.
+    :return: 64-bit value.
+    """
+    value = (value ^ (value >> 30)) * 0xBF58476D1CE4E5B9 & MASK64
+    value = (value ^ (value >> 27)) * 0x94D049BB133111EB & MASK64
+    return value ^ (value >> 31)
+
+
+class Zobrist:
+    """
+    Zobrist keys for hashing Klondike states.
+
+    Tableau cards are keyed by card, depth and face, foundation cards by card only, stock and waste cards by card and
+    depth. Every tableau pile is hashed on its own from the keys of its cards, and the pile hashes are scrambled by mix
+    before being combined, so a state hashes the same whatever the order of its tableau piles or of its foundations,
+    while moving cards between tableau piles changes the hash.
+    Attributes
+    ----------
+    tableau : list of int
+        Keys of the tableau cards, indexed by (card * TABLEAU_DEPTH + depth) * 2 + face.
+    foundations : list of int
+        Keys of the foundation cards, indexed by card.
+    stock : list of int
+        Keys of the stock cards, indexed by card * DECK_SIZE + depth.
+    waste : list of int
+        Keys of the waste cards, indexed by card * DECK_SIZE + depth.
+    recycles : list of int
+        Keys of the number of recycles, only hashed when the variant limits recycling.
+    """
+    def __init__(self, seed: int = ZOBRIST_SEED):
+        """
+        Initialize a Zobrist object.
+        :param seed: Seed of the random generator drawing the keys.
+        """
+        rng = random.Random(seed)
+        self.tableau = [rng.getrandbits(64) for _ in range(DECK_SIZE * TABLEAU_DEPTH * 2)]
+        self.foundations = [rng.getrandbits(64) for _ in range(DECK_SIZE)]
+        self.stock = [rng.getrandbits(64) for _ in range(DECK_SIZE * DECK_SIZE)]
+        self.waste = [rng.getrandbits(64) for _ in range(DECK_SIZE * DECK_SIZE)]
+        self.recycles = [rng.getrandbits(64) for _ in range(MAX_RECYCLES)]
+
+    def key(self, pile: int, card: int, depth: int, face_up: bool) -> int:
+        """
+        Get the key of a card lying in a pile.
+        :param pile: Index of the pile.
+        :param card: Encoded card.
+        :param depth: Position of the card in the pile, 0 being the bottom.
+        :param face_up: Whether the card is face up.
+        :return: 64-bit key.
+        """
+        if pile in TABLEAU:
+            return self.tableau[(card * TABLEAU_DEPTH + depth) * 2 + face_up]
+        if pile in FOUNDATIONS:
+            return self.foundations[card]
+        if pile == WASTE:
+            return self.waste[card * DECK_SIZE + depth]
+        return self.stock[card * DECK_SIZE + depth]
+
+    def pile_hash(self, state: KlondikeState, pile: int) -> int:
+        """
+        Hash the cards of a pile, before scrambling for a tableau pile.
+        :param state: State holding the pile.
+        :param pile: Index of the pile.
+        :return: 64-bit hash.
+        """
+        cards = state.piles[pile]
+        face_down = len(cards) - state.face_up[pile]
+        value = 0
+        for depth, card in enumerate(cards):
+            value ^= self.key(pile, card, depth, depth >= face_down)
+        return value
+
+    def hash(self, state: KlondikeState) -> int:
+        """
+        Hash a state from scratch.
+        :param state: State to be hashed.
+        :return: 64-bit hash.
+        """
+        value = 0
+        if state.rules.recycle_limit is not None:
+            value = self.recycles[state.recycles]
+        for pile in range(len(state.piles)):
+            if pile in TABLEAU:
+                value ^= mix(self.pile_hash(state, pile))
+            else:
+                value ^= self.pile_hash(state, pile)
+        return value
+
+    def update(self, value: int, state: KlondikeState, move: Move) -> int:
+        """
+        Update the hash of a state after a move, touching only the cards the move changed.
+        :param value: Hash of the state before the move.
+        :param state: State after the move.
+        :param move: Applied move, as returned by KlondikeState.apply.
+        :return: 64-bit hash of the state after the move.
+        """
+        source, target, count = move.source, move.target, move.count
+        if source == WASTE and target == STOCK:
+            stock = state.piles[STOCK]
+            top = len(stock) - 1
+            for depth, card in enumerate(stock):
+                value ^= self.stock[card * DECK_SIZE + depth] ^ self.waste[card * DECK_SIZE + top - depth]
+            if state.rules.recycle_limit is not None:
+                value ^= self.recycles[state.recycles - 1] ^ self.recycles[state.recycles]
+            return value
+
+        source_pile = state.piles[source]
+        target_pile = state.piles[target]
+        source_depth = len(source_pile)
+        target_depth = len(target_pile) - count
+        source_change = target_change = 0
+        for i in range(count):
+            card = target_pile[target_depth + i]
+            depth = source_depth + count - 1 - i if source == STOCK else source_depth + i
+            source_change ^= self.key(source, card, depth, True)
+            target_change ^= self.key(target, card, target_depth + i, True)
+        if move.flip:
+            card = source_pile[-1]
+            source_change ^= self.key(source, card, source_depth - 1, False)
+            source_change ^= self.key(source, card, source_depth - 1, True)
+        for pile, change in ((source, source_change), (target, target_change)):
+            if pile in TABLEAU:
+                pile_value = self.pile_hash(state, pile)
+                value ^= mix(pile_value ^ change) ^ mix(pile_value)
+            else:
+                value ^= change
+        return value
+
+
+class TranspositionTable:
+    """
+    Bounded table of the states already reached and the fewest moves they were reached with.
+
+    The table is a fixed array of two-entry buckets indexed by the low bits of the hash. When both entries of a
+    bucket are taken, the entry reached with more moves is evicted, as it prunes fewer states.
+    Attributes
+    ----------
+    keys : array
+        Hashes of the stored states.
+    depths : array
+        Number of moves each stored state was reached with.
+    mask : int
+        Mask selecting the bucket of a hash.
+    stores : int
+        Number of states stored.
+    evictions : int
+        Number of stored states overwritten by another state.
+    """
+    def __init__(self, bits: int = 20):
+        """
+        Initialize a TranspositionTable object.
+        :param bits: Base-2 logarithm of the number of buckets.
+        """
+        size = 2 << bits
+        self.keys = array('Q', bytes(8 * size))
+        self.depths = array('H', [0xFFFF]) * size
+        self.mask = (1 << bits) - 1
+        self.stores = 0
+        self.evictions = 0
+
+    def visit(self, key: int, depth: int) -> bool:
+        """
+        Record that a state was reached, unless it was already reached with as few moves.
+        :param key: Hash of the state.
+        :param depth: Number of moves the state was reached with.
+        :return: true if the state is new or reached with fewer moves than before, false otherwise.
+        """
+        index = (key & self.mask) << 1
+        keys, depths = self.keys, self.depths
+        for slot in (index, index + 1):
+            if keys[slot] == key and depths[slot] != 0xFFFF:
+                if depths[slot] <= depth:
+                    return False
+                depths[slot] = depth
+                return True
+        if depths[index] != 0xFFFF and (depths[index + 1] == 0xFFFF or depths[index] < depths[index + 1]):
+            index += 1
+        if depths[index] != 0xFFFF:
+            self.evictions += 1
+        keys[index] = key
+        depths[index] = depth
+        self.stores += 1
+        return True
+
+
+class SolveResult(NamedTuple):
+    """
+    Outcome of a search.
+
+    winnable is None when a budget ran out before the deal could be won or proven lost.
+    """
+    winnable: bool
+    solution: list
+    nodes: int
+    elapsed: float
+    nodes_per_second: float
+    evictions: int
+
+
+def lower_bound(state: KlondikeState) -> int:
+    """
+    Get a lower bound on the number of moves left to win, one per card not on the foundations.
+    :param state: State to be estimated.
+    :return: Number of moves.
+    """
+    return DECK_SIZE - sum(len(state.piles[pile]) for pile in FOUNDATIONS)
+
+
+def estimate(state: KlondikeState) -> int:
+    """
+    Estimate the number of moves left to win, counting face-down tableau cards twice.
+    :param state: State to be estimated.
+    :return: Number of moves.
+    """
+    face_down = sum(len(state.piles[pile]) - state.face_up[pile] for pile in TABLEAU)
+    return lower_bound(state) + face_down
+
+
+def is_safe_foundation_card(state: KlondikeState, card: int) -> bool:
+    """
+    Check if sending a card to the foundations can never block a solution.
+
+    Aces and twos are always safe, as is any card whose two predecessors of the other color are already on the
+    foundations, since nothing could still need to be stacked on it.
+    :param state: Current state.
+    :param card: Encoded card.
+    :return: true if the card is safe to send to the foundations, false otherwise.
+    """
+    rank = card % 13
+    if rank <= 1:
+        return True
+    heights = {}
+    for pile in FOUNDATIONS:
+        if state.piles[pile]:
+            top_card = state.piles[pile][-1]
+            heights[top_card // 13] = top_card % 13 + 1
+    other_suites = (2, 3) if card < 26 else (0, 1)
+    return all(heights.get(suite, 0) >= rank for suite in other_suites)
+
+
+def search_moves(state: KlondikeState, partial_runs: bool = False) -> list:
+    """
+    Get the legal moves worth searching.
+
+    A safe move to the foundations is played alone. Moves between foundations and moving a whole tableau pile onto an
+    empty tableau pile are skipped, as they only reach states that hash the same as the current one. Unless
+    partial_runs is set, moving part of a face-up run is skipped as well when it does not uncover a card for the
+    foundations: most solutions are found much sooner without these moves, but some deals can only be won with them.
+    :param state: Current state.
+    :param partial_runs: Whether to keep every move of part of a face-up run, so that no solution is missed.
+    :return: List of Move objects.
+    """
+    moves = []
+    piles = state.piles
+    for move in state.legal_moves():
+        source, target, count = move.source, move.target, move.count
+        if target in FOUNDATIONS:
+            if source in FOUNDATIONS:
+                continue
+            if is_safe_foundation_card(state, piles[source][-1]):
+                return [move]
+        elif source in TABLEAU:
+            if count == len(piles[source]) and not piles[target]:
+                continue
+            if not partial_runs and count < state.face_up[source]:
+                uncovered = piles[source][-count - 1]
+                if not any(state.can_place(uncovered, pile) for pile in FOUNDATIONS):
+                    continue
+        moves.append(move)
+    return moves
+
+
+def unroll_path(path: tuple) -> tuple:
+    """
+    Unroll a linked path of moves.
+    :param path: Tuple (move, parent path), None being the empty path.
+    :return: Tuple of the moves from the first to the last.
+    """
+    moves = []
+    while path is not None:
+        move, path = path
+        moves.append(move)
+    moves.reverse()
+    return tuple(moves)
+
+
+_zobrist = Zobrist()
+
+
+def solve(
+    state: KlondikeState,
+    max_nodes: int = 200000,
+    max_seconds: float = 10.0,
+    weight: float = 2.0,
+    table_bits: int = 20,
+    optimize: bool = True,
+) -> SolveResult:
+    """
+    Search for the shortest solution of a state with a weighted best-first search.
+
+    States are ordered by moves made plus weight times the estimated moves left, and reached states are collapsed
+    through the transposition table. When optimizing, the search keeps going after the first solution while the
+    budgets allow, pruning every state that cannot beat the best solution found.
+
+    The search first skips the moves of part of a face-up run that search_moves leaves out. If it runs out of states
+    without a solution, it starts over with every move while the budgets allow, so a deal is only reported as not
+    winnable when no state is left with no move skipped but the ones reaching states already hashed.
+    :param state: State to be solved. It is not modified.
+    :param max_nodes: Maximum number of states to expand.
+    :param max_seconds: Maximum duration of the search in seconds.
+    :param weight: Weight of the estimate; higher values find a solution sooner but a longer one.
+    :param table_bits: Base-2 logarithm of the number of transposition table buckets.
+    :param optimize: Whether to keep searching for a shorter solution after the first one.
+    :return: SolveResult object.
+    """
+    zobrist = _zobrist
+    start = time.perf_counter()
+    deadline = start + max_seconds
+
+    root_hash = zobrist.hash(state)
+    best = None
+    if state.is_won():
+        best = ()
+    nodes = 0
+    evictions = 0
+    exhausted = False
+    for partial_runs in (False, True):
+        table = TranspositionTable(table_bits)
+        table.visit(root_hash, 0)
+        counter = 0
+        frontier = [(0.0, counter, 0, state, root_hash, None)]
+        while frontier:
+            if nodes >= max_nodes or (nodes & 255 == 0 and time.perf_counter() > deadline):
+                exhausted = True
+                break
+            _, _, depth, current, current_hash, path = heapq.heappop(frontier)
+            if best is not None and depth + lower_bound(current) >= len(best):
+                continue
+            nodes += 1
+            for move in search_moves(current, partial_runs):
+                child = current.copy()
+                applied = child.apply(move)
+                child_hash = zobrist.update(current_hash, child, applied)
+                if not table.visit(child_hash, depth + 1):
+                    continue
+                child_path = (applied, path)
+                if child.is_won():
+                    best = unroll_path(child_path)
+                    if not optimize:
+                        frontier = []
+                        break
+                    continue
+                if best is not None and depth + 1 + lower_bound(child) >= len(best):
+                    continue
+                counter += 1
+                priority = depth + 1 + weight * estimate(child)
+                heapq.heappush(frontier, (priority, counter, depth + 1, child, child_hash, child_path))
+        evictions += table.evictions
+        if best is not None or exhausted:
+            break
+
+    elapsed = time.perf_counter() - start
+    if best is not None:
+        winnable = True
+    elif exhausted:
+        winnable = None
+    else:
+        winnable = False
+    return SolveResult(
+        winnable,
+        list(best) if best is not None else [],
+        nodes,
+        elapsed,
+        nodes / elapsed if elapsed > 0 else 0.0,
+        evictions,
+    )
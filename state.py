@@ -0,0 +1,286 @@
+import random
+from array import array
+from typing import NamedTuple
+
+from rules import CLASSIC, DECK_SIZE, Rules
+
+SUITE_NAMES = ("hearts", "diamonds", "clubs", "spades")
+
+STOCK = 0
+WASTE = 1
+FOUNDATIONS = range(2, 6)
+TABLEAU = range(6, 13)
+PILES_NUM = 13
+
+
+def card_id(suite_index: int, rank_value: int) -> int:
+    """
+    Encode a card as a small integer.
+    :param suite_index: Index of the card's suite in SUITE_NAMES.
+    :param rank_value: Value of the card's rank, from 1 (Ace) to 13 (King).
+    :return: Integer from 0 to 51.
+    """
+    return suite_index * 13 + rank_value - 1
+
+
+def card_rank(card: int) -> int:
+    """
+    Get the rank value of an encoded card.
+    :param card: Encoded card.
+    :return: Value of the card's rank, from 1 (Ace) to 13 (King).
+    """
+    return card % 13 + 1
+
+
+def shuffled_deck(seed: int) -> list:
+    """
+    Shuffle a deck deterministically.
+    :param seed: Seed of the deal.
+    :return: List of the 52 encoded cards, in the order they are dealt.
+    """
+    deck = list(range(DECK_SIZE))
+    random.Random(seed).shuffle(deck)
+    return deck
+
+
+class Move(NamedTuple):
+    """
+    A move of cards between two piles.
+
+    Drawing from the stock is a move of the drawn cards from STOCK to WASTE, turned over one by one, and recycling the
+    waste is a move of the whole waste from WASTE to STOCK.
+    """
+    source: int
+    target: int
+    count: int
+    flip: bool = False
+
+
+class KlondikeState:
+    """
+    Headless state of a Klondike game.
+    Attributes
+    ----------
+    piles : list of array
+        Encoded cards of every pile, bottom first, in the order stock, waste, foundations, tableau.
+    face_up : list of int
+        Number of face-up cards at the top of every pile.
+    rules : Rules
+        Rules of the variant being played.
+    recycles : int
+        Number of times the waste was turned back into the stock.
+    """
+    def __init__(self, rules: Rules = CLASSIC):
+        """
+        Initialize an empty KlondikeState object.
+        :param rules: Rules of the variant being played.
+        """
+        self.piles = [array('b') for _ in range(PILES_NUM)]
+        self.face_up = [0] * PILES_NUM
+        self.rules = rules
+        self.recycles = 0
+
+    @classmethod
+    def deal(cls, deck: list, rules: Rules = CLASSIC) -> "KlondikeState":
+        """
+        Deal a shuffled deck the way the game deals it.
+
+        Each round deals one card to every tableau pile starting from the round's index, then the remaining cards
+        go to the stock and the top card of every tableau pile is turned face up.
+        :param deck: List of the 52 encoded cards, in the order they are dealt.
+        :param rules: Rules of the variant being played.
+        :return: KlondikeState object holding the dealt game.
+        """
+        state = cls(rules)
+        position = 0
+        for first_pile in range(len(TABLEAU)):
+            for pile in TABLEAU[first_pile:]:
+                state.piles[pile].append(deck[position])
+                position += 1
+        state.piles[STOCK].extend(deck[position:])
+        for pile in TABLEAU:
+            state.face_up[pile] = 1
+        return state
+
+    def copy(self) -> "KlondikeState":
+        """
+        Copy the state.
+        :return: KlondikeState object independent of this one.
+        """
+        state = KlondikeState.__new__(KlondikeState)
+        state.piles = [pile[:] for pile in self.piles]
+        state.face_up = self.face_up[:]
+        state.rules = self.rules
+        state.recycles = self.recycles
+        return state
+
+    def can_place(self, card: int, target: int) -> bool:
+        """
+        Check if a card can be placed on the target pile with the rule tables of the variant.
+        :param card: Encoded card to be checked.
+        :param target: Index of the foundation or tableau pile.
+        :return: true if the card can be placed on the pile, false otherwise.
+        """
+        pile = self.piles[target]
+        rules = self.rules
+        if target in FOUNDATIONS:
+            if not pile:
+                return bool(rules.foundation_base[card])
+            return rules.successor[pile[-1]] == card
+        if target in TABLEAU:
+            if not pile:
+                return bool(rules.tableau_base[card])
+            return bool(rules.stack[card * DECK_SIZE + pile[-1]]) and self.face_up[target] > 0
+        return False
+
+    def can_move(self, move: Move) -> bool:
+        """
+        Check if a move is legal.
+        :param move: Move to be checked.
+        :return: true if the move can be applied, false otherwise.
+        """
+        source, target, count = move.source, move.target, move.count
+        if source == STOCK:
+            return target == WASTE and count == self.rules.draw_size(len(self.piles[STOCK])) > 0
+        if source == WASTE and target == STOCK:
+            return (
+                not self.piles[STOCK]
+                and count == len(self.piles[WASTE]) > 0
+                and self.rules.can_recycle(self.recycles)
+            )
+        if source == target or count < 1 or count > self.face_up[source]:
+            return False
+        if source in TABLEAU:
+            if target in FOUNDATIONS and count != 1:
+                return False
+        elif count != 1:
+            return False
+        return self.can_place(self.piles[source][-count], target)
+
+    def legal_moves(self) -> list:
+        """
+        Get every legal move.
+
+        The cards accepted by every foundation and tableau pile are collected first, so each movable card is matched
+        against its targets with a dictionary lookup instead of testing every pile.
+        :return: List of Move objects.
+        """
+        piles = self.piles
+        face_up = self.face_up
+        rules = self.rules
+        moves = []
+        if piles[STOCK]:
+            moves.append(Move(STOCK, WASTE, rules.draw_size(len(piles[STOCK]))))
+        elif piles[WASTE] and rules.can_recycle(self.recycles):
+            moves.append(Move(WASTE, STOCK, len(piles[WASTE])))
+
+        foundation_targets = {}
+        empty_foundations = []
+        for target in FOUNDATIONS:
+            pile = piles[target]
+            if not pile:
+                empty_foundations.append(target)
+            else:
+                foundation_targets[rules.successor[pile[-1]]] = target
+        tableau_targets = {}
+        empty_tableau = []
+        for target in TABLEAU:
+            pile = piles[target]
+            if not pile:
+                empty_tableau.append(target)
+            elif face_up[target]:
+                for card in rules.stackable[pile[-1]]:
+                    tableau_targets.setdefault(card, []).append(target)
+
+        for source in range(WASTE, PILES_NUM):
+            pile = piles[source]
+            if not pile:
+                continue
+            max_count = face_up[source] if source in TABLEAU else 1
+            for count in range(1, max_count + 1):
+                card = pile[-count]
+                if count == 1:
+                    if rules.foundation_base[card]:
+                        targets = empty_foundations
+                    else:
+                        targets = (foundation_targets[card],) if card in foundation_targets else ()
+                    for target in targets:
+                        if target != source:
+                            moves.append(Move(source, target, 1))
+                targets = empty_tableau if rules.tableau_base[card] else tableau_targets.get(card, ())
+                for target in targets:
+                    if target != source:
+                        moves.append(Move(source, target, count))
+        return moves
+
+    def apply(self, move: Move) -> Move:
+        """
+        Apply a legal move.
+
+        The top card left on the source tableau pile is turned face up if it was face down. Drawn cards are turned
+        over one by one, so the last card drawn ends on top of the waste.
+        :param move: Move to be applied.
+        :return: The applied Move, recording whether a card was turned face up, to be passed to undo.
+        """
+        source, target, count = move.source, move.target, move.count
+        source_pile = self.piles[source]
+        target_pile = self.piles[target]
+        if source == WASTE and target == STOCK:
+            source_pile.reverse()
+            target_pile.extend(source_pile)
+            del source_pile[:]
+            self.face_up[WASTE] = 0
+            self.recycles += 1
+            return Move(source, target, count)
+
+        if source == STOCK:
+            moved = source_pile[-count:]
+            moved.reverse()
+            target_pile.extend(moved)
+        else:
+            target_pile.extend(source_pile[-count:])
+        del source_pile[-count:]
+        self.face_up[target] += count
+        flip = False
+        if source != STOCK:
+            self.face_up[source] -= count
+            if source_pile and self.face_up[source] == 0:
+                self.face_up[source] = 1
+                flip = True
+        return Move(source, target, count, flip)
+
+    def undo(self, move: Move):
+        """
+        Undo a move returned by apply. Moves must be undone in the reverse order they were applied.
+        :param move: Applied move to be undone.
+        """
+        source, target, count = move.source, move.target, move.count
+        source_pile = self.piles[source]
+        target_pile = self.piles[target]
+        if source == WASTE and target == STOCK:
+            target_pile.reverse()
+            source_pile.extend(target_pile)
+            del target_pile[:]
+            self.face_up[WASTE] = count
+            self.recycles -= 1
+            return
+
+        if move.flip:
+            self.face_up[source] = 0
+        if source == STOCK:
+            moved = target_pile[-count:]
+            moved.reverse()
+            source_pile.extend(moved)
+        else:
+            source_pile.extend(target_pile[-count:])
+        del target_pile[-count:]
+        self.face_up[target] -= count
+        if source != STOCK:
+            self.face_up[source] += count
+
+    def is_won(self) -> bool:
+        """
+        Check if every card is on the foundations.
+        :return: true if the game is won, false otherwise.
+        """
+        return sum(len(self.piles[pile]) for pile in FOUNDATIONS) == DECK_SIZE
@@ -1,12 +1,34 @@
 class Suite:
     """
     A Suite object for a Card
+
+    Suites are interned: constructing a suite with the name of an existing one returns the existing object, so every
+    card of a suite shares it.
     """
-    def __init__(self, suite_name: str, suite_color: str):
+    __slots__ = ("name", "color")
+    _instances = {}
+
+    def __new__(cls, suite_name: str, suite_color: str):
         """
-        Initialize a Suite object.
+        Get the Suite object of a name, creating it the first time.
         :param suite_name: A string representing the name of the card suite.
         :param suite_color: A string representing the color of the card suite.
+        :raises ValueError: If a suite of that name already exists with another color.
         """
-        self.name = suite_name
-        self.color = suite_color
+        suite = cls._instances.get(suite_name)
+        if suite is None:
+            suite = super().__new__(cls)
+            suite.name = suite_name
+            suite.color = suite_color
+            cls._instances[suite_name] = suite
+        elif suite.color != suite_color:
+            raise ValueError(f"suite {suite_name} already exists with color {suite.color}")
+        return suite
+
+
+SUITES = (
+    Suite("hearts", "RED"),
+    Suite("diamonds", "RED"),
+    Suite("clubs", "BLACK"),
+    Suite("spades", "BLACK"),
+)
@@ -0,0 +1,271 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+from typing import NamedTuple
+
+MAGIC = b"SLTM"
+VERSION = 1
+HEADER = struct.Struct("<4sB")
+RECORD = struct.Struct("<QIIBBBB")
+KINDS = ("deal", "move", "recycle", "undo", "redo", "win", "abandon")
+DEAL, MOVE, RECYCLE, UNDO, REDO, WIN, ABANDON = range(len(KINDS))
+CAPACITY = 4096
+FLUSH_INTERVAL = 1.0
+MAX_FILE_BYTES = 1 << 20
+MAX_FILES = 8
+TELEMETRY_EXTENSION = ".slt"
+
+
+class TelemetryRecord(NamedTuple):
+    """
+    Gameplay event, as stored in a telemetry file.
+
+    time is the wall-clock time of the event in milliseconds since the epoch, and interval the milliseconds elapsed
+    since the previous event of the game. source, target and count describe the move of move, recycle, undo and redo
+    events, and are 0 otherwise.
+    """
+    time: int
+    seed: int
+    interval: int
+    kind: int
+    source: int
+    target: int
+    count: int
+
+
+class Telemetry:
+    """
+    Gameplay telemetry, recorded into a ring buffer and written to rotating files by a background thread.
+
+    The game thread is the only producer: record packs a fixed-size RECORD into the next slot of the buffer and then
+    publishes it by advancing head, without taking a lock or waking the writer. The writer thread wakes every
+    flush_interval seconds, copies the records published since its last batch, advances tail to free their slots and
+    appends them to the current file. When the buffer is full, new records are counted as dropped instead of
+    growing it, so the memory used is bounded by capacity records.
+
+    Every file starts with a header holding the magic bytes and the format version, followed by the records. A file is
+    closed once it would exceed max_file_bytes, and only the max_files newest files of the directory are kept.
+    Attributes
+    ----------
+    directory : str
+        Directory receiving the telemetry files.
+    capacity : int
+        Number of records the ring buffer holds.
+    buffer : bytearray
+        Ring buffer of capacity packed records.
+    head : int
+        Number of records published by the game thread.
+    tail : int
+        Number of records taken by the writer thread.
+    dropped : int
+        Number of records dropped because the buffer was full.
+    seed : int
+        Seed of the game the records belong to.
+    last : int
+        time.monotonic_ns of the previous record.
+    epoch : int
+        Nanoseconds to add to time.monotonic_ns to get the wall-clock time.
+    flush_interval : float
+        Seconds between two batches of the writer thread.
+    max_file_bytes : int
+        Size in bytes a file does not grow beyond.
+    max_files : int
+        Number of files kept in the directory.
+    file : io.BufferedWriter
+        File receiving the batches, or None before the first batch.
+    file_bytes : int
+        Number of bytes written to the current file.
+    files : int
+        Number of files created.
+    error : OSError
+        Error of the last failed write, or None.
+    closed : threading.Event
+        Event set when the thread is asked to stop.
+    thread : threading.Thread
+        Writer thread.
+    """
+    def __init__(
+        self,
+        directory: str,
+        capacity: int = CAPACITY,
+        flush_interval: float = FLUSH_INTERVAL,
+        max_file_bytes: int = MAX_FILE_BYTES,
+        max_files: int = MAX_FILES,
+    ):
+        """
+        Initialize a Telemetry object and start its writer thread.
+        :param directory: Directory receiving the telemetry files, created if needed.
+        :param capacity: Number of records the ring buffer holds.
+        :param flush_interval: Seconds between two batches of the writer thread.
+        :param max_file_bytes: Size in bytes a file does not grow beyond.
+        :param max_files: Number of files kept in the directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.capacity = capacity
+        self.buffer = bytearray(capacity * RECORD.size)
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.seed = 0
+        self.last = time.monotonic_ns()
+        self.epoch = time.time_ns() - self.last
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.file = None
+        self.file_bytes = 0
+        self.files = 0
+        self.error = None
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+
+    def record(self, kind: int, source: int = 0, target: int = 0, count: int = 0):
+        """
+        Record an event, or count it as dropped if the buffer is full. Only the game thread may call it.
+        :param kind: Kind of the event, from KINDS.
+        :param source: Index of the source pile of the move.
+        :param target: Index of the target pile of the move.
+        :param count: Number of cards moved.
+        """
+        head = self.head
+        if head - self.tail >= self.capacity:
+            self.dropped += 1
+            return
+        now = time.monotonic_ns()
+        RECORD.pack_into(
+            self.buffer, head % self.capacity * RECORD.size, (now + self.epoch) // 1000000, self.seed,
+            min((now - self.last) // 1000000, 0xFFFFFFFF), kind, source, target, count,
+        )
+        self.last = now
+        self.head = head + 1
+
+    def deal(self, seed: int):
+        """
+        Record the start of a game.
+        :param seed: Seed of the deal.
+        """
+        self.seed = seed
+        self.record(DEAL)
+
+    def take_batch(self) -> bytes:
+        """
+        Copy the records published since the last batch and free their slots.
+        :return: Packed records, oldest first.
+        """
+        head, tail = self.head, self.tail
+        start, end = tail % self.capacity * RECORD.size, head % self.capacity * RECORD.size
+        if head == tail:
+            return b""
+        if start < end:
+            batch = bytes(self.buffer[start:end])
+        else:
+            batch = bytes(self.buffer[start:]) + bytes(self.buffer[:end])
+        self.tail = head
+        return batch
+
+    def write_batch(self):
+        """
+        Append the records published since the last batch to the current file, starting a new file whenever it would
+        grow beyond max_file_bytes. A file holds at least one record.
+        """
+        batch = self.take_batch()
+        try:
+            while batch:
+                if self.file is None:
+                    self.open_file()
+                room = max((self.max_file_bytes - self.file_bytes) // RECORD.size, 0) * RECORD.size
+                if not room and self.file_bytes == HEADER.size:
+                    room = RECORD.size
+                chunk, batch = batch[:room], batch[room:]
+                self.file.write(chunk)
+                self.file.flush()
+                self.file_bytes += len(chunk)
+                if batch:
+                    self.file.close()
+                    self.file = None
+        except OSError as error:
+            self.error = error
+
+    def open_file(self):
+        """
+        Create a new telemetry file, write its header and delete the oldest files beyond max_files.
+        """
+        self.files += 1
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{self.files:06d}{TELEMETRY_EXTENSION}'
+        self.file = open(os.path.join(self.directory, name), "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION))
+        self.file_bytes = HEADER.size
+        paths = telemetry_paths(self.directory)
+        for path in paths[:max(0, len(paths) - self.max_files)]:
+            os.remove(path)
+
+    def run(self):
+        """
+        Write a batch every flush_interval seconds until closed, then write the last one and close the file.
+        """
+        while not self.closed.wait(self.flush_interval):
+            self.write_batch()
+        self.write_batch()
+        if self.file is not None:
+            self.file.close()
+
+    def close(self):
+        """
+        Write the records left in the buffer and stop the thread.
+        """
+        self.closed.set()
+        self.thread.join()
+
+
+def telemetry_paths(directory: str) -> list:
+    """
+    Get the telemetry files of a directory, oldest first.
+    :param directory: Directory holding the telemetry files.
+    :return: List of paths.
+    """
+    paths = [
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(TELEMETRY_EXTENSION)
+    ]
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+
+def read_telemetry(path: str) -> list:
+    """
+    Read a telemetry file. A record cut short by a crash is ignored.
+    :param path: Path of the telemetry file.
+    :return: List of TelemetryRecord objects.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f'{path}: truncated telemetry header')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path}: not a version {VERSION} telemetry file')
+    end = HEADER.size + (len(data) - HEADER.size) // RECORD.size * RECORD.size
+    return [TelemetryRecord(*record) for record in RECORD.iter_unpack(data[HEADER.size:end])]
+
+
+def main(argv: list = None):
+    """
+    Command-line entry point of the telemetry reader, printing the records of telemetry files as NDJSON.
+    :param argv: List of command-line arguments, or None to use sys.argv.
+    """
+    parser = argparse.ArgumentParser(description="Print Solitaire telemetry files as NDJSON.")
+    parser.add_argument("paths", nargs="+", help="telemetry files or directories holding them")
+    args = parser.parse_args(argv)
+
+    for path in args.paths:
+        for file_path in telemetry_paths(path) if os.path.isdir(path) else [path]:
+            for record in read_telemetry(file_path):
+                print(json.dumps(dict(record._asdict(), kind=KINDS[record.kind])))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from move_index import MoveIndex
+from rules import VARIANTS
+from state import KlondikeState, shuffled_deck
+
+SEEDS = range(20)
+MOVES = 200
+UNDO_CHANCE = 0.25
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_index_matches_legal_moves(variant: str):
+    """
+    Check that an index kept up to date one move at a time lists the same moves as legal_moves, along seeded random
+    games mixing moves and undos.
+    """
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        state = KlondikeState.deal(shuffled_deck(seed), VARIANTS[variant])
+        index = MoveIndex(state)
+        history = []
+        for step in range(MOVES):
+            moves = state.legal_moves()
+            assert sorted(index.moves()) == sorted(moves), (variant, seed, step)
+            assert len(index) == len(moves)
+            if history and rng.random() < UNDO_CHANCE:
+                move = history.pop()
+                state.undo(move)
+            elif moves:
+                move = state.apply(rng.choice(moves))
+                history.append(move)
+            else:
+                break
+            index.update(move)
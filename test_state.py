@@ -0,0 +1,266 @@
+import os
+import random
+
+import pygame
+import pytest
+
+from card import Card
+from game import check_foundations_rules, check_tableau_rules, encode_card
+from layout import CARD_HEIGHT, CARD_WIDTH
+from rank import RANKS
+from rules import VARIANTS
+from slot import Slot
+from state import FOUNDATIONS, STOCK, SUITE_NAMES, TABLEAU, WASTE, KlondikeState, Move, card_id, shuffled_deck
+from suite import SUITES
+from textures import set_lazy_loading
+
+SEEDS = range(6)
+MOVES = 120
+UNDO_CHANCE = 0.2
+FOUNDATION = FOUNDATIONS[0]
+EMPTY_FOUNDATION = FOUNDATIONS[1]
+PILE = TABLEAU[0]
+EMPTY_PILE = TABLEAU[1]
+TARGET_PILE = TABLEAU[2]
+
+
+def card(rank: int, suite_name: str) -> int:
+    """
+    Encode a card from its rank value and the name of its suite.
+    :param rank: Value of the card's rank, from 1 (Ace) to 13 (King).
+    :param suite_name: Name of the card's suite.
+    :return: Encoded card.
+    """
+    return card_id(SUITE_NAMES.index(suite_name), rank)
+
+
+# Positions with a known answer: cards of the waste, foundation and tableau piles, face-down cards of the tableau
+# piles, the move checked and whether it is legal.
+POSITIONS = (
+    ("ace on empty foundation", {WASTE: [card(1, "hearts")]}, {}, Move(WASTE, EMPTY_FOUNDATION, 1), True),
+    ("two on empty foundation", {WASTE: [card(2, "hearts")]}, {}, Move(WASTE, EMPTY_FOUNDATION, 1), False),
+    (
+        "next rank of the suite on foundation",
+        {WASTE: [card(2, "spades")], FOUNDATION: [card(1, "spades")]}, {}, Move(WASTE, FOUNDATION, 1), True,
+    ),
+    (
+        "next rank of another suite on foundation",
+        {WASTE: [card(2, "clubs")], FOUNDATION: [card(1, "spades")]}, {}, Move(WASTE, FOUNDATION, 1), False,
+    ),
+    (
+        "skipped rank on foundation",
+        {WASTE: [card(3, "spades")], FOUNDATION: [card(1, "spades")]}, {}, Move(WASTE, FOUNDATION, 1), False,
+    ),
+    (
+        "run onto foundation",
+        {PILE: [card(2, "spades"), card(1, "hearts")], FOUNDATION: [card(1, "spades")]}, {},
+        Move(PILE, FOUNDATION, 2), False,
+    ),
+    ("king on empty tableau", {WASTE: [card(13, "clubs")]}, {}, Move(WASTE, EMPTY_PILE, 1), True),
+    ("queen on empty tableau", {WASTE: [card(12, "clubs")]}, {}, Move(WASTE, EMPTY_PILE, 1), False),
+    (
+        "opposite colour one rank lower",
+        {WASTE: [card(12, "hearts")], PILE: [card(13, "spades")]}, {}, Move(WASTE, PILE, 1), True,
+    ),
+    (
+        "same colour one rank lower",
+        {WASTE: [card(12, "clubs")], PILE: [card(13, "spades")]}, {}, Move(WASTE, PILE, 1), False,
+    ),
+    (
+        "opposite colour two ranks lower",
+        {WASTE: [card(11, "diamonds")], PILE: [card(13, "spades")]}, {}, Move(WASTE, PILE, 1), False,
+    ),
+    (
+        "opposite colour one rank higher",
+        {WASTE: [card(13, "hearts")], PILE: [card(12, "spades")]}, {}, Move(WASTE, PILE, 1), False,
+    ),
+    (
+        "onto face-down card",
+        {WASTE: [card(12, "hearts")], PILE: [card(13, "spades")]}, {PILE: 1}, Move(WASTE, PILE, 1), False,
+    ),
+    (
+        "run onto opposite colour",
+        {PILE: [card(9, "spades"), card(8, "diamonds")], TARGET_PILE: [card(10, "hearts")]}, {},
+        Move(PILE, TARGET_PILE, 2), True,
+    ),
+    (
+        "run with face-down card",
+        {PILE: [card(9, "spades"), card(8, "diamonds")], TARGET_PILE: [card(10, "hearts")]}, {PILE: 1},
+        Move(PILE, TARGET_PILE, 2), False,
+    ),
+    (
+        "several waste cards",
+        {WASTE: [card(13, "hearts"), card(12, "spades")]}, {}, Move(WASTE, EMPTY_PILE, 2), False,
+    ),
+    (
+        "foundation card back to tableau",
+        {FOUNDATION: [card(1, "clubs"), card(2, "clubs")], PILE: [card(3, "hearts")]}, {}, Move(FOUNDATION, PILE, 1),
+        True,
+    ),
+)
+
+
+@pytest.fixture(scope="module")
+def cards() -> list:
+    """
+    Create the Card objects of a deck, indexed by their encoded value, without loading their faces.
+    :return: List of Card objects.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    set_lazy_loading(True)
+    deck = [Card(0, 0, CARD_WIDTH, CARD_HEIGHT, suite, rank) for suite in SUITES for rank in RANKS]
+    yield sorted(deck, key=encode_card)
+    set_lazy_loading(False)
+    pygame.display.quit()
+
+
+def build_slots(state: KlondikeState, cards: list) -> list:
+    """
+    Mirror the piles of a state on Slot objects, as the game lays them out.
+    :param state: State to be mirrored.
+    :param cards: List of Card objects indexed by their encoded value.
+    :return: List of Slot objects indexed by pile.
+    """
+    slots = []
+    for pile, pile_cards in enumerate(state.piles):
+        slot = Slot(0, 0, CARD_WIDTH, CARD_HEIGHT, (0, 0, 0), 1)
+        face_down = len(pile_cards) - state.face_up[pile]
+        for depth, card in enumerate(pile_cards):
+            cards[card].face_up = depth >= face_down
+            slot.place_card(cards[card])
+        slots.append(slot)
+    return slots
+
+
+def oracle_foundations_rules(card: Card, slot: Slot) -> bool:
+    """
+    Check if a card can be placed on a foundation slot by comparing suites and ranks, without the rules tables.
+    :param card: Card object to be checked.
+    :param slot: Slot object representing the foundations slot.
+    :return: true if the card can be placed on the slot, false otherwise.
+    """
+    if slot.is_empty():
+        return card.rank.name == "Ace"
+    top_card = slot.get_top_card()
+    return card.suite.name == top_card.suite.name and card.rank.value - top_card.rank.value == 1
+
+
+def oracle_tableau_rules(card: Card, slot: Slot) -> bool:
+    """
+    Check if a card can be placed on a tableau slot by comparing colours and ranks, without the rules tables.
+    :param card: Card object to be checked.
+    :param slot: Slot object representing the tableau slot.
+    :return: true if the card can be placed on the slot, false otherwise.
+    """
+    if slot.is_empty():
+        return card.rank.name == "King"
+    top_card = slot.get_top_card()
+    return card.suite.color != top_card.suite.color and top_card.rank.value - card.rank.value == 1 and top_card.face_up
+
+
+def oracle_allows(slots: list, move: Move) -> bool:
+    """
+    Check a move onto a foundation or tableau pile with the oracle rules.
+    :param slots: List of Slot objects mirroring the state.
+    :param move: Move to be checked.
+    :return: true if the move is legal, false otherwise.
+    """
+    if move.count > len(slots[move.source].pile):
+        return False
+    card = slots[move.source].pile[-move.count]
+    if not card.face_up:
+        return False
+    if move.target in FOUNDATIONS:
+        return move.count == 1 and oracle_foundations_rules(card, slots[move.target])
+    if move.source not in TABLEAU and move.count != 1:
+        return False
+    return oracle_tableau_rules(card, slots[move.target])
+
+
+def gui_allows(state: KlondikeState, slots: list, move: Move) -> bool:
+    """
+    Check a move onto a foundation or tableau pile with the rules the game applies to a dropped pile.
+    :param state: Current state.
+    :param slots: List of Slot objects mirroring the state.
+    :param move: Move to be checked.
+    :return: true if the game accepts the move, false otherwise.
+    """
+    if move.count > len(slots[move.source].pile):
+        return False
+    card = slots[move.source].pile[-move.count]
+    if not card.face_up:
+        return False
+    if move.target in FOUNDATIONS:
+        return move.count == 1 and check_foundations_rules(card, slots[move.target], state.rules)
+    if move.source not in TABLEAU and move.count != 1:
+        return False
+    return check_tableau_rules(card, slots[move.target], state.rules)
+
+
+def random_states(rules, seed: int):
+    """
+    Play random legal moves from a seeded deal, sometimes undoing the last one.
+    :param rules: Rules of the variant being played.
+    :param seed: Seed of the deal and of the moves.
+    :return: Generator of the states reached, the same object being modified in place.
+    """
+    rng = random.Random(seed)
+    state = KlondikeState.deal(shuffled_deck(seed), rules)
+    history = []
+    yield state
+    for _ in range(MOVES):
+        if history and rng.random() < UNDO_CHANCE:
+            state.undo(history.pop())
+        else:
+            moves = state.legal_moves()
+            if not moves:
+                return
+            history.append(state.apply(rng.choice(moves)))
+        yield state
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_moves_match_gui_rules(variant: str, cards: list):
+    """
+    Check that can_move and legal_moves agree with the oracle rules and with the rules the game applies to a dropped
+    pile, for every move onto a foundation or tableau pile along seeded random games.
+    """
+    for seed in SEEDS:
+        for state in random_states(VARIANTS[variant], seed):
+            slots = build_slots(state, cards)
+            expected = set()
+            for source in (WASTE, *FOUNDATIONS, *TABLEAU):
+                for count in range(1, len(state.piles[source]) + 1):
+                    for target in (*FOUNDATIONS, *TABLEAU):
+                        if target == source:
+                            continue
+                        move = Move(source, target, count)
+                        allowed = oracle_allows(slots, move)
+                        assert state.can_move(move) == allowed, (variant, seed, move)
+                        assert gui_allows(state, slots, move) == allowed, (variant, seed, move)
+                        if allowed:
+                            expected.add((source, target, count))
+            legal = {
+                (move.source, move.target, move.count) for move in state.legal_moves()
+                if move.source != STOCK and move.target != STOCK
+            }
+            assert legal == expected, (variant, seed)
+
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("name, piles, face_down, move, legal", POSITIONS, ids=[position[0] for position in POSITIONS])
+def test_known_positions(variant: str, name: str, piles: dict, face_down: dict, move: Move, legal: bool, cards: list):
+    """
+    Check can_move, legal_moves, the oracle rules and the game's rules on positions with a known answer.
+    """
+    state = KlondikeState(VARIANTS[variant])
+    for pile, pile_cards in piles.items():
+        state.piles[pile].extend(pile_cards)
+        state.face_up[pile] = len(pile_cards) - face_down.get(pile, 0)
+    slots = build_slots(state, cards)
+    assert state.can_move(move) == legal
+    assert (move in state.legal_moves()) == legal
+    assert oracle_allows(slots, move) == legal
+    assert gui_allows(state, slots, move) == legal
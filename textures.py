@@ -0,0 +1,277 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import pygame
+
+from atlas import load_atlas, release_atlas
+from layout import CARD_HEIGHT, CARD_WIDTH
+
+IMAGES_DIR = "images"
+ATLAS_SIZE = (CARD_WIDTH, CARD_HEIGHT)
+BACK_IMAGE_NAME = "back_card"
+TEXTURE_CACHE_BYTES = 32 << 20
+
+# Textures by size, least recently used size first, each size holding a dictionary of textures by name
+_textures = OrderedDict()
+_bytes = 0
+_hits = 0
+_misses = 0
+_previews = {}
+_preview_size = None
+# Textures without an atlas are decoded one by one, ahead of time by the prefetcher when it is asked to. The prefetcher
+# only decodes: its results come back through the Future of every (name, size) in _prefetches, which only the main
+# thread reads or changes.
+_lazy = False
+_no_atlas = set()
+_prefetches = {}
+_prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="textures")
+
+
+def face_image_name(suite_name: str, rank_name: str) -> str:
+    """
+    Get the image name of a card face.
+    :param suite_name: Name of the card's suite.
+    :param rank_name: Name of the card's rank.
+    :return: Name of the image file without directory and extension.
+    """
+    return f'{rank_name.lower()}_of_{suite_name.lower()}'
+
+
+def decode_texture(name: str, size: tuple) -> pygame.Surface:
+    """
+    Load an image from the images directory and scale it to the specified size, without touching the display, so it
+    can run on another thread.
+    :param name: Name of the image file without directory and extension.
+    :param size: Tuple (width, height) the image is scaled to.
+    :return: Pygame.Surface object holding the scaled image.
+    """
+    image = pygame.image.load(f'{IMAGES_DIR}/{name}.png')
+    return pygame.transform.smoothscale(image, size)
+
+
+def convert_texture(image: pygame.Surface) -> pygame.Surface:
+    """
+    Convert an image to the display's pixel format when a display mode is set, so later blits need no per-pixel
+    conversion.
+    :param image: Pygame.Surface object.
+    :return: Converted copy of the image, or the image itself if no display mode is set.
+    """
+    if pygame.display.get_surface() is None:
+        return image
+    if image.get_flags() & pygame.SRCALPHA:
+        return image.convert_alpha()
+    return image.convert()
+
+
+def set_lazy_loading(lazy: bool):
+    """
+    Choose how textures missing from the cache are loaded.
+
+    By default, the first texture requested at ATLAS_SIZE loads the atlas of that size, building it if needed, and
+    every texture of the size is then taken from it. With lazy loading, the atlas is only mapped if it is up to date,
+    without being converted, and textures are converted one by one as they are requested. Textures of other sizes, or
+    of an atlas that cannot be loaded, are decoded one by one, by the prefetcher when it got to them first.
+    :param lazy: Whether to load textures lazily.
+    """
+    global _lazy
+    _lazy = lazy
+
+
+def lazy_loading() -> bool:
+    """
+    Check if textures are loaded lazily, see set_lazy_loading.
+    :return: true if textures are loaded lazily, false otherwise.
+    """
+    return _lazy
+
+
+def has_atlas(size: tuple) -> bool:
+    """
+    Check if the textures of a size are taken from an atlas. Only ATLAS_SIZE has one, so resizing the window does not
+    build and store an atlas for every size it settles at.
+    :param size: Tuple (width, height) of the textures.
+    :return: true unless the size has no atlas or its atlas could not be loaded, false otherwise.
+    """
+    return size == ATLAS_SIZE and size not in _no_atlas
+
+
+def load_uncached_texture(name: str, size: tuple) -> pygame.Surface:
+    """
+    Load a texture missing from the cache: from the atlas of its size if it has one, otherwise from the prefetched
+    images or by decoding its image.
+    :param name: Name of the image file without directory and extension.
+    :param size: Tuple (width, height) of the texture.
+    :return: Pygame.Surface object holding the scaled image.
+    """
+    if has_atlas(size):
+        try:
+            images = load_atlas(size, IMAGES_DIR, lazy=_lazy)
+        except OSError:
+            images = None
+        if images is None:
+            _no_atlas.add(size)
+        elif name in images:
+            return convert_texture(images[name]) if _lazy else images[name]
+    image = take_prefetched(name, size)
+    if image is None:
+        image = decode_texture(name, size)
+    return convert_texture(image)
+
+
+def take_prefetched(name: str, size: tuple) -> pygame.Surface:
+    """
+    Take the image the prefetcher decoded for a texture, waiting for it if it is being decoded. An image still queued
+    is cancelled, so the caller decodes it at once.
+    :param name: Name of the image file without directory and extension.
+    :param size: Tuple (width, height) of the texture.
+    :return: Pygame.Surface object holding the scaled image, or None if it was not prefetched, was still queued or
+    could not be decoded.
+    """
+    future = _prefetches.pop((name, size), None)
+    if future is None or future.cancel():
+        return None
+    try:
+        return future.result()
+    except (OSError, pygame.error):
+        return None
+
+
+def prefetch_textures(names: list, size: tuple):
+    """
+    Decode images on the prefetcher thread before they are requested, when their size has no atlas. With lazy
+    loading, ATLAS_SIZE only counts as having none once its atlas was found missing or stale. Images already cached,
+    prefetched or queued are skipped.
+    :param names: Names of the image files without directory and extension, most likely needed first.
+    :param size: Tuple (width, height) of the textures.
+    """
+    size = tuple(size)
+    if has_atlas(size):
+        return
+    textures = _textures.get(size, {})
+    for name in names:
+        key = (name, size)
+        if name not in textures and key not in _prefetches:
+            _prefetches[key] = _prefetcher.submit(decode_texture, name, size)
+
+
+def drop_prefetches(keep: Callable[[tuple], bool]):
+    """
+    Drop the prefetched images of the sizes a predicate rejects, cancelling the ones still queued.
+    :param keep: Function taking a size and returning whether its prefetched images are kept.
+    """
+    for key in [key for key in _prefetches if not keep(key[1])]:
+        _prefetches.pop(key).cancel()
+
+
+def textures_ready(names: list, size: tuple) -> bool:
+    """
+    Have the images of a size decoded on the prefetcher thread, see prefetch_textures, and check if they are done, so
+    the caller can wait for them without decoding them itself. Images prefetched for other sizes are dropped.
+    :param names: Names of the image files without directory and extension.
+    :param size: Tuple (width, height) of the textures.
+    :return: true if every texture can be taken without decoding its image, false otherwise.
+    """
+    size = tuple(size)
+    drop_prefetches(lambda prefetched_size: prefetched_size == size)
+    prefetch_textures(names, size)
+    return all(_prefetches[name, size].done() for name in names if (name, size) in _prefetches)
+
+
+def texture_bytes(texture: pygame.Surface) -> int:
+    """
+    Get the bytes held by the pixels of a texture.
+    :param texture: Pygame.Surface object.
+    :return: Number of bytes.
+    """
+    return texture.get_width() * texture.get_height() * texture.get_bytesize()
+
+
+def get_texture(name: str, size: tuple) -> pygame.Surface:
+    """
+    Get a shared surface for the image, loading it only the first time it is requested at this size.
+
+    Images of ATLAS_SIZE are cut out of its pre-scaled atlas; images of other sizes, or of an atlas that cannot be
+    loaded, are decoded and scaled one by one, see set_lazy_loading. The cache is an LRU of sizes: when its
+    textures hold more than TEXTURE_CACHE_BYTES, the textures of the least recently used sizes are dropped, together
+    with their atlases.
+
+    The returned surface is shared by every caller and must not be drawn on.
+    :param name: Name of the image file without directory and extension.
+    :param size: Tuple (width, height) of the surface.
+    :return: Pygame.Surface object holding the scaled image.
+    """
+    global _bytes, _hits, _misses
+    size = tuple(size)
+    textures = _textures.get(size)
+    if textures is None:
+        textures = _textures[size] = {}
+    else:
+        _textures.move_to_end(size)
+    texture = textures.get(name)
+    if texture is None:
+        _misses += 1
+        texture = load_uncached_texture(name, size)
+        textures[name] = texture
+        _bytes += texture_bytes(texture)
+        while _bytes > TEXTURE_CACHE_BYTES and len(_textures) > 1:
+            evicted_size, evicted = _textures.popitem(last=False)
+            _bytes -= sum(texture_bytes(evicted_texture) for evicted_texture in evicted.values())
+            release_atlas(evicted_size)
+            drop_prefetches(lambda prefetched_size: prefetched_size != evicted_size)
+    else:
+        _hits += 1
+    return texture
+
+
+def get_preview(name: str, size: tuple, source_size: tuple) -> pygame.Surface:
+    """
+    Get a quick preview of the image at a size, scaled without filtering from its texture at another size.
+
+    Previews stand in for textures while the window is being resized: they cost a fast pygame.transform.scale of a
+    cached texture instead of decoding and smoothly scaling the image. Only the previews of the last size requested
+    are kept, outside the texture cache.
+    :param name: Name of the image file without directory and extension.
+    :param size: Tuple (width, height) of the preview.
+    :param source_size: Tuple (width, height) of the texture the preview is scaled from.
+    :return: Pygame.Surface object holding the scaled image.
+    """
+    global _preview_size
+    size = tuple(size)
+    if size != _preview_size:
+        _previews.clear()
+        _preview_size = size
+    preview = _previews.get(name)
+    if preview is None:
+        preview = pygame.transform.scale(get_texture(name, source_size), size)
+        _previews[name] = preview
+    return preview
+
+
+def cache_info() -> dict:
+    """
+    Get statistics about the texture cache.
+    :return: Dictionary with the number of hits (loads avoided), misses (loads done), cached sizes, cached textures
+    and the bytes held by their pixels.
+    """
+    return {
+        "hits": _hits,
+        "misses": _misses,
+        "sizes": len(_textures),
+        "textures": sum(len(textures) for textures in _textures.values()),
+        "bytes": _bytes,
+    }
+
+
+def clear_cache():
+    """
+    Drop every cached texture and reset the statistics.
+    """
+    global _bytes, _hits, _misses
+    _textures.clear()
+    _previews.clear()
+    _no_atlas.clear()
+    drop_prefetches(lambda prefetched_size: False)
+    _bytes = 0
+    _hits = 0
+    _misses = 0